@@ -0,0 +1,48 @@
+"""Shared helpers for the benchmark scripts (run from backend/: python bench/<name>.py)."""
+
+import io
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def timed(fn, repeats: int = 3) -> float:
+    """Median wall time of *fn* over *repeats* runs, in seconds."""
+    runs = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return statistics.median(runs)
+
+
+def synthetic_jpeg(megapixels: float, kind: str = "mixed", orientation: int | None = None, seed: int = 0) -> bytes:
+    """
+    A camera-sized 3:2 JPEG. *kind*: "smooth" (gradients), "noise" (sensor-like
+    grain everywhere) or "mixed" (gradients with noisy patches) — texture drives
+    JPEG size, so the encoders behave differently on each.
+    """
+    import numpy as np
+    from PIL import Image
+
+    h = int((megapixels * 1e6 / 1.5) ** 0.5)
+    w = int(h * 1.5)
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:h, 0:w].astype(np.float32)
+    base = np.stack([x / w * 255, y / h * 255, (x + y) / (w + h) * 255], axis=-1)
+    if kind == "noise":
+        base += rng.normal(0, 40, base.shape).astype(np.float32)
+    elif kind == "mixed":
+        mask = ((x // (w / 8)).astype(int) + (y // (h / 8)).astype(int)) % 3 == 0
+        base += (rng.normal(0, 35, base.shape).astype(np.float32) * mask[..., None])
+    img = Image.fromarray(np.clip(base, 0, 255).astype(np.uint8), "RGB")
+    buf = io.BytesIO()
+    exif = None
+    if orientation:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+    img.save(buf, format="JPEG", quality=92, **({"exif": exif} if exif else {}))
+    return buf.getvalue()
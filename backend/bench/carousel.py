@@ -0,0 +1,118 @@
+"""
+End-to-end carousel publish time against a local Graph API stand-in.
+
+The stand-in is a threaded HTTP server that mimics the three endpoints
+post_carousel uses: container creation (with a processing delay before the
+container reports FINISHED), container status, and media_publish. The real
+instagram_service code talks to it over HTTP; only GRAPH_BASE and the token
+lookup are redirected. "sequential" runs the same code with a fan-out of 1,
+i.e. one child created and polled after another, as before.
+
+    python bench/carousel.py [--items 4] [--child-processing 2.0] [--repeats 3]
+"""
+
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from _common import timed
+
+from services import instagram_service as ig
+
+
+class GraphStandIn:
+    def __init__(self, create_latency: float, child_processing: float, parent_processing: float,
+                 publish_latency: float, status_latency: float):
+        self.create_latency = create_latency
+        self.child_processing = child_processing
+        self.parent_processing = parent_processing
+        self.publish_latency = publish_latency
+        self.status_latency = status_latency
+        self.ready_at: dict[str, float] = {}
+        self.requests = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def handler(self):
+        graph = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, body: dict, status: int = 200):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                with graph._lock:
+                    graph.requests += 1
+                path = urlparse(self.path).path
+                params = parse_qs(urlparse(self.path).query)
+                if path.endswith("/media_publish"):
+                    time.sleep(graph.publish_latency)
+                    return self._reply({"id": f"media-{params['creation_id'][0]}"})
+                time.sleep(graph.create_latency)
+                container_id = f"c{next(graph._ids)}"
+                is_child = params.get("is_carousel_item") == ["true"]
+                processing = graph.child_processing if is_child else graph.parent_processing
+                with graph._lock:
+                    graph.ready_at[container_id] = time.monotonic() + processing
+                self._reply({"id": container_id})
+
+            def do_GET(self):
+                with graph._lock:
+                    graph.requests += 1
+                time.sleep(graph.status_latency)
+                container_id = urlparse(self.path).path.rsplit("/", 1)[-1]
+                ready = time.monotonic() >= graph.ready_at.get(container_id, float("inf"))
+                self._reply({"status_code": "FINISHED" if ready else "IN_PROGRESS"})
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=4)
+    parser.add_argument("--create-latency", type=float, default=0.3)
+    parser.add_argument("--child-processing", type=float, default=2.0)
+    parser.add_argument("--parent-processing", type=float, default=1.0)
+    parser.add_argument("--publish-latency", type=float, default=0.5)
+    parser.add_argument("--status-latency", type=float, default=0.05)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    graph = GraphStandIn(args.create_latency, args.child_processing, args.parent_processing,
+                         args.publish_latency, args.status_latency)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), graph.handler())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    ig.GRAPH_BASE = f"http://127.0.0.1:{server.server_address[1]}/v21.0"
+    ig.get_valid_token = lambda creds=None, user_id=None: "bench-token"
+    creds = {"instagram_account_id": "bench-account"}
+    urls = [f"https://example.invalid/{i}.jpg" for i in range(args.items)]
+
+    def publish():
+        ig._poll_models.clear()  # every run starts from the default first poll
+        ig.post_carousel(urls, "bench", creds=creds)
+
+    print(f"{args.items}-item carousel, child processing {args.child_processing:.1f}s, "
+          f"create {args.create_latency:.1f}s, publish {args.publish_latency:.1f}s")
+    fanout = ig._CAROUSEL_FANOUT
+    for label, width in (("sequential", 1), (f"concurrent (fan-out {fanout})", fanout)):
+        ig._CAROUSEL_FANOUT = width
+        graph.requests = 0
+        seconds = timed(publish, args.repeats)
+        print(f"  {label:26s} {seconds:6.2f} s   ({graph.requests // args.repeats} Graph requests/run)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+GPS clustering time for cluster_by_location at 50k photos, on layouts that
+stress different parts of it, with a brute-force O(n²) correctness check on a
+subsample of each layout.
+
+  trips      300 trips, photos spread ~5 km around each stop
+  trips+14d  the same, linked only within a 14-day window
+  city       everything around one city, ~2 km spread (dense neighbouring cells)
+  uniform    spread evenly over the globe, poles and antimeridian included
+
+    python bench/clustering.py [--photos 50000] [--repeats 3]
+"""
+
+import argparse
+
+import numpy as np
+from _common import timed
+
+from services.schedule_service import _connected_labels, _haversine_km, cluster_by_location
+
+DAY = 86400.0
+
+
+def layout(kind: str, n: int, rng) -> tuple[np.ndarray, np.ndarray, np.ndarray | None, float | None]:
+    if kind == "uniform":
+        lat = np.degrees(np.arcsin(rng.uniform(-1, 1, n)))
+        return lat, rng.uniform(-180, 180, n), None, None
+    if kind == "city":
+        lat, lng = 48.8566 + rng.normal(0, 0.018, n), 2.3522 + rng.normal(0, 0.027, n)
+        return lat, lng, None, None
+    stops = np.column_stack([rng.uniform(-50, 65, 300), rng.uniform(-180, 180, 300)])
+    pick = rng.integers(0, 300, n)
+    lat = stops[pick, 0] + rng.normal(0, 0.045, n)
+    lng = (stops[pick, 1] + rng.normal(0, 0.045, n) / np.cos(np.radians(stops[pick, 0])) + 180) % 360 - 180
+    if kind == "trips":
+        return lat, lng, None, None
+    taken = rng.uniform(0, 5 * 365 * DAY, 300)[pick] + rng.normal(0, 10 * DAY, n)
+    return lat, lng, taken, 14 * DAY
+
+
+def brute_force(lat, lng, radius_km, taken, max_seconds) -> np.ndarray:
+    phi, lam = np.radians(lat), np.radians(lng)
+    a, b = np.triu_indices(len(lat), k=1)
+    linked = _haversine_km(phi[a], lam[a], phi[b], lam[b]) <= radius_km
+    if max_seconds:
+        linked &= np.abs(taken[a] - taken[b]) <= max_seconds
+    return _connected_labels(len(lat), a[linked], b[linked])
+
+
+def same_partition(x: np.ndarray, y: np.ndarray) -> bool:
+    pairs = len(np.unique(np.column_stack([x, y]), axis=0))
+    return pairs == len(np.unique(x)) == len(np.unique(y))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--photos", type=int, default=50_000)
+    parser.add_argument("--radius-km", type=float, default=1.0)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--check", type=int, default=2_000, help="subsample size for the brute-force check")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"cluster_by_location, {args.photos} photos, radius {args.radius_km:g} km (median of {args.repeats})")
+    for kind in ("trips", "trips+14d", "city", "uniform"):
+        lat, lng, taken, window = layout(kind, args.photos, rng)
+        seconds = timed(lambda: cluster_by_location(lat, lng, args.radius_km, taken, window), args.repeats)
+        labels = cluster_by_location(lat, lng, args.radius_km, taken, window)
+
+        sub = rng.choice(args.photos, args.check, replace=False)
+        sub_taken = taken[sub] if taken is not None else None
+        ok = same_partition(
+            cluster_by_location(lat[sub], lng[sub], args.radius_km, sub_taken, window),
+            brute_force(lat[sub], lng[sub], args.radius_km, sub_taken, window),
+        )
+        print(f"  {kind:10s} {seconds * 1000:7.0f} ms   {len(np.unique(labels)):6d} clusters   "
+              f"brute-force check on {args.check}: {'match' if ok else 'MISMATCH'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Batch throughput of the offline reverse geocoder at 100k lookups.
+
+Builds GeoNames-format city files (or uses a real dump with --cities-file),
+times index load and one reverse_geocode_offline-style batch, and checks a
+sample of answers against brute-force haversine.
+
+  uniform    25k places spread evenly — sparse, mostly far-apart cities
+  clustered  150k places around 400 metro areas (cities1000-sized), with
+             queries concentrated where the places are
+
+    python bench/geocode_offline.py [--lookups 100000] [--cities-file PATH]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from _common import timed
+
+from services import geocode_service as geo
+
+
+def write_cities(path: Path, lat: np.ndarray, lng: np.ndarray) -> None:
+    with path.open("w", encoding="utf-8") as f:
+        for i, (a, b) in enumerate(zip(lat, lng)):
+            # geonameid, name, asciiname, alternatenames, lat, lng, class, code, country, cc2, admin1
+            f.write(f"{i}\tPlace{i}\tPlace{i}\t\t{a:.5f}\t{b:.5f}\tP\tPPL\tXX\t\t01\n")
+
+
+def layout(kind: str, rng, lookups: int):
+    if kind == "uniform":
+        lat = np.degrees(np.arcsin(rng.uniform(-0.9, 0.95, 25_000)))
+        lng = rng.uniform(-180, 180, 25_000)
+        q_lat = np.degrees(np.arcsin(rng.uniform(-0.9, 0.95, lookups)))
+        q_lng = rng.uniform(-180, 180, lookups)
+    else:
+        centers = np.column_stack([rng.uniform(-45, 65, 400), rng.uniform(-180, 180, 400)])
+        pick = rng.integers(0, 400, 150_000)
+        lat = centers[pick, 0] + rng.normal(0, 1.5, 150_000)
+        lng = (centers[pick, 1] + rng.normal(0, 1.5, 150_000) + 180) % 360 - 180
+        q = rng.integers(0, 400, lookups)
+        q_lat = centers[q, 0] + rng.normal(0, 2.0, lookups)
+        q_lng = (centers[q, 1] + rng.normal(0, 2.0, lookups) + 180) % 360 - 180
+    return lat, lng, np.clip(q_lat, -89.9, 89.9), q_lng
+
+
+def check(index, coords: np.ndarray, sample: int = 2000) -> int:
+    """Queries in a random sample whose nearest-city distance differs from brute force."""
+    rng = np.random.default_rng(1)
+    qs = coords[rng.choice(len(coords), min(sample, len(coords)), replace=False)]
+    _, got = index.nearest(qs[:, 0], qs[:, 1])
+    want = np.empty(len(qs))
+    for start in range(0, len(qs), 100):  # bounded (queries × places) matrix
+        ql = np.radians(qs[start:start + 100, 0])[:, None]
+        qg = np.radians(qs[start:start + 100, 1])[:, None]
+        want[start:start + 100] = geo._PlaceIndex._haversine(ql, qg, index.lat[None, :], index.lng[None, :]).min(axis=1)
+    both_far = (got > geo.OFFLINE_MAX_KM) & (want > geo.OFFLINE_MAX_KM)
+    return int(np.sum(~both_far & ~np.isclose(got, want, atol=1e-6)))
+
+
+def run(label: str, cities_file: Path, coords: np.ndarray, repeats: int) -> None:
+    start = time.perf_counter()
+    index = geo._load_geonames(cities_file)
+    load = time.perf_counter() - start
+    pairs = [tuple(c) for c in coords]
+    seconds = timed(lambda: index.lookup(pairs), repeats)
+    answered = sum(name is not None for name in index.lookup(pairs))
+    print(f"  {label:10s} {len(index.labels):7d} places  load {load:5.2f} s  "
+          f"{len(pairs)} lookups {seconds:5.2f} s ({len(pairs) / seconds / 1000:.0f}k/s)  "
+          f"answered {answered / len(pairs):.0%}  mismatches vs brute force: {check(index, coords)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--cities-file", type=Path, help="a real GeoNames cities*.txt dump")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"Offline reverse geocoding, {args.lookups} lookups per batch (median of {args.repeats})")
+    if args.cities_file:
+        _, _, q_lat, q_lng = layout("uniform", rng, args.lookups)
+        run("dump", args.cities_file, np.column_stack([q_lat, q_lng]), args.repeats)
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind in ("uniform", "clustered"):
+            lat, lng, q_lat, q_lng = layout(kind, rng, args.lookups)
+            path = Path(tmp) / f"{kind}.txt"
+            write_cities(path, lat, lng)
+            run(kind, path, np.column_stack([q_lat, q_lng]), args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+CPU time and peak memory of the feed and story transforms on large JPEGs:
+full-size decode (the original code) vs draft decode at a reduced scale.
+
+Every measurement runs in a fresh process. Peak memory is the growth of the
+process high-water mark (ru_maxrss) during the transform, so interpreter and
+import overhead are excluded.
+
+    python bench/image_decode.py [--megapixels 24 48] [--repeats 3]
+"""
+
+import argparse
+import io
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from _common import synthetic_jpeg
+
+
+def legacy_feed(image_bytes: bytes) -> bytes:
+    """The feed transform before draft decoding: full decode, one LANCZOS pass."""
+    from PIL import Image, ImageOps
+
+    img = ImageOps.exif_transpose(Image.open(io.BytesIO(image_bytes)))
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    w, h = img.size
+    if max(w, h) > 1440:
+        scale = 1440 / max(w, h)
+        img = img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=88, optimize=True)
+    return buf.getvalue()
+
+
+def legacy_story(image_bytes: bytes) -> bytes:
+    """The story crop before draft decoding."""
+    from PIL import Image, ImageOps
+
+    img = ImageOps.exif_transpose(Image.open(io.BytesIO(image_bytes)))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    w, h = img.size
+    ratio = 1080 / 1920
+    if w / h > ratio:
+        new_w = int(h * ratio)
+        img = img.crop(((w - new_w) // 2, 0, (w - new_w) // 2 + new_w, h))
+    elif w / h < ratio:
+        new_h = int(w / ratio)
+        img = img.crop((0, (h - new_h) // 2, w, (h - new_h) // 2 + new_h))
+    img = img.resize((1080, 1920), Image.LANCZOS)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=85, optimize=True)
+    return buf.getvalue()
+
+
+def child(path: str, op: str, impl: str) -> None:
+    from PIL import Image  # noqa: F401 — import before the baseline reading
+    from services.image_service import _render
+
+    data = Path(path).read_bytes()
+    fn = {
+        ("feed", "old"): legacy_feed,
+        ("story", "old"): legacy_story,
+        ("feed", "new"): lambda b: _render(b, ["feed"])["feed"],
+        ("story", "new"): lambda b: _render(b, ["story"])["story"],
+    }[(op, impl)]
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.process_time()
+    fn(data)
+    cpu = time.process_time() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base_rss
+    print(f"{cpu:.4f} {peak / 1024:.1f}")  # ru_maxrss is in KB on Linux
+
+
+def measure(path: Path, op: str, impl: str, repeats: int) -> tuple[float, float]:
+    cpu, mem = [], []
+    for _ in range(repeats):
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", str(path), op, impl],
+            check=True, capture_output=True, text=True,
+        ).stdout.split()
+        cpu.append(float(out[0]))
+        mem.append(float(out[1]))
+    return statistics.median(cpu), statistics.median(mem)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[24, 48])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    parser.add_argument("--make", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(*args.child)
+    if args.make:
+        return Path(args.make[0]).write_bytes(synthetic_jpeg(float(args.make[1])))
+
+    print(f"{'':16s}{'CPU old → new':>20s}{'peak memory old → new':>28s}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mp in args.megapixels:
+            path = Path(tmp) / f"{mp:g}mp.jpg"
+            # Generated in its own process: the high-water mark survives fork+exec,
+            # so this process must stay small for the children's readings to mean anything
+            subprocess.run([sys.executable, __file__, "--make", str(path), str(mp)], check=True)
+            for op in ("feed", "story"):
+                old_cpu, old_mem = measure(path, op, "old", args.repeats)
+                new_cpu, new_mem = measure(path, op, "new", args.repeats)
+                print(f"{op + ', ' + format(mp, 'g') + ' MP':16s}"
+                      f"{old_cpu * 1000:10.0f} → {new_cpu * 1000:.0f} ms"
+                      f"{old_mem:15.0f} → {new_mem:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Throughput of concurrent feed/story transforms by image worker count.
+
+Each configuration runs in a fresh process with IMAGE_WORKERS set. Callers are
+threads, as in the app (request handlers, scheduler jobs); workers=0 runs the
+transform inline on those threads, which serialises on the GIL. The pool is
+warmed up before timing, and the render cache is bypassed.
+
+Scaling is bounded by the cores available to the process (printed first).
+
+    python bench/image_pool.py [--workers 0 1 2 4] [--jobs 16] [--callers 8]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from _common import synthetic_jpeg
+
+
+def child(path: str, jobs: int, callers: int) -> None:
+    from services import image_service
+
+    data = Path(path).read_bytes()
+    ops = [["feed"], ["story"]]
+    with ThreadPoolExecutor(max_workers=callers) as threads:
+        # Warm-up: start every worker process (spawn + imports) before timing
+        list(threads.map(lambda i: image_service._run(ops[i % 2], data), range(max(image_service.IMAGE_WORKERS, 1))))
+        start = time.perf_counter()
+        list(threads.map(lambda i: image_service._run(ops[i % 2], data), range(jobs)))
+        elapsed = time.perf_counter() - start
+    image_service.shutdown()
+    print(f"{jobs / elapsed:.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--jobs", type=int, default=16)
+    parser.add_argument("--callers", type=int, default=8)
+    parser.add_argument("--megapixels", type=float, default=24)
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args.child[0], int(args.child[1]), int(args.child[2]))
+
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    print(f"{cores} core(s) available; {args.jobs} mixed feed/story transforms of a "
+          f"{args.megapixels:g} MP JPEG from {args.callers} threads")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "source.jpg"
+        path.write_bytes(synthetic_jpeg(args.megapixels))
+        baseline = None
+        for workers in args.workers:
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", str(path), str(args.jobs), str(args.callers)],
+                env={**os.environ, "IMAGE_WORKERS": str(workers)},
+                check=True, capture_output=True, text=True,
+            ).stdout.split()
+            rate = float(out[-1])
+            baseline = baseline or rate
+            label = "inline (threads)" if workers == 0 else f"{workers} worker(s)"
+            print(f"  {label:18s} {rate:6.2f} transforms/s   ×{rate / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    main()
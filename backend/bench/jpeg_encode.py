@@ -0,0 +1,57 @@
+"""
+Full-size encode passes and time to fit a JPEG under a byte limit: the old
+quality step-down loop (88, 78, 68 … 40) vs _encode_jpeg_to_size.
+
+Frames are 1440 px wide, like the feed variant. Limits are set relative to the
+frame's size at quality 88 so the search actually runs; the production limit
+(7 MB) is almost never reached by a 1440 px frame.
+
+    python bench/jpeg_encode.py [--limits 0.8 0.5 0.3] [--repeats 5]
+"""
+
+import argparse
+import io
+
+from _common import synthetic_jpeg, timed
+
+from services.image_service import _encode_jpeg, _encode_jpeg_to_size
+
+
+def legacy_encode(img, max_bytes: int) -> tuple[bytes, int, int]:
+    """The loop _compress_for_instagram used before the quality search."""
+    quality, passes = 88, 0
+    while quality >= 40:
+        data = _encode_jpeg(img, quality)
+        passes += 1
+        if len(data) <= max_bytes:
+            break
+        quality -= 10
+    return data, quality, passes
+
+
+def main() -> None:
+    from PIL import Image
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--limits", type=float, nargs="+", default=[0.8, 0.5, 0.3])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'image':8s}{'limit':>7s}{'full encodes old → new':>25s}{'time old → new':>20s}{'fits old/new':>15s}")
+    for kind in ("smooth", "mixed", "noise"):
+        img = Image.open(io.BytesIO(synthetic_jpeg(1.4, kind, seed=1))).convert("RGB")
+        img = img.resize((1440, 960), Image.LANCZOS)
+        q88 = len(_encode_jpeg(img, 88))
+        for limit in args.limits:
+            max_bytes = int(q88 * limit)
+            old, _, old_passes = legacy_encode(img, max_bytes)
+            new, _, new_passes = _encode_jpeg_to_size(img, max_bytes)
+            old_s = timed(lambda: legacy_encode(img, max_bytes), args.repeats)
+            new_s = timed(lambda: _encode_jpeg_to_size(img, max_bytes), args.repeats)
+            fits = "/".join("yes" if len(d) <= max_bytes else "no" for d in (old, new))
+            print(f"{kind:8s}{limit:6.1f}×{old_passes:14d} → {new_passes}"
+                  f"{old_s * 1000:15.0f} → {new_s * 1000:.0f} ms{fits:>15s}")
+
+
+if __name__ == "__main__":
+    main()
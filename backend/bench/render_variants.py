@@ -0,0 +1,45 @@
+"""
+Rendering all four variants (feed, story, preview, thumb) of one photo: four
+separate decodes vs one shared decode, and a render-cache hit.
+
+Runs inline (IMAGE_WORKERS=0) against a temporary render cache.
+
+    python bench/render_variants.py [--megapixels 24] [--repeats 5]
+"""
+
+import argparse
+import os
+import tempfile
+from pathlib import Path
+
+os.environ["IMAGE_WORKERS"] = "0"
+
+from _common import synthetic_jpeg, timed  # noqa: E402
+
+from services import image_service  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--megapixels", type=float, default=24)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    data = synthetic_jpeg(args.megapixels)
+    names = list(image_service.VARIANTS)
+    separate = timed(lambda: [image_service._render(data, [n]) for n in names], args.repeats)
+    shared = timed(lambda: image_service._render(data, names), args.repeats)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        image_service._RENDER_CACHE_DIR = Path(tmp)
+        image_service.render_variants(data, names)  # fill the cache
+        hit = timed(lambda: image_service.render_variants(data, names), args.repeats)
+
+    print(f"{len(names)} variants of a {args.megapixels:g} MP JPEG")
+    print(f"  separate decodes  {separate * 1000:7.0f} ms")
+    print(f"  one decode        {shared * 1000:7.0f} ms")
+    print(f"  cache hit         {hit * 1000:7.1f} ms  (md5 of the source + reads)")
+
+
+if __name__ == "__main__":
+    main()
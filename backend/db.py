@@ -42,12 +42,41 @@ def init_db() -> None:
             )
         """)
         # Migrate existing DBs
-        for col in ["google_photos_refresh_token TEXT", "google_picker_session_id TEXT", "saved_drive_folders TEXT", "google_story_picker_session_id TEXT"]:
+        for col in ["google_photos_refresh_token TEXT", "google_picker_session_id TEXT", "saved_drive_folders TEXT", "google_story_picker_session_id TEXT",
+                    "instagram_next_refresh_attempt_at INTEGER", "instagram_refresh_failures INTEGER"]:
             try:
                 conn.execute(f"ALTER TABLE credentials ADD COLUMN {col}")
                 conn.commit()
             except Exception:
                 pass  # Column already exists
+        # Token refresh sweeper scans by expiry
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_credentials_token_expiry "
+            "ON credentials(instagram_token_expires_at)"
+        )
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS publish_jobs (
+                id TEXT PRIMARY KEY,
+                user_id INTEGER NOT NULL REFERENCES users(id),
+                status TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                request TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                checkpoint TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        try:
+            conn.execute("ALTER TABLE publish_jobs ADD COLUMN checkpoint TEXT")
+            conn.commit()
+        except Exception:
+            pass  # Column already exists
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_publish_jobs_status ON publish_jobs(status)"
+        )
         conn.commit()
 
 
@@ -104,6 +133,8 @@ def upsert_credentials(user_id: int, updates: dict) -> None:
         "public_base_url",
         "google_service_account_json",
         "instagram_token_expires_at",
+        "instagram_next_refresh_attempt_at",
+        "instagram_refresh_failures",
         "google_photos_refresh_token",
         "google_picker_session_id",
         "google_story_picker_session_id",
@@ -135,6 +166,27 @@ def upsert_credentials(user_id: int, updates: dict) -> None:
         conn.commit()
 
 
+def list_tokens_expiring_before(before: int, now: int, limit: int = 50) -> list[int]:
+    """Return user_ids whose live Instagram token expires before *before* (or has no
+    known expiry) and whose refresh backoff has passed — least recently failed first,
+    then soonest expiry. Already-expired tokens can't be refreshed and are skipped."""
+    with _conn() as conn:
+        rows = conn.execute(
+            """
+            SELECT user_id FROM credentials
+            WHERE instagram_access_token IS NOT NULL AND instagram_access_token != ''
+              AND (COALESCE(instagram_token_expires_at, 0) = 0
+                   OR instagram_token_expires_at BETWEEN ? AND ?)
+              AND COALESCE(instagram_next_refresh_attempt_at, 0) <= ?
+            ORDER BY COALESCE(instagram_next_refresh_attempt_at, 0),
+                     COALESCE(instagram_token_expires_at, 0)
+            LIMIT ?
+            """,
+            (now, before, now, limit),
+        ).fetchall()
+        return [row["user_id"] for row in rows]
+
+
 def has_credentials(user_id: int) -> bool:
     """Return True if the user has completed initial setup (credentials row exists)."""
     with _conn() as conn:
@@ -142,3 +194,62 @@ def has_credentials(user_id: int) -> bool:
             "SELECT user_id FROM credentials WHERE user_id = ?", (user_id,)
         ).fetchone()
         return row is not None
+
+
+# ---------------------------------------------------------------------------
+# Publish jobs
+# ---------------------------------------------------------------------------
+
+_PUBLISH_JOB_FIELDS = {"status", "stage", "request", "result", "error", "attempts", "checkpoint"}
+_PUBLISH_JOB_JSON_FIELDS = ("request", "result", "checkpoint")
+
+
+def _publish_job_row(row: sqlite3.Row) -> dict:
+    job = dict(row)
+    for field in _PUBLISH_JOB_JSON_FIELDS:
+        job[field] = json.loads(job[field]) if job[field] else None
+    return job
+
+
+def create_publish_job(job_id: str, user_id: int, request: dict) -> dict:
+    """Insert a queued publish job and return it."""
+    now = datetime.now(timezone.utc).isoformat()
+    with _conn() as conn:
+        conn.execute(
+            "INSERT INTO publish_jobs (id, user_id, status, stage, request, created_at, updated_at) "
+            "VALUES (?, ?, 'queued', 'queued', ?, ?, ?)",
+            (job_id, user_id, json.dumps(request), now, now),
+        )
+        conn.commit()
+    return get_publish_job(job_id)
+
+
+def update_publish_job(job_id: str, **fields) -> None:
+    """Update status/stage/request/result/error/attempts/checkpoint of a publish job."""
+    updates = {k: v for k, v in fields.items() if k in _PUBLISH_JOB_FIELDS}
+    for field in _PUBLISH_JOB_JSON_FIELDS:
+        if updates.get(field) is not None:
+            updates[field] = json.dumps(updates[field])
+    updates["updated_at"] = datetime.now(timezone.utc).isoformat()
+    set_clause = ", ".join(f"{k} = ?" for k in updates)
+    with _conn() as conn:
+        conn.execute(
+            f"UPDATE publish_jobs SET {set_clause} WHERE id = ?",
+            list(updates.values()) + [job_id],
+        )
+        conn.commit()
+
+
+def get_publish_job(job_id: str) -> dict | None:
+    with _conn() as conn:
+        row = conn.execute("SELECT * FROM publish_jobs WHERE id = ?", (job_id,)).fetchone()
+        return _publish_job_row(row) if row else None
+
+
+def list_unfinished_publish_jobs() -> list[dict]:
+    """Jobs still queued or running — used to resume work after a restart."""
+    with _conn() as conn:
+        rows = conn.execute(
+            "SELECT * FROM publish_jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+        ).fetchall()
+        return [_publish_job_row(row) for row in rows]
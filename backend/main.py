@@ -2,6 +2,7 @@
 
 import logging
 import os
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -57,9 +58,50 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         _log.warning("Could not restore user schedules: %s", e)
 
+    # Keep Instagram tokens fresh off the posting path
+    from apscheduler.triggers.interval import IntervalTrigger
+    from services.instagram_service import refresh_due_tokens
+    scheduler.add_job(
+        refresh_due_tokens,
+        trigger=IntervalTrigger(hours=1, jitter=300),
+        id="token_refresh_sweeper",
+        replace_existing=True,
+        next_run_time=datetime.now(timezone.utc) + timedelta(minutes=1),
+    )
+
+    # Pick up manual posts that were queued or in flight when the server stopped
+    from services.publish_job_service import resume_unfinished_jobs
+    try:
+        resume_unfinished_jobs()
+    except Exception as e:
+        _log.warning("Could not resume publish jobs: %s", e)
+
+    from services.schedule_service import gc_staged_media, sweep_stale_temp_files
+    scheduler.add_job(
+        sweep_stale_temp_files,
+        trigger=IntervalTrigger(hours=6),
+        id="temp_file_sweeper",
+        replace_existing=True,
+        next_run_time=datetime.now(timezone.utc) + timedelta(minutes=5),
+    )
+    scheduler.add_job(
+        gc_staged_media,
+        trigger=IntervalTrigger(hours=1),
+        id="staged_media_gc",
+        replace_existing=True,
+        next_run_time=datetime.now(timezone.utc) + timedelta(minutes=10),
+    )
+
     scheduler.start()
     yield
     scheduler.shutdown(wait=False)
+    from services import image_service
+    image_service.shutdown()
+    # Lookups cached since the last debounced write
+    from services.geocode_service import flush_geocode_cache
+    from services.instagram_service import flush_place_cache
+    flush_place_cache()
+    flush_geocode_cache()
 
 
 app = FastAPI(title="AutoInstaPost API", version="1.0.0", lifespan=lifespan)
@@ -75,7 +117,11 @@ app.add_middleware(
 from fastapi.middleware.gzip import GZipMiddleware
 app.add_middleware(GZipMiddleware, minimum_size=1024)
 
-# Serve temp images so Instagram can fetch them (use ngrok / public URL in prod)
+# Serve temp images so Instagram can fetch them (use ngrok / public URL in prod).
+# Staged media of pending posts is mounted first so /temp doesn't shadow it.
+from services.schedule_service import STAGED_MEDIA_DIR
+STAGED_MEDIA_DIR.mkdir(parents=True, exist_ok=True)
+app.mount("/temp/staged", StaticFiles(directory=str(STAGED_MEDIA_DIR)), name="staged")
 app.mount("/temp", StaticFiles(directory=str(TEMP_DIR)), name="temp")
 
 app.include_router(auth_router)
@@ -92,6 +138,14 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    """Prometheus scrape endpoint (not proxied by nginx — scrape on localhost)."""
+    from fastapi.responses import PlainTextResponse
+    from services import metrics
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 # Serve built React frontend — must be last so API routes take priority
 _frontend_dist = Path(__file__).parent.parent / "frontend" / "dist"
 if _frontend_dist.exists():
@@ -1,6 +1,7 @@
 """Auth endpoints — register, login, credentials, Instagram OAuth."""
 
 import os
+import time
 
 import bcrypt as _bcrypt
 import httpx as _httpx
@@ -104,7 +105,23 @@ def save_credentials(
     current_user: dict = Depends(get_current_user),
 ):
     updates = {k: v for k, v in req.model_dump().items() if v is not None}
+    previous = get_credentials(current_user["id"]) or {}
+    if updates.get("instagram_access_token", previous.get("instagram_access_token")) != \
+            previous.get("instagram_access_token"):
+        # A pasted token's expiry is unknown; the sweeper looks it up
+        updates.update(
+            instagram_token_expires_at=None,
+            instagram_next_refresh_attempt_at=None,
+            instagram_refresh_failures=0,
+        )
     upsert_credentials(current_user["id"], updates)
+
+    # Replaced AI keys must not keep their pooled SDK clients alive
+    from services.claude_service import evict_clients
+    evict_clients(*(
+        previous.get(k) for k in ("gemini_api_key", "anthropic_api_key")
+        if k in updates and updates[k] != previous.get(k)
+    ))
     return {"success": True}
 
 
@@ -164,6 +181,7 @@ def instagram_callback(code: str = None, state: str = None, error: str = None):
     if not r2.is_success:
         return RedirectResponse("/app?ig_error=longtoken_failed")
     long_token = r2.json()["access_token"]
+    expires_in = r2.json().get("expires_in")
 
     # Get user's Facebook Pages
     r3 = _httpx.get("https://graph.facebook.com/v21.0/me/accounts",
@@ -182,7 +200,13 @@ def instagram_callback(code: str = None, state: str = None, error: str = None):
             ig_account_id = data["instagram_business_account"]["id"]
             break
 
-    updates = {"instagram_access_token": long_token}
+    # A new token starts with a clean refresh record
+    updates = {
+        "instagram_access_token": long_token,
+        "instagram_token_expires_at": int(time.time()) + expires_in if expires_in else None,
+        "instagram_next_refresh_attempt_at": None,
+        "instagram_refresh_failures": 0,
+    }
     if ig_account_id:
         updates["instagram_account_id"] = ig_account_id
 
@@ -1,13 +1,19 @@
 """Routes for generating captions via Gemini."""
 
+import json
+
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from auth import get_current_user
 from db import get_credentials
-from services.claude_service import generate_caption
-from services.drive_service import download_photo
-from services.schedule_service import extract_photo_metadata
+from services.claude_service import generate_caption, stream_caption
+from services.draft_service import delete_draft, get_batch, load_drafts, start_batch
+from services.drive_service import download_photo, list_photos
+from services.geocode_service import place_name
+from services.image_service import render_variants
+from services.schedule_service import extract_photo_metadata, load_posted_ids
 
 router = APIRouter(prefix="/caption", tags=["caption"])
 
@@ -17,19 +23,124 @@ class CaptionRequest(BaseModel):
     tone: str = "engaging"
 
 
+class BatchRequest(BaseModel):
+    selections: list[list[str]] = []  # each selection becomes one draft (1–4 file ids)
+    folder_id: str | None = None      # or: one draft per unposted photo in this folder
+    tone: str = "engaging"
+
+
+def _caption_previews(raw_images: list[tuple[bytes, str]]) -> list[tuple[bytes, str]]:
+    """Send the models a 1024 px preview instead of the original; the feed render is cached for posting."""
+    return [
+        (render_variants(data, ("preview", "feed"))["preview"], "image/jpeg")
+        for data, _ in raw_images
+    ]
+
+
 @router.post("/generate")
 def generate(req: CaptionRequest, current_user: dict = Depends(get_current_user)):
     creds = get_credentials(current_user["id"])
     try:
         raw_images = [download_photo(fid, creds=creds) for fid in req.file_ids]
         meta = extract_photo_metadata(raw_images[0][0]) if raw_images else {}
+        location_name = place_name(meta)
         caption = generate_caption(
-            raw_images,
+            _caption_previews(raw_images),
             tone=req.tone,
             date_str=meta.get("date"),
-            location_str=meta.get("location_name"),
+            location_str=location_name,
             creds=creds,
         )
-        return {"caption": caption, "location_name": meta.get("location_name") or ""}
+        return {"caption": caption, "location_name": location_name or ""}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/generate/stream")
+def generate_stream(req: CaptionRequest, current_user: dict = Depends(get_current_user)):
+    """
+    Server-sent events variant of /generate:
+    `meta` (location) → `token`* (caption text as it arrives) → `done` (final
+    caption with date line, body, hashtags) — or `error`.
+    """
+    creds = get_credentials(current_user["id"])
+
+    def events():
+        try:
+            raw_images = [download_photo(fid, creds=creds) for fid in req.file_ids]
+            meta = extract_photo_metadata(raw_images[0][0]) if raw_images else {}
+            location_name = place_name(meta)
+            yield _sse("meta", {"location_name": location_name or ""})
+            for kind, payload in stream_caption(
+                _caption_previews(raw_images),
+                tone=req.tone,
+                date_str=meta.get("date"),
+                location_str=location_name,
+                creds=creds,
+            ):
+                if kind == "token":
+                    yield _sse("token", {"text": payload})
+                else:
+                    yield _sse("done", {**payload, "location_name": location_name or ""})
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ---------------------------------------------------------------------------
+# Bulk drafting
+# ---------------------------------------------------------------------------
+
+@router.post("/batch")
+def create_batch(req: BatchRequest, current_user: dict = Depends(get_current_user)):
+    user_id = current_user["id"]
+    creds = get_credentials(user_id)
+
+    selections = [s for s in req.selections if s]
+    if any(len(s) > 4 for s in selections):
+        raise HTTPException(status_code=400, detail="Carousels support at most 4 images")
+    if req.folder_id:
+        try:
+            photos = list_photos(req.folder_id, creds=creds)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        posted = load_posted_ids(user_id)
+        selections += [
+            [p["id"]] for p in photos
+            if p["id"] not in posted and p.get("mimeType") in ("image/jpeg", "image/png")
+        ]
+
+    try:
+        batch_id = start_batch(selections, tone=req.tone, creds=creds, user_id=user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"batch_id": batch_id, "total": len(selections)}
+
+
+@router.get("/batch/{batch_id}")
+def batch_status(batch_id: str, current_user: dict = Depends(get_current_user)):
+    status = get_batch(batch_id, current_user["id"])
+    if status is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return status
+
+
+@router.get("/drafts")
+def list_drafts(current_user: dict = Depends(get_current_user)):
+    return load_drafts(current_user["id"])
+
+
+@router.delete("/drafts/{draft_id}")
+def remove_draft(draft_id: str, current_user: dict = Depends(get_current_user)):
+    if not delete_draft(draft_id, current_user["id"]):
+        raise HTTPException(status_code=404, detail="Draft not found")
+    return {"success": True}
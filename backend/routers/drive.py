@@ -8,7 +8,8 @@ from pydantic import BaseModel
 
 from auth import get_current_user, _get_secret
 from db import get_credentials, get_user_by_id, upsert_credentials
-from services.drive_service import download_photo, get_folder_info, list_photos
+from services.drive_service import download_photo, get_folder_info, get_photo_md5, list_photos
+from services.image_service import cached_variant, render_variants
 
 router = APIRouter(prefix="/drive", tags=["drive"])
 
@@ -93,15 +94,33 @@ def put_saved_folders(folders: list[SavedFolder], current_user: dict = Depends(g
     return {"ok": True}
 
 
+# Variants the browser may ask for instead of the original.
+_BROWSER_VARIANTS = ("thumb", "preview")
+
+
 @router.get("/photo/{file_id}/raw")
-def get_photo_raw(file_id: str, token: str | None = Query(default=None)):
-    """Serve a Drive photo. Auth via ?token= query param (needed for <img> tags)."""
+def get_photo_raw(file_id: str, token: str | None = Query(default=None), variant: str | None = Query(default=None)):
+    """
+    Serve a Drive photo. Auth via ?token= query param (needed for <img> tags).
+    ?variant=thumb|preview serves a small cached rendering instead of the original.
+    """
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
+    if variant is not None and variant not in _BROWSER_VARIANTS:
+        raise HTTPException(status_code=400, detail=f"variant must be one of {', '.join(_BROWSER_VARIANTS)}")
     user = _user_from_token_param(token)
     creds = get_credentials(user["id"])
     try:
-        data, mime_type = download_photo(file_id, creds=creds)
-        return Response(content=data, media_type=mime_type)
+        if variant is None:
+            data, mime_type = download_photo(file_id, creds=creds)
+            return Response(content=data, media_type=mime_type)
+
+        md5 = get_photo_md5(file_id, creds=creds)
+        data = cached_variant(md5, variant) if md5 else None
+        if data is None:
+            original, _ = download_photo(file_id, creds=creds)
+            data = render_variants(original, _BROWSER_VARIANTS)[variant]
+        # Content-addressed: the same file id and content always render the same bytes
+        return Response(content=data, media_type="image/jpeg", headers={"Cache-Control": "private, max-age=86400"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,7 +1,7 @@
 """Routes for schedule configuration and pending post approvals."""
 
 from fastapi import APIRouter, Depends, HTTPException, Request
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from auth import get_current_user
 from db import get_credentials
@@ -36,6 +36,9 @@ class ScheduleConfig(BaseModel):
     tone: str = "engaging"
     require_approval: bool = True
     default_caption: str = DEFAULT_CAPTION
+    pregen_lead_minutes: int = 30
+    location_radius_km: float = Field(1.0, gt=0)
+    location_max_days: float = Field(0, ge=0)
 
 
 @router.get("/timezone")
@@ -267,12 +270,16 @@ def get_status(request: Request, current_user: dict = Depends(get_current_user))
 def _reschedule_user(scheduler, config: dict, user_id: int) -> None:
     """Remove existing job for this user and add a new one based on config."""
     from apscheduler.triggers.cron import CronTrigger
-    from services.schedule_service import run_scheduled_job
+    from services.schedule_service import discard_prepared_post, run_scheduled_job
 
     job_id = f"auto_post_{user_id}"
 
     if scheduler.get_job(job_id):
         scheduler.remove_job(job_id)
+    if scheduler.get_job(f"pregen_post_{user_id}"):
+        scheduler.remove_job(f"pregen_post_{user_id}")
+    # Whatever was prepared belongs to the old schedule
+    discard_prepared_post(user_id)
 
     if not config.get("enabled"):
         return
@@ -301,6 +308,53 @@ def _reschedule_user(scheduler, config: dict, user_id: int) -> None:
         replace_existing=True,
         kwargs={"user_id": user_id},
     )
+    _schedule_pregen(scheduler, user_id, config.get("pregen_lead_minutes", 30))
+
+
+def _schedule_pregen(scheduler, user_id: int, lead_minutes: int, after=None) -> None:
+    """Arm a one-shot job that prepares the post `lead_minutes` before the next run."""
+    from datetime import datetime, timedelta
+    from apscheduler.triggers.date import DateTrigger
+
+    main_job = scheduler.get_job(f"auto_post_{user_id}")
+    if main_job is None or lead_minutes <= 0:
+        return
+
+    trigger = main_job.trigger
+    now = datetime.now(trigger.timezone)
+    fire_time = trigger.get_next_fire_time(None, max(now, after) if after else now)
+    if fire_time is None:
+        return
+    run_at = max(fire_time - timedelta(minutes=lead_minutes), now + timedelta(seconds=5))
+    if run_at >= fire_time:
+        return
+
+    # The chain only re-arms itself from _run_pregen, so a late run must still
+    # fire (never be dropped as a misfire); pregenerate_post skips a run already past.
+    scheduler.add_job(
+        _run_pregen,
+        trigger=DateTrigger(run_date=run_at),
+        id=f"pregen_post_{user_id}",
+        replace_existing=True,
+        misfire_grace_time=None,
+        coalesce=True,
+        kwargs={"scheduler": scheduler, "user_id": user_id, "fire_time": fire_time},
+    )
+
+
+def _run_pregen(scheduler, user_id: int, fire_time) -> None:
+    """Prepare the post for `fire_time`, then arm preparation for the run after it."""
+    from datetime import timedelta
+    from services.schedule_service import load_config, pregenerate_post
+
+    try:
+        pregenerate_post(user_id, fire_time)
+    finally:
+        config = load_config(user_id)
+        _schedule_pregen(
+            scheduler, user_id, config.get("pregen_lead_minutes", 30),
+            after=fire_time + timedelta(seconds=1),
+        )
 
 
 # Keep legacy alias for backwards compat (main.py import)
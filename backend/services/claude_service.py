@@ -1,7 +1,20 @@
 """Caption generation via Google Gemini (free) or Anthropic Claude (fallback)."""
 
 import base64
+import hashlib
+import logging
 import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Callable
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
 
 
 def generate_caption(
@@ -12,26 +25,72 @@ def generate_caption(
     creds: dict | None = None,
 ) -> str:
     """
-    Send one or more images to Gemini Flash and return a suggested Instagram caption.
-    Falls back to Claude Sonnet if gemini_api_key is not set.
+    Send one or more images to Gemini Flash and/or Claude Sonnet and return a
+    suggested Instagram caption. When both keys are configured the request is
+    routed (and hedged) across providers — see _route_caption.
     Optionally accepts date_str and location_str from photo EXIF to enrich the caption.
     `creds` is a per-user credentials dict; falls back to env vars when None.
     """
-    gemini_key = (
-        (creds.get("gemini_api_key") if creds else None)
-        or os.environ.get("GEMINI_API_KEY", "")
-    ).strip()
+    providers = _caption_providers(images, tone, location_str, creds)
+    if not providers:
+        raise RuntimeError("No Gemini or Anthropic API key configured.")
+    caption = _route_caption(providers)
+    return _append_date_line(caption, date_str)
+
+
+def stream_caption(
+    images: list[tuple[bytes, str]],
+    tone: str = "engaging",
+    date_str=None,
+    location_str=None,
+    creds: dict | None = None,
+):
+    """
+    Streaming variant of generate_caption. Yields ("token", text) as the model
+    produces output, then one ("done", {"caption", "body", "hashtags"}) with the
+    date line appended. Streams are not hedged: the best-ranked provider is used
+    and the next one is tried only if the first fails before sending a token.
+    """
+    streams = _caption_streams(images, tone, location_str, creds)
+    if not streams:
+        raise RuntimeError("No Gemini or Anthropic API key configured.")
+
+    order = sorted(streams, key=lambda n: _stats_for(n).expected_cost())
+    chunks: list[str] = []
+    for i, name in enumerate(order):
+        _acquire_provider_slot(name)
+        started = time.monotonic()
+        first_token_at = None
+        try:
+            for text in streams[name]():
+                if not text:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.monotonic()
+                    logger.info("Caption stream: %s first token after %.2fs", name, first_token_at - started)
+                chunks.append(text)
+                yield "token", text
+        except Exception as e:
+            _stats_for(name).record(time.monotonic() - started, ok=False)
+            if chunks or i == len(order) - 1:
+                raise
+            logger.warning("Caption stream: %s failed before first token — %s", name, e)
+            continue
+        _stats_for(name).record(time.monotonic() - started, ok=True)
+        logger.info("Caption stream: %s finished in %.2fs", name, time.monotonic() - started)
+        break
 
-    if gemini_key and gemini_key != "your-gemini-api-key-here":
-        caption = _generate_with_gemini(images, tone, gemini_key, location_str)
-    else:
-        caption = _generate_with_claude(images, tone, location_str, creds=creds)
+    caption = _append_date_line("".join(chunks).strip(), date_str)
+    body, hashtags = _split_hashtags(caption)
+    yield "done", {"caption": caption, "body": body, "hashtags": hashtags}
 
-    if date_str:
-        body, hashtags = _split_hashtags(caption)
-        caption = f"{body}\n\n📅 {date_str}\n\n{hashtags}" if hashtags else f"{body}\n\n📅 {date_str}"
 
-    return caption
+def _append_date_line(caption: str, date_str=None) -> str:
+    """Insert the EXIF date line between the caption body and its hashtags."""
+    if not date_str:
+        return caption
+    body, hashtags = _split_hashtags(caption)
+    return f"{body}\n\n📅 {date_str}\n\n{hashtags}" if hashtags else f"{body}\n\n📅 {date_str}"
 
 
 def _split_hashtags(caption: str):
@@ -54,6 +113,428 @@ def _split_hashtags(caption: str):
     return body, hashtags
 
 
+def _caption_providers(
+    images: list[tuple[bytes, str]],
+    tone: str,
+    location_str=None,
+    creds: dict | None = None,
+) -> dict[str, Callable[[], str]]:
+    """Return {provider: zero-arg caption call} for every provider with a key."""
+    providers: dict[str, Callable[[], str]] = {}
+    gemini_key = _gemini_key(creds)
+    if gemini_key:
+        providers["gemini"] = lambda: _generate_with_gemini(images, tone, gemini_key, location_str)
+    if _anthropic_key(creds, required=False):
+        providers["claude"] = lambda: _generate_with_claude(images, tone, location_str, creds=creds)
+    return providers
+
+
+def _caption_streams(
+    images: list[tuple[bytes, str]],
+    tone: str,
+    location_str=None,
+    creds: dict | None = None,
+) -> dict[str, Callable]:
+    """Like _caption_providers, but each callable returns an iterator of text chunks."""
+    streams: dict[str, Callable] = {}
+    gemini_key = _gemini_key(creds)
+    if gemini_key:
+        streams["gemini"] = lambda: _stream_with_gemini(images, tone, gemini_key, location_str)
+    if _anthropic_key(creds, required=False):
+        streams["claude"] = lambda: _stream_with_claude(images, tone, location_str, creds=creds)
+    return streams
+
+
+def _gemini_key(creds: dict | None) -> str:
+    key = (
+        (creds.get("gemini_api_key") if creds else None)
+        or os.environ.get("GEMINI_API_KEY", "")
+    ).strip()
+    return "" if key == "your-gemini-api-key-here" else key
+
+
+# ── Provider routing ──────────────────────────────────────────────────────────
+
+# Hard per-provider deadline (seconds) for one caption call.
+_PROVIDER_DEADLINES = {"gemini": 45.0, "claude": 60.0}
+# Hedge delay used until a provider has enough samples for a real p95.
+_DEFAULT_HEDGE_AFTER = {"gemini": 8.0, "claude": 10.0}
+_STATS_WINDOW = 50
+_STATS_MIN_SAMPLES = 5
+# How often the router checks whether a rate-limited attempt has started.
+_DEADLINE_POLL = 0.25
+
+_caption_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="caption")
+
+# Requests per minute allowed per provider (free Gemini tiers are tight).
+_PROVIDER_RPM = {
+    "gemini": int(os.environ.get("GEMINI_RPM", "10")),
+    "claude": int(os.environ.get("CLAUDE_RPM", "50")),
+}
+
+
+class _RateLimiter:
+    """Token bucket refilled at `rpm` per minute; acquire() blocks until a token is free."""
+
+    def __init__(self, rpm: int):
+        self.rate = max(rpm, 1) / 60.0
+        self.capacity = float(max(1, min(rpm, 5)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, returning how long the caller waited (seconds)."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+_rate_limiters: dict[str, _RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def _acquire_provider_slot(name: str) -> None:
+    with _rate_limiters_lock:
+        if name not in _rate_limiters:
+            _rate_limiters[name] = _RateLimiter(_PROVIDER_RPM.get(name, 60))
+        limiter = _rate_limiters[name]
+    waited = limiter.acquire()
+    if waited:
+        logger.info("Caption %s: waited %.1fs for rate limit", name, waited)
+
+
+class _ProviderStats:
+    """Rolling latency / error window for one caption provider."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._samples: deque = deque(maxlen=_STATS_WINDOW)  # (seconds, ok)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self._samples.append((seconds, ok))
+
+    def p95(self) -> float:
+        with self._lock:
+            latencies = sorted(sec for sec, ok in self._samples if ok)
+        if len(latencies) < _STATS_MIN_SAMPLES:
+            return _DEFAULT_HEDGE_AFTER.get(self.name, 10.0)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._samples:
+                return 0.0
+            return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+    def expected_cost(self) -> float:
+        """p95 inflated by the error rate — lower is a better primary."""
+        return self.p95() / max(0.05, 1.0 - self.error_rate())
+
+
+_provider_stats: dict[str, _ProviderStats] = {}
+_provider_stats_lock = threading.Lock()
+
+
+def _stats_for(name: str) -> _ProviderStats:
+    with _provider_stats_lock:
+        if name not in _provider_stats:
+            _provider_stats[name] = _ProviderStats(name)
+        return _provider_stats[name]
+
+
+class _Attempt:
+    """One provider call running on the caption pool."""
+
+    def __init__(self, name: str, call: Callable[[], str]):
+        self.name = name
+        self.started = time.monotonic()
+        # Set once the call gets past the rate limiter; waiting there doesn't count
+        self.deadline: float | None = None
+        self._recorded = False
+        self._lock = threading.Lock()
+        # Run in a copy of the caller's context so capture_llm_calls() sees the record
+        self.future = _caption_pool.submit(copy_context().run, self._run, call)
+
+    def _run(self, call: Callable[[], str]) -> str:
+        _acquire_provider_slot(self.name)
+        self.started = time.monotonic()
+        self.deadline = self.started + _PROVIDER_DEADLINES.get(self.name, 60.0)
+        try:
+            text = call()
+        except Exception:
+            self.record(ok=False)
+            raise
+        self.record(ok=True)
+        return text
+
+    def record(self, ok: bool) -> None:
+        # Exactly one sample per attempt, whether it finished or timed out
+        with self._lock:
+            if self._recorded:
+                return
+            self._recorded = True
+        _stats_for(self.name).record(time.monotonic() - self.started, ok)
+
+    def abandon(self) -> None:
+        """
+        Stop waiting for this attempt. A queued attempt is cancelled; one already
+        in flight can't be interrupted, but ends by its SDK's HTTP timeout.
+        """
+        self.future.cancel()
+
+
+def _route_caption(providers: dict[str, Callable[[], str]]) -> str:
+    """
+    Run the caption call on the provider with the best rolling record and, if it
+    hasn't answered within its p95, fire a hedged request at the next provider.
+    The first successful answer wins and the others are abandoned. Each call is
+    bounded by its provider deadline.
+    `providers` maps name → zero-arg callable, so fakes can be routed too.
+    """
+    order = sorted(providers, key=lambda n: _stats_for(n).expected_cost())
+    queue = list(order)
+    pending: dict = {}
+    last_error: Exception | None = None
+    next_hedge_at = 0.0
+
+    def launch() -> None:
+        nonlocal next_hedge_at
+        name = queue.pop(0)
+        logger.info("Caption routing: calling %s", name)
+        attempt = _Attempt(name, providers[name])
+        pending[attempt.future] = attempt
+        next_hedge_at = attempt.started + _stats_for(name).p95()
+
+    launch()
+
+    try:
+        while pending or queue:
+            if not pending:
+                # Everything in flight failed — move straight to the next provider
+                launch()
+
+            now = time.monotonic()
+            # Attempts still waiting on the rate limiter have no deadline yet — poll for it
+            earliest_deadline = min(
+                a.deadline if a.deadline is not None else now + _DEADLINE_POLL for a in pending.values()
+            )
+            wake_at = min(earliest_deadline, next_hedge_at) if queue else earliest_deadline
+            done, _ = wait(list(pending), timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                attempt = pending.pop(future)
+                try:
+                    text = future.result()
+                except Exception as e:
+                    logger.warning("Caption routing: %s failed — %s", attempt.name, e)
+                    last_error = e
+                    continue
+                logger.info(
+                    "Caption routing: %s answered in %.2fs",
+                    attempt.name, time.monotonic() - attempt.started,
+                )
+                return text
+
+            now = time.monotonic()
+            for future, attempt in list(pending.items()):
+                if attempt.deadline is not None and now >= attempt.deadline:
+                    logger.warning("Caption routing: %s exceeded its %.2fs deadline", attempt.name,
+                                   attempt.deadline - attempt.started)
+                    attempt.record(ok=False)
+                    attempt.abandon()
+                    pending.pop(future)
+                    last_error = TimeoutError(f"{attempt.name} caption timed out")
+
+            if queue and pending and now >= next_hedge_at:
+                logger.info("Caption routing: primary slower than p95 — hedging")
+                launch()
+    finally:
+        for attempt in pending.values():
+            attempt.abandon()
+
+    raise last_error or RuntimeError("Caption generation failed.")
+
+
+# ── Call instrumentation ──────────────────────────────────────────────────────
+
+# List-price USD per million (input, output) tokens, for cost estimates only.
+_PRICING_PER_MTOK = {
+    "gemini-2.5-flash": (0.30, 2.50),
+    "claude-sonnet-4-6": (3.00, 15.00),
+}
+
+_llm_calls = metrics.counter("llm_calls_total", "Caption model calls by provider, model and outcome")
+_llm_seconds = metrics.histogram("llm_call_seconds", "Caption model call wall time")
+_llm_ttft = metrics.histogram("llm_time_to_first_token_seconds", "Streamed caption time to first token")
+_llm_input_tokens = metrics.histogram("llm_input_tokens", "Input tokens per call", metrics.SIZE_BUCKETS)
+_llm_output_tokens = metrics.histogram("llm_output_tokens", "Output tokens per call", metrics.SIZE_BUCKETS)
+_llm_request_bytes = metrics.histogram("llm_request_bytes", "Encoded request payload per call", metrics.SIZE_BUCKETS)
+_llm_cost = metrics.counter("llm_cost_usd_total", "Estimated caption spend at list price")
+
+_captured_calls: ContextVar = ContextVar("captured_llm_calls", default=None)
+
+
+@contextmanager
+def capture_llm_calls():
+    """Collect the per-call records of every caption call made inside the block."""
+    calls: list[dict] = []
+    token = _captured_calls.set(calls)
+    try:
+        yield calls
+    finally:
+        _captured_calls.reset(token)
+
+
+class _LlmCall:
+    """Times one SDK call and, on exit, exports it as metrics and a call record."""
+
+    def __init__(self, provider: str, model: str, images: list[tuple[bytes, str]], prompt: str):
+        self.provider = provider
+        self.model = model
+        self.image_count = len(images)
+        # Both APIs carry images base64-encoded in a JSON body
+        self.request_bytes = sum(4 * ((len(data) + 2) // 3) for data, _ in images) + len(prompt.encode())
+        self.input_tokens: int | None = None
+        self.output_tokens: int | None = None
+        self.ttft: float | None = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def usage(self, input_tokens, output_tokens) -> None:
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+
+    def first_token(self) -> None:
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.started
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.started
+        if exc_type is None:
+            outcome = "ok"
+        elif exc_type is GeneratorExit:
+            outcome = "cancelled"
+        elif "timeout" in exc_type.__name__.lower():
+            outcome = "timeout"
+        else:
+            outcome = "error"
+
+        price_in, price_out = _PRICING_PER_MTOK.get(self.model, (0.0, 0.0))
+        cost = ((self.input_tokens or 0) * price_in + (self.output_tokens or 0) * price_out) / 1_000_000
+        record = {
+            "provider": self.provider,
+            "model": self.model,
+            "images": self.image_count,
+            "request_bytes": self.request_bytes,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "seconds": round(seconds, 3),
+            "cost_usd": round(cost, 6),
+            "outcome": outcome,
+        }
+        if self.ttft is not None:
+            record["ttft_seconds"] = round(self.ttft, 3)
+
+        labels = {"provider": self.provider, "model": self.model}
+        _llm_calls.inc(outcome=outcome, **labels)
+        _llm_seconds.observe(seconds, **labels)
+        _llm_request_bytes.observe(self.request_bytes, **labels)
+        if self.input_tokens is not None:
+            _llm_input_tokens.observe(self.input_tokens, **labels)
+        if self.output_tokens is not None:
+            _llm_output_tokens.observe(self.output_tokens, **labels)
+        if self.ttft is not None:
+            _llm_ttft.observe(self.ttft, **labels)
+        _llm_cost.inc(cost, **labels)
+
+        calls = _captured_calls.get()
+        if calls is not None:
+            calls.append(record)
+        logger.info(
+            "LLM call %s/%s: %s in %.2fs — %d image(s), %d KB, tokens in=%s out=%s, ~$%.5f",
+            self.provider, self.model, outcome, seconds, self.image_count,
+            self.request_bytes // 1024, self.input_tokens, self.output_tokens, cost,
+        )
+        return False
+
+
+# ── Client registry ───────────────────────────────────────────────────────────
+
+# SDK clients own an HTTP connection pool, so building one per caption throws
+# away warm keep-alive connections. Keep one client per (provider, api key),
+# least-recently-used first out once the registry is full. Evicted clients are
+# never closed here: a caption may still be using one, so it is left to be
+# garbage-collected (closing its connections) once the last caller drops it.
+_CLIENT_CACHE_MAX = 32
+_clients: OrderedDict = OrderedDict()
+_clients_lock = threading.Lock()
+
+
+def _key_fingerprint(api_key: str) -> str:
+    """Registry key for an API key — never keep the raw secret as a dict key."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def _build_client(provider: str, api_key: str):
+    if provider == "gemini":
+        from google import genai
+        from google.genai import types
+
+        # Bound every request so an abandoned hedge frees its pool worker
+        timeout_ms = int(_PROVIDER_DEADLINES["gemini"] * 1000)
+        return genai.Client(api_key=api_key, http_options=types.HttpOptions(timeout=timeout_ms))
+    import anthropic
+    return anthropic.Anthropic(api_key=api_key)
+
+
+def _get_client(provider: str, api_key: str):
+    """Return a cached SDK client for *api_key*, building it on first use."""
+    cache_key = (provider, _key_fingerprint(api_key))
+    start = time.perf_counter()
+    with _clients_lock:
+        client = _clients.get(cache_key)
+        if client is not None:
+            _clients.move_to_end(cache_key)
+    reused = client is not None
+    if not reused:
+        client = _build_client(provider, api_key)
+        with _clients_lock:
+            # Another thread may have built one meanwhile — keep the first.
+            client = _clients.setdefault(cache_key, client)
+            _clients.move_to_end(cache_key)
+            while len(_clients) > _CLIENT_CACHE_MAX:
+                _clients.popitem(last=False)
+    logger.info(
+        "Caption client %s: %s in %.1f ms",
+        provider, "reused" if reused else "created", (time.perf_counter() - start) * 1000,
+    )
+    return client
+
+
+def evict_clients(*api_keys: str | None) -> None:
+    """Drop cached clients for the given keys (e.g. after a user replaces them)."""
+    fingerprints = {_key_fingerprint(k.strip()) for k in api_keys if k and k.strip()}
+    if not fingerprints:
+        return
+    with _clients_lock:
+        for k in [k for k in _clients if k[1] in fingerprints]:
+            del _clients[k]
+
+
 # ── Prompt (shared) ──────────────────────────────────────────────────────────
 
 def _caption_prompt(num_images: int, tone: str, location_str=None) -> str:
@@ -85,45 +566,115 @@ def _caption_prompt(num_images: int, tone: str, location_str=None) -> str:
 
 # ── Gemini ────────────────────────────────────────────────────────────────────
 
+_GEMINI_MODEL = "gemini-2.5-flash"
+
+
 def _generate_with_gemini(
     images: list[tuple[bytes, str]], tone: str, api_key: str, location_str=None
 ) -> str:
-    from google import genai
-    from google.genai import types
+    client = _get_client("gemini", api_key)
+    prompt = _caption_prompt(len(images), tone, location_str)
+    with _LlmCall("gemini", _GEMINI_MODEL, images, prompt) as call:
+        response = client.models.generate_content(
+            model=_GEMINI_MODEL,
+            contents=_gemini_parts(images, prompt),
+        )
+        call.usage(*_gemini_usage(response))
+    return response.text.strip()
+
+
+def _stream_with_gemini(
+    images: list[tuple[bytes, str]], tone: str, api_key: str, location_str=None
+):
+    client = _get_client("gemini", api_key)
+    prompt = _caption_prompt(len(images), tone, location_str)
+    with _LlmCall("gemini", _GEMINI_MODEL, images, prompt) as call:
+        for chunk in client.models.generate_content_stream(
+            model=_GEMINI_MODEL,
+            contents=_gemini_parts(images, prompt),
+        ):
+            if chunk.text:
+                call.first_token()
+            # Usage totals arrive on the last chunk
+            if getattr(chunk, "usage_metadata", None):
+                call.usage(*_gemini_usage(chunk))
+            yield chunk.text or ""
 
-    client = genai.Client(api_key=api_key)
+
+def _gemini_parts(images: list[tuple[bytes, str]], prompt: str) -> list:
+    from google.genai import types
 
     parts = []
     for image_bytes, mime_type in images:
         parts.append(types.Part.from_bytes(data=image_bytes, mime_type=mime_type))
-    parts.append(_caption_prompt(len(images), tone, location_str))
+    parts.append(prompt)
+    return parts
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=parts,
-    )
-    return response.text.strip()
+
+def _gemini_usage(response) -> tuple:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None, None
+    return getattr(usage, "prompt_token_count", None), getattr(usage, "candidates_token_count", None)
 
 
 # ── Claude fallback ───────────────────────────────────────────────────────────
 
+_CLAUDE_MODEL = "claude-sonnet-4-6"
+
+
 def _generate_with_claude(
     images: list[tuple[bytes, str]],
     tone: str,
     location_str=None,
     creds: dict | None = None,
 ) -> str:
-    import anthropic
+    client = _get_client("claude", _anthropic_key(creds))
+    prompt = _caption_prompt(len(images), tone, location_str)
+    with _LlmCall("claude", _CLAUDE_MODEL, images, prompt) as call:
+        message = client.messages.create(
+            model=_CLAUDE_MODEL,
+            max_tokens=512,
+            messages=[{"role": "user", "content": _claude_content(images, prompt)}],
+            timeout=_PROVIDER_DEADLINES["claude"],
+        )
+        call.usage(message.usage.input_tokens, message.usage.output_tokens)
+    return message.content[0].text.strip()
 
+
+def _stream_with_claude(
+    images: list[tuple[bytes, str]],
+    tone: str,
+    location_str=None,
+    creds: dict | None = None,
+):
+    client = _get_client("claude", _anthropic_key(creds))
+    prompt = _caption_prompt(len(images), tone, location_str)
+    with _LlmCall("claude", _CLAUDE_MODEL, images, prompt) as call:
+        with client.messages.stream(
+            model=_CLAUDE_MODEL,
+            max_tokens=512,
+            messages=[{"role": "user", "content": _claude_content(images, prompt)}],
+            timeout=_PROVIDER_DEADLINES["claude"],
+        ) as stream:
+            for text in stream.text_stream:
+                call.first_token()
+                yield text
+            usage = stream.get_final_message().usage
+            call.usage(usage.input_tokens, usage.output_tokens)
+
+
+def _anthropic_key(creds: dict | None, required: bool = True) -> str:
     api_key = (
         (creds.get("anthropic_api_key") if creds else None)
         or os.environ.get("ANTHROPIC_API_KEY", "")
-    )
-    if not api_key:
+    ).strip()
+    if not api_key and required:
         raise RuntimeError("No Gemini or Anthropic API key configured.")
+    return api_key
 
-    client = anthropic.Anthropic(api_key=api_key)
 
+def _claude_content(images: list[tuple[bytes, str]], prompt: str) -> list[dict]:
     content = []
     for image_bytes, mime_type in images:
         b64 = base64.standard_b64encode(image_bytes).decode("utf-8")
@@ -131,11 +682,5 @@ def _generate_with_claude(
             "type": "image",
             "source": {"type": "base64", "media_type": mime_type, "data": b64},
         })
-    content.append({"type": "text", "text": _caption_prompt(len(images), tone, location_str)})
-
-    message = client.messages.create(
-        model="claude-sonnet-4-6",
-        max_tokens=512,
-        messages=[{"role": "user", "content": content}],
-    )
-    return message.content[0].text.strip()
+    content.append({"type": "text", "text": prompt})
+    return content
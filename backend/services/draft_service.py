@@ -0,0 +1,199 @@
+"""Caption drafts — bulk caption generation for many photo selections at once."""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from services.claude_service import capture_llm_calls, generate_caption
+from services.drive_service import download_photo
+from services.geocode_service import place_name
+from services.image_service import render_variants
+
+logger = logging.getLogger(__name__)
+
+_BASE_DATA_DIR = Path(__file__).parent.parent / "data"
+
+# Selections drafted concurrently across all batches (downloads + model calls).
+# Provider request rates are additionally capped inside claude_service.
+MAX_CONCURRENT_DRAFTS = 4
+# Selections one batch keeps in the pool queue at a time; the rest of a large
+# batch (e.g. a whole folder) waits in the batch and is fed in as drafts finish.
+BATCH_CHUNK_SIZE = 200
+# Finished batches stay pollable this long (drafts themselves are persisted).
+BATCH_RETENTION_SECONDS = 3600
+
+_pool = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_DRAFTS, thread_name_prefix="draft")
+_batches: dict[str, dict] = {}
+_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+# Draft persistence
+# ---------------------------------------------------------------------------
+
+def _drafts_file(user_id: int | None) -> Path:
+    if user_id is not None:
+        return _BASE_DATA_DIR / "users" / str(user_id) / "caption_drafts.json"
+    return _BASE_DATA_DIR / "caption_drafts.json"
+
+
+def load_drafts(user_id: int | None = None) -> list[dict]:
+    f = _drafts_file(user_id)
+    if not f.exists():
+        return []
+    try:
+        return json.loads(f.read_text())
+    except Exception:
+        return []
+
+
+def _save_drafts(drafts: list[dict], user_id: int | None) -> None:
+    f = _drafts_file(user_id)
+    f.parent.mkdir(parents=True, exist_ok=True)
+    f.write_text(json.dumps(drafts, indent=2))
+
+
+def _add_draft(draft: dict, user_id: int | None) -> None:
+    with _lock:
+        drafts = load_drafts(user_id)
+        drafts.insert(0, draft)
+        _save_drafts(drafts, user_id)
+
+
+def delete_draft(draft_id: str, user_id: int | None = None) -> bool:
+    with _lock:
+        drafts = load_drafts(user_id)
+        remaining = [d for d in drafts if d["id"] != draft_id]
+        if len(remaining) == len(drafts):
+            return False
+        _save_drafts(remaining, user_id)
+        return True
+
+
+# ---------------------------------------------------------------------------
+# Batches
+# ---------------------------------------------------------------------------
+
+def start_batch(
+    selections: list[list[str]],
+    tone: str = "engaging",
+    creds: dict | None = None,
+    user_id: int | None = None,
+) -> str:
+    """Queue one draft per selection and return the batch id to poll."""
+    if not selections:
+        raise ValueError("Nothing to draft — no selections given")
+
+    batch_id = uuid.uuid4().hex
+    batch = {
+        "id": batch_id,
+        "user_id": user_id,
+        "total": len(selections),
+        "done": 0,
+        "failed": 0,
+        "draft_ids": [],
+        "errors": [],
+        "waiting": deque(selections[BATCH_CHUNK_SIZE:]),
+        "started": time.monotonic(),
+        "finished": None,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    with _lock:
+        now = time.monotonic()
+        for old_id in [b["id"] for b in _batches.values()
+                       if b["finished"] and now - b["finished"] > BATCH_RETENTION_SECONDS]:
+            del _batches[old_id]
+        _batches[batch_id] = batch
+
+    for file_ids in selections[:BATCH_CHUNK_SIZE]:
+        _pool.submit(_draft_one, batch, file_ids, tone, creds, user_id)
+    logger.info("Drafts: batch %s queued with %d selection(s)", batch_id, len(selections))
+    return batch_id
+
+
+def _draft_one(batch: dict, file_ids: list[str], tone: str, creds: dict | None, user_id: int | None) -> None:
+    from services.schedule_service import extract_photo_metadata
+
+    try:
+        images = []
+        meta = {}
+        for i, fid in enumerate(file_ids):
+            image_bytes, _ = download_photo(fid, creds=creds)
+            if i == 0:
+                meta = extract_photo_metadata(image_bytes)
+            # The feed render is cached for when the draft gets posted
+            rendered = render_variants(image_bytes, ("preview", "feed"))
+            images.append((rendered["preview"], "image/jpeg"))
+
+        location_name = place_name(meta)
+        with capture_llm_calls() as llm_calls:
+            caption = generate_caption(
+                images,
+                tone=tone,
+                date_str=meta.get("date"),
+                location_str=location_name,
+                creds=creds,
+            )
+        draft = {
+            "id": str(uuid.uuid4()),
+            "batch_id": batch["id"],
+            "file_ids": file_ids,
+            "caption": caption,
+            "location_name": location_name or "",
+            "tone": tone,
+            "llm_calls": llm_calls,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        _add_draft(draft, user_id)
+        with _lock:
+            batch["done"] += 1
+            batch["draft_ids"].append(draft["id"])
+    except Exception as e:
+        logger.warning("Drafts: selection %s failed — %s", file_ids, e)
+        with _lock:
+            batch["failed"] += 1
+            batch["errors"].append({"file_ids": file_ids, "error": str(e)})
+
+    with _lock:
+        following = batch["waiting"].popleft() if batch["waiting"] else None
+        if batch["done"] + batch["failed"] < batch["total"]:
+            if following is not None:
+                _pool.submit(_draft_one, batch, following, tone, creds, user_id)
+            return
+        batch["finished"] = time.monotonic()
+    logger.info(
+        "Drafts: batch %s finished — %d drafted, %d failed, %.1f captions/min",
+        batch["id"], batch["done"], batch["failed"], _captions_per_minute(batch),
+    )
+
+
+def _captions_per_minute(batch: dict) -> float:
+    elapsed = (batch["finished"] or time.monotonic()) - batch["started"]
+    return batch["done"] / (elapsed / 60) if elapsed > 0 else 0.0
+
+
+def get_batch(batch_id: str, user_id: int | None = None) -> dict | None:
+    """Return progress for a batch (None if unknown or owned by another user)."""
+    with _lock:
+        batch = _batches.get(batch_id)
+        if batch is None or batch["user_id"] != user_id:
+            return None
+        status = {
+            "id": batch["id"],
+            "status": "finished" if batch["finished"] else "running",
+            "total": batch["total"],
+            "done": batch["done"],
+            "failed": batch["failed"],
+            "errors": list(batch["errors"]),
+            "captions_per_minute": round(_captions_per_minute(batch), 2),
+            "created_at": batch["created_at"],
+        }
+        draft_ids = set(batch["draft_ids"])
+    status["drafts"] = [d for d in load_drafts(user_id) if d["id"] in draft_ids]
+    return status
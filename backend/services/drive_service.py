@@ -85,6 +85,13 @@ def download_photo(file_id: str, creds: dict | None = None) -> tuple[bytes, str]
     return buffer.getvalue(), mime_type
 
 
+def get_photo_md5(file_id: str, creds: dict | None = None) -> str | None:
+    """Return Drive's md5Checksum of the file's content (a metadata call, no download)."""
+    service = _build_service(creds)
+    meta = service.files().get(fileId=file_id, fields="md5Checksum").execute()
+    return meta.get("md5Checksum")
+
+
 def download_photo_header(file_id: str, size: int = 131072, creds: dict | None = None) -> bytes:
     """
     Download only the first *size* bytes of a photo (default 128 KB).
@@ -0,0 +1,400 @@
+"""Reverse geocoding — GPS coordinates to "City, Region" place names for captions."""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# "nominatim" (default) or "offline" — the local GeoNames index, which answers
+# instantly and needs no network. With GEOCODER_REFINE=1 an offline answer is
+# replaced by Nominatim's when Nominatim succeeds.
+GEOCODER = os.environ.get("GEOCODER", "nominatim").strip().lower()
+GEOCODER_REFINE = os.environ.get("GEOCODER_REFINE", "").strip().lower() in ("1", "true", "yes")
+
+_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+# Offline index
+# ---------------------------------------------------------------------------
+
+# A GeoNames dump (https://download.geonames.org/export/dump/): cities15000.txt
+# or any cities*.txt, plus admin1CodesASCII.txt for region names.
+GEONAMES_DIR = Path(__file__).parent.parent / "data" / "geonames"
+GEONAMES_CITIES_FILE = Path(os.environ.get("GEONAMES_CITIES_FILE", str(GEONAMES_DIR / "cities15000.txt")))
+# Nearest city farther than this is no answer (open sea, wilderness).
+OFFLINE_MAX_KM = 75.0
+# Grid cell edge in degrees, and how many rings of cells a query searches
+# before falling back to checking every city.
+_CELL_DEG = 0.5
+_MAX_RINGS = 6
+_EARTH_KM = 6371.0088
+# Queries per vectorized pass (bounds the candidate-pair arrays).
+_LOOKUP_CHUNK = 20_000
+
+
+class _PlaceIndex:
+    """Cities bucketed into a lat/lng grid, queried in batches with NumPy."""
+
+    def __init__(self, lat: np.ndarray, lng: np.ndarray, labels: list[str]):
+        self.labels = labels
+        order = np.argsort(self._cell(lat, lng), kind="stable")
+        self.lat = np.radians(lat[order])
+        self.lng = np.radians(lng[order])
+        self.order = order
+        cells = self._cell(lat[order], lng[order])
+        self.cells, self.starts, self.counts = np.unique(cells, return_index=True, return_counts=True)
+
+    @staticmethod
+    def _cell(lat: np.ndarray, lng: np.ndarray, d_row=0, d_col=0) -> np.ndarray:
+        rows = np.floor((lat + 90) / _CELL_DEG).astype(np.int64) + d_row
+        cols = (np.floor((lng + 180) / _CELL_DEG).astype(np.int64) + d_col) % int(360 / _CELL_DEG)
+        return rows * 1000 + cols
+
+    @staticmethod
+    def _haversine(lat1, lng1, lat2, lng2) -> np.ndarray:
+        a = (np.sin((lat2 - lat1) / 2) ** 2
+             + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+        return 2 * _EARTH_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    def _scan(self, lat, lng, qlat, qlng, d_row: int, d_col: int, best_d, best_i) -> None:
+        """Improve best_d/best_i with the cities in the cell at (d_row, d_col) from each query."""
+        cells = self._cell(lat, lng, d_row, d_col)
+        pos = np.searchsorted(self.cells, cells).clip(max=len(self.cells) - 1)
+        counts = np.where(self.cells[pos] == cells, self.counts[pos], 0)
+        if not counts.any():
+            return
+        # Expand to one (query, city) pair per candidate
+        first = np.cumsum(counts) - counts
+        q = np.repeat(np.arange(len(lat)), counts)
+        c = self.starts[pos][q] + (np.arange(len(q)) - first[q])
+        d = self._haversine(qlat[q], qlng[q], self.lat[c], self.lng[c])
+        # Per-query minimum and the first candidate that attains it
+        found = np.flatnonzero(counts)
+        mins = np.minimum.reduceat(d, first[found])
+        at = np.flatnonzero(d == np.repeat(mins, counts[found]))
+        _, pick = np.unique(q[at], return_index=True)
+        better = mins < best_d[found]
+        best_d[found[better]] = mins[better]
+        best_i[found[better]] = c[at[pick]][better]
+
+    def nearest(self, lat: np.ndarray, lng: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (index into labels, distance in km) of the nearest city for each query;
+        distances beyond OFFLINE_MAX_KM only mean "nothing within reach".
+        """
+        best_d = np.full(len(lat), np.inf)
+        best_i = np.zeros(len(lat), dtype=np.int64)
+        qlat, qlng = np.radians(lat), np.radians(lng)
+
+        # Search rings of cells outwards. After ring k every city within k cell
+        # edges of the query has been seen; a query is done once its best is
+        # inside that radius or the radius already exceeds OFFLINE_MAX_KM.
+        active = np.arange(len(lat))
+        for k in range(_MAX_RINGS + 1):
+            ring = [(dr, dc) for dr in range(-k, k + 1) for dc in range(-k, k + 1) if max(abs(dr), abs(dc)) == k]
+            sub_d, sub_i = best_d[active], best_i[active]
+            for dr, dc in ring:
+                self._scan(lat[active], lng[active], qlat[active], qlng[active], dr, dc, sub_d, sub_i)
+            best_d[active], best_i[active] = sub_d, sub_i
+
+            reach = (k * _CELL_DEG * math.pi / 180 * _EARTH_KM
+                     * np.cos(np.radians(np.minimum(np.abs(lat[active]) + k * _CELL_DEG, 90))))
+            active = active[(best_d[active] > reach) & (reach < OFFLINE_MAX_KM)]
+            if not len(active):
+                break
+
+        # Near the poles cells are too narrow for the rings to reach — check exhaustively
+        for chunk in np.array_split(active, max(1, len(active) // 64)):
+            if len(chunk):
+                d = self._haversine(qlat[chunk, None], qlng[chunk, None], self.lat[None, :], self.lng[None, :])
+                best_i[chunk] = d.argmin(axis=1)
+                best_d[chunk] = d.min(axis=1)
+
+        return self.order[best_i], best_d
+
+    def lookup(self, coords: list[tuple[float, float]]) -> list[str | None]:
+        if not coords:
+            return []
+        arr = np.asarray(coords, dtype=np.float64)
+        names = []
+        for start in range(0, len(arr), _LOOKUP_CHUNK):
+            idx, dist = self.nearest(arr[start:start + _LOOKUP_CHUNK, 0], arr[start:start + _LOOKUP_CHUNK, 1])
+            names.extend(self.labels[i] if d <= OFFLINE_MAX_KM else None for i, d in zip(idx, dist))
+        return names
+
+
+_offline: _PlaceIndex | None = None
+_offline_failed = False
+
+
+def _load_geonames(cities_file: Path) -> _PlaceIndex:
+    regions = {}
+    admin1 = cities_file.parent / "admin1CodesASCII.txt"
+    if admin1.exists():
+        for line in admin1.read_text(encoding="utf-8").splitlines():
+            parts = line.split("\t")
+            if len(parts) >= 2:
+                regions[parts[0]] = parts[1]
+
+    lat, lng, labels = [], [], []
+    with cities_file.open(encoding="utf-8") as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 11:
+                continue
+            # name, latitude, longitude, country code, admin1 code
+            name, country, admin1_code = cols[1], cols[8], cols[10]
+            region = regions.get(f"{country}.{admin1_code}") or country
+            lat.append(float(cols[4]))
+            lng.append(float(cols[5]))
+            labels.append(", ".join(p for p in (name, region) if p))
+    if not labels:
+        raise RuntimeError(f"No places in {cities_file}")
+    return _PlaceIndex(np.array(lat), np.array(lng), labels)
+
+
+def _offline_index() -> _PlaceIndex | None:
+    """The offline index, loaded on first use; None if the GeoNames file is missing."""
+    global _offline, _offline_failed
+    with _lock:
+        if _offline is None and not _offline_failed:
+            try:
+                _offline = _load_geonames(GEONAMES_CITIES_FILE)
+                logger.info("Geocode: loaded %d places from %s", len(_offline.labels), GEONAMES_CITIES_FILE)
+            except Exception as e:
+                _offline_failed = True
+                logger.warning("Geocode: offline index unavailable (%s) — using Nominatim", e)
+        return _offline
+
+
+def reverse_geocode_offline(coords: list[tuple[float, float]]) -> list[str | None]:
+    """Nearest-city names from the local index (all None if it is not installed)."""
+    index = _offline_index()
+    return index.lookup(coords) if index else [None] * len(coords)
+
+
+# ---------------------------------------------------------------------------
+# Nominatim client
+# ---------------------------------------------------------------------------
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/reverse"
+# Nominatim's usage policy: at most one request per second, per application.
+NOMINATIM_MIN_INTERVAL = 1.0
+
+# Place names are global, so one cache serves every user. Keys are coordinates
+# rounded to 3 decimals (~100 m) — plenty for a city name.
+GEOCODE_CACHE_FILE = Path(__file__).parent.parent / "data" / "geocode_cache.json"
+_PRECISION = 3
+GEOCODE_CACHE_TTL = 90 * 86400
+GEOCODE_CACHE_EMPTY_TTL = 7 * 86400   # Nominatim had no name here (sea, wilderness)
+GEOCODE_CACHE_FAILURE_TTL = 900       # request failed — don't retry it on every photo
+# Newest entries kept once expired ones are pruned.
+GEOCODE_CACHE_MAX_ENTRIES = 50_000
+# Stores within this many seconds share one write of the cache file.
+_CACHE_FLUSH_DELAY = 30
+
+_geocode_cache: dict | None = None
+_cache_lock = threading.Lock()
+_flush_timer: threading.Timer | None = None
+# Cache keys being looked up right now → Event set when the result is cached
+_in_flight: dict[str, threading.Event] = {}
+
+
+class _TokenBucket:
+    """One token per `interval` seconds, no burst; acquire() blocks until it gets one."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take the next slot, returning how long the caller waited (seconds)."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+        return slot - now
+
+
+_nominatim_bucket = _TokenBucket(NOMINATIM_MIN_INTERVAL)
+
+
+def _key(lat: float, lng: float) -> str:
+    return f"{lat:.{_PRECISION}f},{lng:.{_PRECISION}f}"
+
+
+def _load_geocode_cache() -> dict:
+    global _geocode_cache
+    if _geocode_cache is None:
+        try:
+            _geocode_cache = json.loads(GEOCODE_CACHE_FILE.read_text()) if GEOCODE_CACHE_FILE.exists() else {}
+        except Exception:
+            _geocode_cache = {}
+    return _geocode_cache
+
+
+def _expired(entry: dict, now: float) -> bool:
+    if entry.get("failed"):
+        ttl = GEOCODE_CACHE_FAILURE_TTL
+    else:
+        ttl = GEOCODE_CACHE_TTL if entry.get("name") else GEOCODE_CACHE_EMPTY_TTL
+    return now - entry.get("at", 0) > ttl
+
+
+def _cached_name(key: str) -> tuple[bool, str | None]:
+    """Return (hit, name) for a cache key; expired entries are misses."""
+    with _cache_lock:
+        entry = _load_geocode_cache().get(key)
+    if not entry or _expired(entry, time.time()):
+        return False, None
+    return True, entry.get("name")
+
+
+def _store_name(key: str, name: str | None, failed: bool = False) -> None:
+    """Cache a lookup; the file is written by flush_geocode_cache shortly after."""
+    global _flush_timer
+    with _cache_lock:
+        entry = {"name": name, "at": int(time.time())}
+        if failed:
+            entry["failed"] = True
+        _load_geocode_cache()[key] = entry
+        if _flush_timer is None:
+            _flush_timer = threading.Timer(_CACHE_FLUSH_DELAY, flush_geocode_cache)
+            _flush_timer.daemon = True
+            _flush_timer.start()
+
+
+def flush_geocode_cache() -> None:
+    """Drop expired and failed entries, keep the newest GEOCODE_CACHE_MAX_ENTRIES, and write the file."""
+    global _geocode_cache, _flush_timer
+    with _cache_lock:
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+            _flush_timer = None
+        if _geocode_cache is None:
+            return
+        now = time.time()
+        live = [(k, e) for k, e in _geocode_cache.items() if not _expired(e, now)]
+        if len(live) > GEOCODE_CACHE_MAX_ENTRIES:
+            live = sorted(live, key=lambda item: item[1].get("at", 0))[-GEOCODE_CACHE_MAX_ENTRIES:]
+        _geocode_cache = dict(live)
+        # Failures only matter for minutes — they are never worth persisting
+        on_disk = {k: e for k, e in live if not e.get("failed")}
+        GEOCODE_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp = GEOCODE_CACHE_FILE.with_suffix(".tmp")
+        tmp.write_text(json.dumps(on_disk))
+        tmp.replace(GEOCODE_CACHE_FILE)
+
+
+def _nominatim(lat: float, lng: float) -> str | None:
+    """One Nominatim lookup. Raises on network/HTTP errors; None if it has no name."""
+    waited = _nominatim_bucket.acquire()
+    if waited > 5:
+        logger.info("Geocode: waited %.1fs for the Nominatim rate limit", waited)
+    resp = httpx.get(
+        NOMINATIM_URL,
+        params={"lat": lat, "lon": lng, "format": "json"},
+        headers={"User-Agent": "autoinstapost/1.0"},
+        timeout=8,
+    )
+    resp.raise_for_status()
+    addr = resp.json().get("address", {})
+    city = (
+        addr.get("city")
+        or addr.get("town")
+        or addr.get("village")
+        or addr.get("county")
+    )
+    region = addr.get("state") or addr.get("country")
+    parts = [p for p in [city, region] if p]
+    return ", ".join(parts) if parts else None
+
+
+def _nominatim_cached(key: str) -> str | None:
+    """
+    Name for a cache key. Concurrent callers asking for the same key share one
+    request: the first does the lookup, the rest wait for it to land in the cache.
+    """
+    while True:
+        hit, name = _cached_name(key)
+        if hit:
+            return name
+        with _cache_lock:
+            event = _in_flight.get(key)
+            leader = event is None
+            if leader:
+                event = _in_flight[key] = threading.Event()
+        if not leader:
+            event.wait()
+            continue
+
+        try:
+            lat, lng = (float(v) for v in key.split(","))
+            try:
+                name = _nominatim(lat, lng)
+                _store_name(key, name)
+            except Exception as e:
+                logger.warning("Reverse geocode failed for %s: %s", key, e)
+                name = None
+                _store_name(key, None, failed=True)
+            return name
+        finally:
+            with _cache_lock:
+                _in_flight.pop(key, None)
+            event.set()
+
+
+def _nominatim_many(keys: list[str]) -> dict[str, str | None]:
+    """Names for distinct cache keys (None where Nominatim has none or failed)."""
+    return {key: _nominatim_cached(key) for key in keys}
+
+
+# ---------------------------------------------------------------------------
+# Lookups
+# ---------------------------------------------------------------------------
+
+def reverse_geocode_many(coords: list[tuple[float, float] | None]) -> list[str | None]:
+    """
+    Place names for a batch of (lat, lng) pairs, in order. Entries may be None
+    (no GPS). Nominatim is asked once per distinct ~100 m cell; with
+    GEOCODER=offline the local index answers the whole batch in one pass.
+    Nominatim requests are rate-limited to one per second across all callers.
+    """
+    located = [i for i, c in enumerate(coords) if c]
+    names: list[str | None] = [None] * len(coords)
+
+    if GEOCODER == "offline" and _offline_index() is not None:
+        for i, name in zip(located, reverse_geocode_offline([coords[i] for i in located])):
+            names[i] = name
+        if not GEOCODER_REFINE:
+            return names
+
+    keys = {i: _key(*coords[i]) for i in located}
+    found = _nominatim_many(list(dict.fromkeys(keys.values())))
+    for i, key in keys.items():
+        if found[key] is not None or names[i] is None:
+            names[i] = found[key]
+    return names
+
+
+def reverse_geocode(lat: float, lng: float) -> str | None:
+    """Place name for one coordinate pair (cached)."""
+    return reverse_geocode_many([(lat, lng)])[0]
+
+
+def place_name(meta: dict) -> str | None:
+    """Place name for metadata from extract_photo_metadata, or None without GPS."""
+    gps = meta.get("gps")
+    return reverse_geocode(*gps) if gps else None
@@ -0,0 +1,400 @@
+"""
+Image rendering — feed JPEGs, story crops, caption previews and thumbnails.
+Every requested variant comes out of one decode, in a process pool so
+concurrent posts don't serialise on the GIL (source bytes reach the workers
+through shared memory). Renders are cached on disk by source md5 + variant spec.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context, shared_memory
+from pathlib import Path
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+# Worker processes (0 → transform inline in the calling thread).
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", str(min(os.cpu_count() or 1, 4))))
+# Transforms admitted per worker (running + queued); further callers wait.
+_QUEUE_DEPTH_PER_WORKER = 2
+# How long a caller waits for admission before giving up.
+_ADMISSION_TIMEOUT = 120
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max(IMAGE_WORKERS, 1) * _QUEUE_DEPTH_PER_WORKER)
+
+_transform_seconds = metrics.histogram(
+    "image_transform_seconds", "Image transform time including queueing, by operation"
+)
+_admission_wait_seconds = metrics.histogram(
+    "image_pool_admission_wait_seconds", "Time callers waited for a free image worker slot"
+)
+_cache_lookups = metrics.counter("image_render_cache_lookups_total", "Render cache lookups by variant and hit/miss")
+
+
+# ---------------------------------------------------------------------------
+# Rendering (runs inside the workers)
+# ---------------------------------------------------------------------------
+
+# EXIF orientations that rotate the image by 90°/270° (width and height swap).
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+# Resize in two steps — integer box reduce, then LANCZOS over the last ≤3× —
+# which is visually indistinguishable from a full LANCZOS pass and much cheaper.
+_REDUCING_GAP = 3.0
+
+
+# Every output the app renders from a source photo. Changing a spec changes its
+# cache key, so stale renders are simply never hit again.
+VARIANTS = {
+    # Feed post: ≤1440 px, highest quality under Instagram's size limit
+    "feed": {"box": (1440, 1440), "crop": False, "max_bytes": 7_000_000},
+    # Story: 9:16 centre crop
+    "story": {"box": (1080, 1920), "crop": True, "quality": 85},
+    # Caption model input: plenty for Gemini/Claude, a fraction of the bytes
+    "preview": {"box": (1024, 1024), "crop": False, "quality": 82},
+    # Photo grid / history thumbnails
+    "thumb": {"box": (320, 320), "crop": False, "quality": 75},
+}
+
+
+def _decode(image_bytes: bytes, names: list[str]):
+    """
+    Open an image, upright per EXIF, decoding JPEGs directly at the smallest
+    1/2, 1/4 or 1/8 scale that still serves every variant in *names*: a fit
+    variant must fill its box along the limiting side, a crop variant must
+    cover it. Skipping the full-size decode saves most of the CPU and memory on
+    24–48 MP originals.
+    """
+    from PIL import Image, ImageOps
+
+    img = Image.open(io.BytesIO(image_bytes))
+    if img.format == "JPEG":
+        transposed = img.getexif().get(0x0112) in _TRANSPOSED_ORIENTATIONS
+        w, h = img.size
+        scale = 0.0
+        for name in names:
+            box_w, box_h = VARIANTS[name]["box"]
+            if transposed:
+                box_w, box_h = box_h, box_w
+            pick = max if VARIANTS[name]["crop"] else min
+            scale = max(scale, pick(box_w / w, box_h / h))
+        if scale < 0.5:
+            img.draft(None, (max(1, int(w * scale + 0.999)), max(1, int(h * scale + 0.999))))
+    return ImageOps.exif_transpose(img)
+
+
+def _fit(img, box: tuple[int, int]):
+    from PIL import Image
+
+    w, h = img.size
+    scale = min(box[0] / w, box[1] / h)
+    if scale >= 1:
+        return img
+    return img.resize((int(w * scale), int(h * scale)), Image.LANCZOS, reducing_gap=_REDUCING_GAP)
+
+
+def _crop_to(img, box: tuple[int, int]):
+    """Centre-crop to the aspect ratio of *box*, then resize to exactly *box*."""
+    from PIL import Image
+
+    target_w, target_h = box
+    target_ratio = target_w / target_h
+    w, h = img.size
+    if w / h > target_ratio:
+        # Wider than the target — crop width
+        new_w = int(h * target_ratio)
+        left = (w - new_w) // 2
+        img = img.crop((left, 0, left + new_w, h))
+    elif w / h < target_ratio:
+        # Taller than the target — crop height
+        new_h = int(w / target_ratio)
+        top = (h - new_h) // 2
+        img = img.crop((0, top, w, top + new_h))
+    return img.resize((target_w, target_h), Image.LANCZOS, reducing_gap=_REDUCING_GAP)
+
+
+def _render(image_bytes: bytes, names: list[str]) -> dict[str, bytes]:
+    """Decode once and encode every variant in *names*."""
+    img = _decode(image_bytes, names)
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    decoded_size = img.size
+
+    out = {}
+    # Largest fit variant first, so each smaller one is resized from the previous output
+    fit_source = img
+    fits = sorted((n for n in names if not VARIANTS[n]["crop"]), key=lambda n: -max(VARIANTS[n]["box"]))
+    for name in fits:
+        spec = VARIANTS[name]
+        fit_source = _fit(fit_source, spec["box"])
+        if "max_bytes" in spec:
+            data, quality, passes = _encode_jpeg_to_size(fit_source, spec["max_bytes"])
+            logger.info(
+                "Compressed image: %d KB → %d KB (quality=%d, %d full encode(s))",
+                len(image_bytes) // 1024, len(data) // 1024, quality, passes,
+            )
+        else:
+            data = _encode_jpeg(fit_source, spec["quality"])
+        out[name] = data
+
+    for name in names:
+        spec = VARIANTS[name]
+        if not spec["crop"]:
+            continue
+        cropped = _crop_to(img if img.mode == "RGB" else img.convert("RGB"), spec["box"])
+        out[name] = _encode_jpeg(cropped, spec["quality"])
+        logger.info("%s crop: %dx%d → %dx%d (%d KB)", name.capitalize(), *decoded_size, *spec["box"], len(out[name]) // 1024)
+    return out
+
+
+# Quality range the feed encoder searches.
+_JPEG_MAX_QUALITY = 88
+_JPEG_MIN_QUALITY = 40
+# Aim this far under max_bytes so the predicted quality fits on its one confirming encode.
+_JPEG_SIZE_MARGIN = 0.92
+
+
+def _encode_jpeg(img, quality: int) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality, optimize=True)
+    return buf.getvalue()
+
+
+def _trial_image(img, grid: int = 4):
+    """
+    A 1/16-area stand-in for *img*: a grid×grid mosaic of full-resolution tiles,
+    one from the centre of each cell. Unlike a downsample it keeps the texture
+    that drives JPEG size. Tiles are 16 px aligned to match JPEG blocks.
+    """
+    from PIL import Image
+
+    w, h = img.size
+    tile_w = (w // (grid * grid)) // 16 * 16
+    tile_h = (h // (grid * grid)) // 16 * 16
+    if tile_w < 16 or tile_h < 16:
+        return img
+    trial = Image.new(img.mode, (tile_w * grid, tile_h * grid))
+    cell_w, cell_h = w // grid, h // grid
+    for row in range(grid):
+        for col in range(grid):
+            left = col * cell_w + (cell_w - tile_w) // 2 // 16 * 16
+            top = row * cell_h + (cell_h - tile_h) // 2 // 16 * 16
+            tile = img.crop((left, top, left + tile_w, top + tile_h))
+            trial.paste(tile, (col * tile_w, row * tile_h))
+    return trial
+
+
+def _encode_jpeg_to_size(img, max_bytes: int) -> tuple[bytes, int, int]:
+    """
+    Encode *img* at the highest quality that fits *max_bytes*, with at most two
+    full-size encodes. Returns (jpeg bytes, quality, full encodes used).
+
+    The first encode at the top quality almost always fits. When it doesn't,
+    a 1/16-area trial image (see _trial_image) is binary-searched for the quality whose size —
+    scaled by the full/trial ratio measured at the top quality — lands under
+    the target, and only that quality is encoded at full size.
+    """
+    data = _encode_jpeg(img, _JPEG_MAX_QUALITY)
+    if len(data) <= max_bytes:
+        return data, _JPEG_MAX_QUALITY, 1
+
+    trial = _trial_image(img)
+    ratio = len(data) / len(_encode_jpeg(trial, _JPEG_MAX_QUALITY))
+    target = max_bytes * _JPEG_SIZE_MARGIN
+    lo, hi = _JPEG_MIN_QUALITY, _JPEG_MAX_QUALITY - 1
+    quality = _JPEG_MIN_QUALITY
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        if len(_encode_jpeg(trial, mid)) * ratio <= target:
+            quality = mid
+            lo = mid + 1
+        else:
+            hi = mid - 1
+
+    data = _encode_jpeg(img, quality)
+    if len(data) > max_bytes:
+        logger.warning(
+            "JPEG still %d KB at quality=%d (limit %d KB)", len(data) // 1024, quality, max_bytes // 1024,
+        )
+    return data, quality, 2
+
+
+# ---------------------------------------------------------------------------
+# Render cache — content-addressed by source md5 + variant spec
+# ---------------------------------------------------------------------------
+
+_RENDER_CACHE_DIR = Path(__file__).parent.parent / "data" / "render_cache"
+# Oldest renders are pruned once the cache grows past this.
+RENDER_CACHE_MAX_BYTES = int(os.environ.get("RENDER_CACHE_MAX_MB", "1024")) * 1024 * 1024
+# Check the cache size every this many stores.
+_PRUNE_EVERY = 50
+
+_stores_since_prune = 0
+_cache_lock = threading.Lock()
+
+
+def _spec_key(name: str) -> str:
+    spec = json.dumps({"variant": name, **VARIANTS[name]}, sort_keys=True)
+    return hashlib.sha1(spec.encode()).hexdigest()[:12]
+
+
+def _cache_path(source_md5: str, name: str) -> Path:
+    return _RENDER_CACHE_DIR / source_md5[:2] / f"{source_md5}-{name}-{_spec_key(name)}.jpg"
+
+
+def cached_variant(source_md5: str, name: str) -> bytes | None:
+    """A previously rendered variant of the photo whose bytes hash to *source_md5*."""
+    path = _cache_path(source_md5, name)
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        _cache_lookups.inc(variant=name, result="miss")
+        return None
+    os.utime(path)  # pruning goes by mtime, so keep hot entries fresh
+    _cache_lookups.inc(variant=name, result="hit")
+    return data
+
+
+def _store_variant(source_md5: str, name: str, data: bytes) -> None:
+    global _stores_since_prune
+    path = _cache_path(source_md5, name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
+    with _cache_lock:
+        _stores_since_prune += 1
+        if _stores_since_prune < _PRUNE_EVERY:
+            return
+        _stores_since_prune = 0
+    prune_render_cache()
+
+
+def prune_render_cache() -> None:
+    """Delete least-recently-used renders until the cache is under RENDER_CACHE_MAX_BYTES."""
+    entries = []
+    for fp in _RENDER_CACHE_DIR.glob("*/*.jpg"):
+        try:
+            st = fp.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, fp))
+    total = sum(size for _, size, _ in entries)
+    if total <= RENDER_CACHE_MAX_BYTES:
+        return
+    removed = 0
+    for _, size, fp in sorted(entries):
+        fp.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+        if total <= RENDER_CACHE_MAX_BYTES * 0.9:
+            break
+    logger.info("Render cache: pruned %d file(s)", removed)
+
+
+# ---------------------------------------------------------------------------
+# Process pool
+# ---------------------------------------------------------------------------
+
+def _worker(names: list[str], shm_name: str, size: int) -> dict[str, bytes]:
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        data = shm.buf[:size].tobytes()
+    finally:
+        shm.close()
+    return _render(data, names)
+
+
+def _init_worker() -> None:
+    logging.basicConfig(level=logging.INFO)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the server process runs scheduler and HTTP threads, which fork() would copy mid-flight
+            _pool = ProcessPoolExecutor(
+                max_workers=IMAGE_WORKERS, mp_context=get_context("spawn"), initializer=_init_worker,
+            )
+            logger.info("Image pool started with %d worker(s)", IMAGE_WORKERS)
+        return _pool
+
+
+def _run(names: list[str], image_bytes: bytes) -> dict[str, bytes]:
+    op = "+".join(names)
+    started = time.monotonic()
+    if IMAGE_WORKERS <= 0:
+        result = _render(image_bytes, names)
+        _transform_seconds.observe(time.monotonic() - started, op=op)
+        return result
+
+    if not _slots.acquire(timeout=_ADMISSION_TIMEOUT):
+        raise RuntimeError("Image processing is saturated — try again shortly")
+    _admission_wait_seconds.observe(time.monotonic() - started)
+    shm = shared_memory.SharedMemory(create=True, size=max(len(image_bytes), 1))
+    try:
+        shm.buf[:len(image_bytes)] = image_bytes
+        return _get_pool().submit(_worker, names, shm.name, len(image_bytes)).result()
+    except BrokenProcessPool as e:
+        global _pool
+        with _pool_lock:
+            _pool = None  # a worker died (e.g. OOM on a huge image) — start fresh next time
+        raise RuntimeError(f"Image worker crashed during {op} render") from e
+    finally:
+        shm.close()
+        shm.unlink()
+        _slots.release()
+        _transform_seconds.observe(time.monotonic() - started, op=op)
+
+
+def render_variants(image_bytes: bytes, variants: tuple[str, ...] | list[str]) -> dict[str, bytes]:
+    """
+    Return {variant: jpeg bytes} for each requested name in VARIANTS. Cached
+    renders are reused; the rest come from a single decode in the worker pool.
+    """
+    unknown = [v for v in variants if v not in VARIANTS]
+    if unknown:
+        raise ValueError(f"Unknown image variant(s): {unknown}")
+    source_md5 = hashlib.md5(image_bytes).hexdigest()
+    out = {}
+    missing = []
+    for name in dict.fromkeys(variants):
+        data = cached_variant(source_md5, name)
+        if data is None:
+            missing.append(name)
+        else:
+            out[name] = data
+    if missing:
+        for name, data in _run(missing, image_bytes).items():
+            _store_variant(source_md5, name, data)
+            out[name] = data
+    return out
+
+
+def compress_for_instagram(image_bytes: bytes) -> bytes:
+    """Resize to ≤1440 px and encode as a feed JPEG under Instagram's size limit."""
+    return render_variants(image_bytes, ("feed",))["feed"]
+
+
+def crop_for_story(image_bytes: bytes) -> bytes:
+    """Centre-crop and resize to a 1080×1920 story JPEG."""
+    return render_variants(image_bytes, ("story",))["story"]
+
+
+def shutdown() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -3,22 +3,199 @@
 import json
 import logging
 import os
+import random
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable
 
 import httpx
 
+from services import metrics
+
 logger = logging.getLogger(__name__)
 
 GRAPH_BASE = "https://graph.facebook.com/v21.0"
 
 # Refresh when fewer than 7 days remain on the 60-day long-lived token
 REFRESH_THRESHOLD_DAYS = 7
+# The background sweeper owns refreshes; posting paths only refresh inline as a
+# last resort when a per-user token is this close to expiring.
+INLINE_REFRESH_THRESHOLD_DAYS = 1
 
 # Meta error codes that indicate a transient server-side problem (safe to retry)
 _TRANSIENT_META_CODES = {1, 2, 4, 17, 341}
-# Max attempts and backoff delays (seconds) for transient Graph API errors
-_RETRY_DELAYS = [5, 15, 30]
+# The subset that means "this app/account is being throttled" — retried, but not
+# counted against the shared circuit breakers, which track Meta being down.
+_THROTTLE_META_CODES = {4, 17, 341}
+# Retry policy for transient Graph API errors: decorrelated-jitter backoff
+# between _RETRY_BASE and _RETRY_CAP seconds, bounded by attempts and a deadline.
+_RETRY_MAX_ATTEMPTS = 4
+_RETRY_BASE = 2.0
+_RETRY_CAP = 30.0
+_RETRY_DEADLINE = 90.0
+# Circuit breaker per Graph endpoint: open after this many consecutive
+# transient failures, stay open for the cooldown, then allow one trial call.
+_BREAKER_THRESHOLD = 5
+_BREAKER_COOLDOWN = 120.0
+# Carousel children created/polled in parallel, and attempts per child
+_CAROUSEL_FANOUT = 4
+_CAROUSEL_ITEM_ATTEMPTS = 2
+
+
+# ---------------------------------------------------------------------------
+# Rate-limit budget — driven by Meta's usage headers
+# ---------------------------------------------------------------------------
+
+# Call priorities: publishing keeps headroom, polls slow down late, the rest early.
+PRIORITY_PUBLISH = "publish"
+PRIORITY_POLL = "poll"
+PRIORITY_LOW = "low"
+
+# Usage % at which each priority starts being paced, and the max delay (s) at 100 %.
+_BUDGET_PACING = {
+    PRIORITY_PUBLISH: (100, 0.0),
+    PRIORITY_POLL: (80, 10.0),
+    PRIORITY_LOW: (60, 30.0),
+}
+# Usage figures cover a rolling hour; trust a reading this long before decaying it.
+_BUDGET_FRESH_SECONDS = 300
+
+_graph_usage_gauge = metrics.gauge("ig_graph_usage_percent", "Latest Graph API usage % by scope")
+
+
+class _UsageBudget:
+    """Latest usage reading for the app or for one Instagram account."""
+
+    def __init__(self):
+        self.percent = 0.0
+        self.regain_at = 0.0     # Meta says we're blocked until this time
+        self.updated = 0.0
+
+    def update(self, percent: float, regain_minutes: float = 0) -> None:
+        self.percent = percent
+        self.updated = time.monotonic()
+        self.regain_at = self.updated + regain_minutes * 60 if regain_minutes else 0.0
+
+    def current(self) -> float:
+        """Usage %, linearly decayed once the reading is older than _BUDGET_FRESH_SECONDS."""
+        age = time.monotonic() - self.updated
+        if age <= _BUDGET_FRESH_SECONDS:
+            return self.percent
+        return max(0.0, self.percent * (1 - (age - _BUDGET_FRESH_SECONDS) / 3600))
+
+
+_app_budget = _UsageBudget()
+_account_budgets: dict[str, _UsageBudget] = {}
+_budget_lock = threading.Lock()
+
+
+def _account_budget(account_id: str) -> _UsageBudget:
+    with _budget_lock:
+        return _account_budgets.setdefault(account_id, _UsageBudget())
+
+
+def _usage_percent(figures: dict) -> float:
+    return float(max(
+        (figures.get(k) or 0) for k in ("call_count", "total_cputime", "total_time", "acc_id_util_pct")
+    ))
+
+
+def _record_usage(resp: httpx.Response, account_id: str | None) -> None:
+    """Parse X-App-Usage / X-Business-Use-Case-Usage from a Graph response."""
+    try:
+        app_usage = resp.headers.get("x-app-usage")
+        if app_usage:
+            _app_budget.update(_usage_percent(json.loads(app_usage)))
+            _graph_usage_gauge.set(_app_budget.percent, scope="app")
+
+        buc_usage = resp.headers.get("x-business-use-case-usage")
+        if buc_usage and account_id:
+            entries = [e for group in json.loads(buc_usage).values() for e in group]
+            if entries:
+                percent = max(_usage_percent(e) for e in entries)
+                regain = max((e.get("estimated_time_to_regain_access") or 0) for e in entries)
+                _account_budget(account_id).update(percent, regain)
+                _graph_usage_gauge.set(percent, scope="account", account=account_id)
+    except Exception as e:
+        logger.debug("Could not parse Graph usage headers: %s", e)
+
+
+def _budget_delay(priority: str, account_id: str | None) -> float:
+    """Seconds to hold a call of *priority* back, given current usage."""
+    budgets = [_app_budget] + ([_account_budget(account_id)] if account_id else [])
+    now = time.monotonic()
+    blocked_for = max((b.regain_at - now for b in budgets if b.regain_at > now), default=0.0)
+    usage = max(b.current() for b in budgets)
+
+    start, max_delay = _BUDGET_PACING[priority]
+    delay = 0.0
+    if usage >= start and max_delay:
+        delay = max_delay * min(1.0, (usage - start) / max(1, 100 - start))
+    if blocked_for and priority != PRIORITY_PUBLISH:
+        # Publishes go ahead and rely on retries; everything else waits it out (bounded)
+        delay = max(delay, min(blocked_for, max_delay))
+    return delay
+
+
+# Publish calls in flight. While the budget is tight, other calls queue behind them.
+_publishes_in_flight = 0
+_publishes_cond = threading.Condition()
+
+
+def _wait_for_publishes(timeout: float) -> float:
+    """Block until no publish call is in flight (at most *timeout* s); return the wait."""
+    start = time.monotonic()
+    with _publishes_cond:
+        _publishes_cond.wait_for(lambda: _publishes_in_flight == 0, timeout=timeout)
+    return time.monotonic() - start
+
+
+def _graph_request(
+    method: str,
+    url: str,
+    *,
+    priority: str = PRIORITY_LOW,
+    account_id: str | None = None,
+    **kwargs,
+) -> httpx.Response:
+    """
+    Send one Graph API request, paced by the usage budget, and record its usage
+    headers. While usage is high, poll and low-priority calls are delayed and then
+    also wait for in-flight publish calls, so publishes get the remaining budget first.
+    """
+    global _publishes_in_flight
+    if priority == PRIORITY_PUBLISH:
+        with _publishes_cond:
+            _publishes_in_flight += 1
+        try:
+            resp = httpx.request(method, url, **kwargs)
+        finally:
+            with _publishes_cond:
+                _publishes_in_flight -= 1
+                _publishes_cond.notify_all()
+        _record_usage(resp, account_id)
+        return resp
+
+    delay = _budget_delay(priority, account_id)
+    if delay:
+        logger.info("Graph usage high — delaying %s call by %.1fs", priority, delay)
+        time.sleep(delay)
+        waited = _wait_for_publishes(timeout=_BUDGET_PACING[priority][1])
+        if waited > 0.1:
+            logger.info("Graph usage high — %s call waited %.1fs behind publishes", priority, waited)
+    resp = httpx.request(method, url, **kwargs)
+    _record_usage(resp, account_id)
+    return resp
+
+
+def _is_throttled(resp: httpx.Response) -> bool:
+    try:
+        return resp.json().get("error", {}).get("code") in _THROTTLE_META_CODES
+    except Exception:
+        return False
 
 
 def _is_transient_error(resp: httpx.Response) -> bool:
@@ -30,6 +207,144 @@ def _is_transient_error(resp: httpx.Response) -> bool:
         return resp.status_code >= 500
 
 
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a Graph endpoint whose breaker is open."""
+
+    def __init__(self, endpoint: str, retry_after: float):
+        super().__init__(
+            f"Instagram {endpoint} endpoint is failing — circuit open, retry in {retry_after:.0f}s"
+        )
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class _CircuitBreaker:
+    """Closed → open after repeated transient failures → half-open after cooldown."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpenError while open; return True if this call is the half-open trial."""
+        with self._lock:
+            if self.failures < _BREAKER_THRESHOLD:
+                return False
+            remaining = self.opened_at + _BREAKER_COOLDOWN - time.monotonic()
+            if remaining > 0 or self.trial_in_flight:
+                raise CircuitOpenError(self.endpoint, max(remaining, 1.0))
+            self.trial_in_flight = True  # half-open: let exactly one call through
+            return True
+
+    def end_trial(self) -> None:
+        """Let the next call be a trial, however this one ended."""
+        with self._lock:
+            self.trial_in_flight = False
+
+    def record(self, healthy: bool) -> None:
+        with self._lock:
+            self.trial_in_flight = False
+            if healthy:
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.failures >= _BREAKER_THRESHOLD:
+                if self.failures == _BREAKER_THRESHOLD:
+                    logger.warning("Circuit for Graph endpoint '%s' opened", self.endpoint)
+                self.opened_at = time.monotonic()
+
+
+_breakers: dict[str, _CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def _breaker(endpoint: str) -> _CircuitBreaker:
+    with _breakers_lock:
+        return _breakers.setdefault(endpoint, _CircuitBreaker(endpoint))
+
+
+def _retry_after_seconds(resp: httpx.Response) -> float | None:
+    try:
+        return float(resp.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
+
+# Transport errors raised before the request reached Meta — always safe to resend.
+_CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def _graph_post_with_retry(
+    endpoint: str,
+    label: str,
+    url: str,
+    *,
+    account_id: str,
+    params: dict,
+    before_resend: Callable[[], None] | None = None,
+) -> dict:
+    """
+    POST to a Graph endpoint and return the JSON body (which must carry an "id").
+    Transient failures are retried with decorrelated jitter, honouring Retry-After,
+    until attempts or the deadline run out. The endpoint's circuit breaker fails the
+    call fast while Meta is having an incident.
+
+    A transport error after the request was sent (e.g. a read timeout) may hide a
+    call Meta already handled. For non-idempotent calls pass *before_resend*: it
+    runs before such a retry and raises if resending is unsafe.
+    """
+    breaker = _breaker(endpoint)
+    deadline = time.monotonic() + _RETRY_DEADLINE
+    delay = _RETRY_BASE
+    last_error: Exception | None = None
+    for attempt in range(1, _RETRY_MAX_ATTEMPTS + 1):
+        trial = breaker.before_call()
+        retry_after = None
+        try:
+            try:
+                resp = _graph_request(
+                    "POST", url, priority=PRIORITY_PUBLISH, account_id=account_id, params=params, timeout=30,
+                )
+            except httpx.TransportError as e:
+                breaker.record(healthy=False)
+                last_error = RuntimeError(f"{label} failed: {e}")
+                if before_resend is not None and not isinstance(e, _CONNECT_ERRORS):
+                    before_resend()
+            else:
+                if resp.is_success:
+                    breaker.record(healthy=True)
+                    data = resp.json()
+                    if "id" not in data:
+                        raise RuntimeError(f"{label} failed: {data}")
+                    return data
+                error = RuntimeError(f"{label} failed ({resp.status_code}): {resp.text}")
+                if not _is_transient_error(resp):
+                    breaker.record(healthy=True)  # the endpoint answered; the request was bad
+                    raise error
+                if not _is_throttled(resp):
+                    breaker.record(healthy=False)
+                last_error = error
+                retry_after = _retry_after_seconds(resp)
+        finally:
+            if trial:
+                breaker.end_trial()
+
+        if attempt == _RETRY_MAX_ATTEMPTS:
+            break
+        delay = min(_RETRY_CAP, random.uniform(_RETRY_BASE, delay * 3))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if time.monotonic() + delay > deadline:
+            logger.warning("%s: retry deadline reached after %d attempt(s)", label, attempt)
+            break
+        logger.warning("%s transient error — retrying in %.1fs (attempt %d)…", label, delay, attempt + 1)
+        time.sleep(delay)
+    raise last_error  # type: ignore[misc]
+
+
 # ---------------------------------------------------------------------------
 # Token helpers — read from creds dict (DB) or env var fallback
 # ---------------------------------------------------------------------------
@@ -62,11 +377,14 @@ def _save_token_data(
 ) -> None:
     """Persist a refreshed token to the DB (if user_id provided) or legacy file."""
     expires_at = int(time.time()) + expires_in_seconds
+    _remember_token(user_id, access_token, expires_at)
     if user_id is not None:
         from db import upsert_credentials
         upsert_credentials(user_id, {
             "instagram_access_token": access_token,
             "instagram_token_expires_at": expires_at,
+            "instagram_next_refresh_attempt_at": None,
+            "instagram_refresh_failures": 0,
         })
     else:
         # Legacy single-user: write to token.json
@@ -105,8 +423,10 @@ def exchange_for_long_lived_token(
     user_id: int | None = None,
 ) -> str:
     app_id, app_secret = _get_app_credentials(creds)
-    resp = httpx.get(
+    resp = _graph_request(
+        "GET",
         "https://graph.facebook.com/oauth/access_token",
+        priority=PRIORITY_PUBLISH,
         params={
             "grant_type": "fb_exchange_token",
             "client_id": app_id,
@@ -134,8 +454,10 @@ def refresh_long_lived_token(
     user_id: int | None = None,
 ) -> str:
     app_id, app_secret = _get_app_credentials(creds)
-    resp = httpx.get(
+    resp = _graph_request(
+        "GET",
         "https://graph.facebook.com/oauth/access_token",
+        priority=PRIORITY_PUBLISH,
         params={
             "grant_type": "fb_exchange_token",
             "client_id": app_id,
@@ -157,40 +479,179 @@ def refresh_long_lived_token(
     return token
 
 
-def get_valid_token(creds: dict | None = None, user_id: int | None = None) -> str:
-    """Return a valid access token, refreshing automatically when near expiry."""
+# ---------------------------------------------------------------------------
+# Token manager — in-memory validity cache with single-flight refresh
+# ---------------------------------------------------------------------------
+
+# Never refresh the same token more often than this, even if Meta keeps
+# returning tokens without an expiry.
+_REFRESH_MIN_INTERVAL = 3600
+# Wait this long after a failed refresh before trying again (grows per failure).
+_REFRESH_FAILURE_BACKOFF = [300, 900, 3600, 6 * 3600]
+
+
+class _TokenState:
+    """Current token for one user plus refresh bookkeeping."""
+
+    def __init__(self, source_token: str, expires_at: int):
+        self.source_token = source_token   # token as stored when this state was built
+        self.token = source_token
+        self.expires_at = expires_at
+        self.last_refresh = 0.0
+        self.failures = 0
+        self.retry_at = 0.0
+        self.lock = threading.Lock()       # held for the duration of a refresh
+
+    def needs_refresh(self, now: float, threshold_days: float = REFRESH_THRESHOLD_DAYS,
+                      refresh_unknown: bool = True) -> bool:
+        if not self.token or now < self.retry_at or now - self.last_refresh < _REFRESH_MIN_INTERVAL:
+            return False
+        if self.expires_at == 0:
+            return refresh_unknown
+        return self.expires_at - now < threshold_days * 86400
+
+
+_token_states: dict = {}
+_token_states_lock = threading.Lock()
+
+
+def _token_key(user_id: int | None, token: str):
+    return ("user", user_id) if user_id is not None else ("token", hash(token))
+
+
+def _token_state(creds: dict | None, user_id: int | None) -> _TokenState:
     data = _get_token_data(creds)
     token = data.get("access_token", "")
-    expires_at = data.get("expires_at", 0)
+    expires_at = data.get("expires_at", 0) or 0
+    key = _token_key(user_id, token)
+    with _token_states_lock:
+        state = _token_states.get(key)
+        # A token we neither started from nor produced means the user reconnected
+        if state is None or token not in (state.source_token, state.token):
+            state = _TokenState(token, expires_at)
+            # Backoff from failed refreshes survives restarts
+            state.retry_at = (creds or {}).get("instagram_next_refresh_attempt_at") or 0.0
+            state.failures = (creds or {}).get("instagram_refresh_failures") or 0
+            _token_states[key] = state
+        return state
+
 
-    threshold = REFRESH_THRESHOLD_DAYS * 86400
-    time_left = expires_at - time.time()
+def _remember_token(user_id: int | None, token: str, expires_at: int) -> None:
+    """Point the cache at a freshly exchanged/refreshed token."""
+    if user_id is None:
+        return
+    with _token_states_lock:
+        state = _token_states.get(("user", user_id))
+        if state is None:
+            state = _token_states[("user", user_id)] = _TokenState(token, expires_at)
+    state.token = token
+    state.expires_at = expires_at
+    state.last_refresh = time.time()
+    state.failures = 0
+    state.retry_at = 0.0
 
-    needs_refresh = (expires_at == 0) or (expires_at > 0 and time_left < threshold)
 
-    if needs_refresh:
-        reason = "expiry unknown (bootstrapping)" if expires_at == 0 else f"expires in {time_left / 86400:.1f} days"
+def get_valid_token(creds: dict | None = None, user_id: int | None = None) -> str:
+    """
+    Return the current access token. Per-user tokens are kept fresh by
+    refresh_due_tokens in the background; here they are only refreshed when
+    about to expire. Legacy single-user tokens are still refreshed inline.
+    """
+    state = _token_state(creds, user_id)
+    if user_id is None:
+        policy = {"threshold_days": REFRESH_THRESHOLD_DAYS, "refresh_unknown": True}
+    else:
+        policy = {"threshold_days": INLINE_REFRESH_THRESHOLD_DAYS, "refresh_unknown": False}
+    if state.needs_refresh(time.time(), **policy):
+        _refresh_token_state(state, creds, user_id, policy)
+    return state.token
+
+
+def _refresh_token_state(state: _TokenState, creds: dict | None, user_id: int | None, policy: dict) -> None:
+    """
+    Refresh *state* unless someone else just did. Concurrent callers for the same
+    user share one refresh; a failed refresh is not retried until its backoff has passed.
+    """
+    with state.lock:
+        now = time.time()
+        if not state.needs_refresh(now, **policy):
+            return  # another caller refreshed while we waited
+
+        reason = "expiry unknown (bootstrapping)" if state.expires_at == 0 else \
+            f"expires in {(state.expires_at - now) / 86400:.1f} days"
         logger.info("Instagram token — %s — refreshing now.", reason)
         try:
-            token = refresh_long_lived_token(token, creds=creds, user_id=user_id)
+            # _save_token_data also records the new expiry via _remember_token
+            state.token = refresh_long_lived_token(state.token, creds=creds, user_id=user_id)
+            state.last_refresh = time.time()
         except Exception as e:
-            logger.warning("Token auto-refresh failed: %s — using existing token.", e)
+            delay = _REFRESH_FAILURE_BACKOFF[min(state.failures, len(_REFRESH_FAILURE_BACKOFF) - 1)]
+            state.failures += 1
+            state.retry_at = time.time() + delay
+            logger.warning(
+                "Token auto-refresh failed: %s — using existing token, next attempt in %d min.",
+                e, delay // 60,
+            )
+            if user_id is not None:
+                from db import upsert_credentials
+                upsert_credentials(user_id, {
+                    "instagram_next_refresh_attempt_at": int(state.retry_at),
+                    "instagram_refresh_failures": state.failures,
+                })
 
-    return token
+
+# Users refreshed per sweep, and how many refresh calls run at once
+_SWEEP_MAX_USERS = 20
+_SWEEP_PARALLELISM = 4
+
+
+def refresh_due_tokens() -> None:
+    """
+    Background sweeper: refresh per-user tokens that expire within
+    REFRESH_THRESHOLD_DAYS (or whose expiry is unknown), soonest first.
+    Runs hourly with a small per-run cap, so refreshes spread across the day.
+    Expired tokens and tokens still backing off after a failure are skipped.
+    """
+    from db import get_credentials, list_tokens_expiring_before
+
+    now = int(time.time())
+    due = list_tokens_expiring_before(now + REFRESH_THRESHOLD_DAYS * 86400, now, _SWEEP_MAX_USERS)
+    if not due:
+        return
+    policy = {"threshold_days": REFRESH_THRESHOLD_DAYS, "refresh_unknown": True}
+
+    def refresh_one(user_id: int) -> None:
+        try:
+            creds = get_credentials(user_id)
+            state = _token_state(creds, user_id)
+            if state.needs_refresh(time.time(), **policy):
+                _refresh_token_state(state, creds, user_id, policy)
+        except Exception as e:
+            logger.warning("Token sweeper: user %s failed — %s", user_id, e)
+
+    logger.info("Token sweeper: %d token(s) due for refresh", len(due))
+    with ThreadPoolExecutor(max_workers=_SWEEP_PARALLELISM, thread_name_prefix="token-sweep") as pool:
+        list(pool.map(refresh_one, due))
 
 
-def get_account_info(creds: dict | None = None) -> dict:
+def get_account_info(creds: dict | None = None, user_id: int | None = None) -> dict:
     """Fetch the Instagram account username and profile picture from the Graph API."""
     try:
         account_id = _account_id(creds)
     except ValueError:
         return {"username": "", "name": "", "profile_picture_url": "", "not_configured": True}
-    token = get_valid_token(creds=creds)
+    token = get_valid_token(creds=creds, user_id=user_id)
     if not token:
         return {"username": "", "name": "", "profile_picture_url": "", "not_configured": True}
+    if _budget_delay(PRIORITY_LOW, account_id) >= _BUDGET_PACING[PRIORITY_LOW][1] / 2:
+        # Cosmetic call — not worth spending scarce quota on
+        logger.info("Graph usage high — skipping account info fetch")
+        return {"username": "", "name": "", "profile_picture_url": "", "throttled": True}
     try:
-        resp = httpx.get(
+        resp = _graph_request(
+            "GET",
             f"{GRAPH_BASE}/{account_id}",
+            account_id=account_id,
             params={"fields": "username,name,profile_picture_url", "access_token": token},
             timeout=10,
         )
@@ -221,14 +682,162 @@ def get_token_status(creds: dict | None = None) -> dict:
     }
 
 
+# ---------------------------------------------------------------------------
+# Container status polling model
+# ---------------------------------------------------------------------------
+
+_POLL_MIN_INTERVAL = 0.5
+_POLL_DEFAULT_FIRST = 1.0
+_POLL_MAX_INTERVAL = 5.0
+_POLL_BACKOFF = 1.7
+
+_container_ready_seconds = metrics.histogram(
+    "ig_container_ready_seconds", "Time from the first status poll to FINISHED, by media type",
+)
+_container_polls = metrics.histogram(
+    "ig_container_status_polls", "Status polls needed until FINISHED", (1, 2, 3, 4, 6, 8, 12, 20),
+)
+
+
+class _PollModel:
+    """Recent time-to-FINISHED samples for one media type."""
+
+    def __init__(self):
+        self._samples: deque = deque(maxlen=50)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def first_interval(self) -> float:
+        """Aim the first poll at the fast quarter of past containers."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < 5:
+            return _POLL_DEFAULT_FIRST
+        p25 = samples[len(samples) // 4]
+        return min(max(p25, _POLL_MIN_INTERVAL), _POLL_MAX_INTERVAL)
+
+
+_poll_models: dict[str, _PollModel] = {}
+_poll_models_lock = threading.Lock()
+
+
+def _poll_model(media_type: str) -> _PollModel:
+    with _poll_models_lock:
+        return _poll_models.setdefault(media_type, _PollModel())
+
+
 # ---------------------------------------------------------------------------
 # Core posting functions
 # ---------------------------------------------------------------------------
 
+# Place ids are global, so one cache serves every user. Keys are geohash cells:
+# precision 7 ≈ 150 m, 6 ≈ 1.2 km.
+PLACE_CACHE_FILE = Path(__file__).parent.parent / "data" / "place_cache.json"
+PLACE_CACHE_PRECISION = int(os.environ.get("PLACE_CACHE_GEOHASH_PRECISION", "7"))
+PLACE_CACHE_TTL = 30 * 86400
+PLACE_CACHE_NEGATIVE_TTL = 86400   # "no place here" is re-checked daily
+# Newest entries kept once expired ones are pruned.
+PLACE_CACHE_MAX_ENTRIES = 50_000
+# Stores within this many seconds share one write of the cache file.
+_PLACE_CACHE_FLUSH_DELAY = 30
+
+_place_cache: dict | None = None
+_place_cache_lock = threading.Lock()
+_place_flush_timer: threading.Timer | None = None
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def _geohash(lat: float, lng: float, precision: int) -> str:
+    lat_lo, lat_hi, lng_lo, lng_hi = -90.0, 90.0, -180.0, 180.0
+    chars, bits, ch, even = [], 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            ch = (ch << 1) | (lng >= mid)
+            lng_lo, lng_hi = (mid, lng_hi) if lng >= mid else (lng_lo, mid)
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            ch = (ch << 1) | (lat >= mid)
+            lat_lo, lat_hi = (mid, lat_hi) if lat >= mid else (lat_lo, mid)
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_ALPHABET[ch])
+            bits, ch = 0, 0
+    return "".join(chars)
+
+
+def _load_place_cache() -> dict:
+    global _place_cache
+    if _place_cache is None:
+        try:
+            _place_cache = json.loads(PLACE_CACHE_FILE.read_text()) if PLACE_CACHE_FILE.exists() else {}
+        except Exception:
+            _place_cache = {}
+    return _place_cache
+
+
+def _place_expired(entry: dict, now: float) -> bool:
+    ttl = PLACE_CACHE_TTL if entry.get("id") else PLACE_CACHE_NEGATIVE_TTL
+    return now - entry.get("at", 0) > ttl
+
+
+def _cached_place(key: str):
+    """Return (hit, place_id) for a geohash cell."""
+    with _place_cache_lock:
+        entry = _load_place_cache().get(key)
+    if not entry or _place_expired(entry, time.time()):
+        return False, None
+    return True, entry.get("id")
+
+
+def _store_place(key: str, place_id, name: str = "") -> None:
+    """Cache a lookup; the file is written by flush_place_cache shortly after."""
+    global _place_flush_timer
+    with _place_cache_lock:
+        _load_place_cache()[key] = {"id": place_id, "name": name, "at": int(time.time())}
+        if _place_flush_timer is None:
+            _place_flush_timer = threading.Timer(_PLACE_CACHE_FLUSH_DELAY, flush_place_cache)
+            _place_flush_timer.daemon = True
+            _place_flush_timer.start()
+
+
+def flush_place_cache() -> None:
+    """Drop expired entries, keep the newest PLACE_CACHE_MAX_ENTRIES, and write the file."""
+    global _place_cache, _place_flush_timer
+    with _place_cache_lock:
+        if _place_flush_timer is not None:
+            _place_flush_timer.cancel()
+            _place_flush_timer = None
+        if _place_cache is None:
+            return
+        now = time.time()
+        live = [(k, e) for k, e in _place_cache.items() if not _place_expired(e, now)]
+        if len(live) > PLACE_CACHE_MAX_ENTRIES:
+            live = sorted(live, key=lambda item: item[1].get("at", 0))[-PLACE_CACHE_MAX_ENTRIES:]
+        _place_cache = dict(live)
+        PLACE_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp = PLACE_CACHE_FILE.with_suffix(".tmp")
+        tmp.write_text(json.dumps(_place_cache))
+        tmp.replace(PLACE_CACHE_FILE)
+
+
 def search_instagram_location(lat: float, lng: float, creds: dict | None = None, user_id: int | None = None):
+    key = _geohash(lat, lng, PLACE_CACHE_PRECISION)
+    hit, place_id = _cached_place(key)
+    if hit:
+        logger.info("Instagram place cache hit for %s: %s", key, place_id)
+        return place_id
+
     try:
-        resp = httpx.get(
+        resp = _graph_request(
+            "GET",
             f"{GRAPH_BASE}/search",
+            account_id=(creds or {}).get("instagram_account_id"),
             params={
                 "type": "place",
                 "center": f"{lat},{lng}",
@@ -243,12 +852,74 @@ def search_instagram_location(lat: float, lng: float, creds: dict | None = None,
             data = resp.json().get("data", [])
             if data:
                 logger.info("Found Instagram place: %s (id=%s)", data[0]["name"], data[0]["id"])
+                _store_place(key, data[0]["id"], data[0].get("name", ""))
                 return data[0]["id"]
+            _store_place(key, None)
     except Exception as e:
         logger.warning("Instagram location search failed: %s", e)
     return None
 
 
+# ---------------------------------------------------------------------------
+# Resumable publishing
+# ---------------------------------------------------------------------------
+
+# Meta expires unpublished containers after 24 h; stop reusing them well before.
+CONTAINER_REUSE_SECONDS = 20 * 3600
+
+
+class ContainerError(RuntimeError):
+    """A container can't be published as-is (status ERROR, EXPIRED or already PUBLISHED)."""
+
+    def __init__(self, container_id: str, status: str):
+        super().__init__(f"Instagram container {container_id} is {status}")
+        self.container_id = container_id
+        self.status = status
+
+
+class PublishCheckpoint:
+    """
+    How far one post got — child/parent container ids and the published media id,
+    plus whatever the caller stores (temp image URLs, location). *save* receives a
+    JSON-serialisable copy after every step so a retry can resume from it.
+    """
+
+    def __init__(self, data: dict | None = None, save: Callable[[dict], None] | None = None):
+        self.data = dict(data or {})
+        self._save = save
+        self._lock = threading.Lock()
+        created = self.data.get("containers_created_at")
+        if created and time.time() - created > CONTAINER_REUSE_SECONDS:
+            logger.info("Publish checkpoint containers are too old to reuse — starting over")
+            for key in ("children", "parent_id", "containers_created_at"):
+                self.data.pop(key, None)
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            return self.data.get(key, default)
+
+    def update(self, **fields) -> None:
+        with self._lock:
+            self.data.update(fields)
+            if fields.get("parent_id") and "containers_created_at" not in self.data:
+                self.data["containers_created_at"] = time.time()
+            self._persist()
+
+    def set_child(self, image_url: str, container_id: str | None) -> None:
+        with self._lock:
+            children = self.data.setdefault("children", {})
+            if container_id:
+                children[image_url] = container_id
+                self.data.setdefault("containers_created_at", time.time())
+            else:
+                children.pop(image_url, None)
+            self._persist()
+
+    def _persist(self) -> None:
+        if self._save is not None:
+            self._save(json.loads(json.dumps(self.data)))
+
+
 def create_container(
     image_url: str,
     caption: str,
@@ -264,50 +935,68 @@ def create_container(
     }
     if location_id:
         params["location_id"] = location_id
-    last_error: Exception | None = None
-    for attempt, delay in enumerate([0] + _RETRY_DELAYS):
-        if delay:
-            logger.warning("Container creation transient error — retrying in %ds (attempt %d)…", delay, attempt)
-            time.sleep(delay)
-        resp = httpx.post(f"{GRAPH_BASE}/{acct_id}/media", params=params, timeout=30)
-        if resp.is_success:
-            data = resp.json()
-            if "id" not in data:
-                raise RuntimeError(f"Instagram container creation failed: {data}")
-            return data["id"]
-        if _is_transient_error(resp):
-            last_error = RuntimeError(f"Instagram container creation failed ({resp.status_code}): {resp.text}")
-            continue
-        raise RuntimeError(f"Instagram container creation failed ({resp.status_code}): {resp.text}")
-    raise last_error  # type: ignore[misc]
+    data = _graph_post_with_retry(
+        "media", "Instagram container creation", f"{GRAPH_BASE}/{acct_id}/media",
+        account_id=acct_id, params=params,
+    )
+    return data["id"]
+
+
+def _container_status(container_id: str, token: str, account_id: str | None) -> str:
+    resp = _graph_request(
+        "GET",
+        f"{GRAPH_BASE}/{container_id}",
+        priority=PRIORITY_POLL,
+        account_id=account_id,
+        params={"fields": "status_code", "access_token": token},
+        timeout=15,
+    )
+    if not resp.is_success:
+        raise RuntimeError(f"Container status check failed: {resp.text}")
+    return resp.json().get("status_code", "")
 
 
 def wait_for_container(
     container_id: str,
     max_wait: int = 60,
-    poll_interval: int = 5,
+    media_type: str = "IMAGE",
     creds: dict | None = None,
     user_id: int | None = None,
+    learn: bool = True,
 ) -> None:
+    """
+    Poll until the container is FINISHED. The first check waits the learned
+    delay for *media_type* (most containers are ready in 1–2 s), then the
+    interval grows exponentially with jitter up to _POLL_MAX_INTERVAL.
+
+    Only a container created just before the call (*learn*) that reaches
+    FINISHED feeds the delay model. Timeouts and errors are censored samples
+    and are left out, as are resumed containers whose age is unknown.
+    """
     token = get_valid_token(creds=creds, user_id=user_id)
-    waited = 0
+    account_id = (creds or {}).get("instagram_account_id")
+    started = time.monotonic()
+    interval = _poll_model(media_type).first_interval()
+    polls = 0
     status = ""
-    while waited < max_wait:
-        resp = httpx.get(
-            f"{GRAPH_BASE}/{container_id}",
-            params={"fields": "status_code", "access_token": token},
-            timeout=15,
-        )
-        if not resp.is_success:
-            raise RuntimeError(f"Container status check failed: {resp.text}")
-        status = resp.json().get("status_code", "")
+    while True:
+        remaining = max_wait - (time.monotonic() - started)
+        if remaining <= 0:
+            break
+        time.sleep(min(interval * random.uniform(0.8, 1.2), remaining))
+        interval = min(interval * _POLL_BACKOFF, _POLL_MAX_INTERVAL)
+        status = _container_status(container_id, token, account_id)
+        polls += 1
         logger.info("Container %s status: %s", container_id, status)
+        elapsed = time.monotonic() - started
         if status == "FINISHED":
+            if learn:
+                _poll_model(media_type).record(elapsed)
+            _container_ready_seconds.observe(elapsed, media_type=media_type)
+            _container_polls.observe(polls, media_type=media_type)
             return
-        if status == "ERROR":
-            raise RuntimeError(f"Instagram container processing failed (status=ERROR) for {container_id}")
-        time.sleep(poll_interval)
-        waited += poll_interval
+        if status in ("ERROR", "EXPIRED", "PUBLISHED"):
+            raise ContainerError(container_id, status)
     raise RuntimeError(f"Container {container_id} not ready after {max_wait}s (last status: {status})")
 
 
@@ -317,29 +1006,24 @@ def publish_container(
     user_id: int | None = None,
 ) -> str:
     acct_id = _account_id(creds)
-    last_error: Exception | None = None
-    for attempt, delay in enumerate([0] + _RETRY_DELAYS):
-        if delay:
-            logger.warning("Publish transient error — retrying in %ds (attempt %d)…", delay, attempt)
-            time.sleep(delay)
-        resp = httpx.post(
-            f"{GRAPH_BASE}/{acct_id}/media_publish",
-            params={
-                "creation_id": container_id,
-                "access_token": get_valid_token(creds=creds, user_id=user_id),
-            },
-            timeout=30,
-        )
-        if resp.is_success:
-            data = resp.json()
-            if "id" not in data:
-                raise RuntimeError(f"Instagram publish failed: {data}")
-            return data["id"]
-        if _is_transient_error(resp):
-            last_error = RuntimeError(f"Instagram publish failed ({resp.status_code}): {resp.text}")
-            continue
-        raise RuntimeError(f"Instagram publish failed ({resp.status_code}): {resp.text}")
-    raise last_error  # type: ignore[misc]
+    token = get_valid_token(creds=creds, user_id=user_id)
+
+    def ensure_unpublished() -> None:
+        # The lost response may have been a successful publish — never post twice
+        try:
+            status = _container_status(container_id, token, acct_id)
+        except Exception as e:
+            raise RuntimeError(f"Instagram publish interrupted and its outcome is unknown: {e}") from e
+        if status == "PUBLISHED":
+            raise ContainerError(container_id, status)
+
+    data = _graph_post_with_retry(
+        "media_publish", "Instagram publish", f"{GRAPH_BASE}/{acct_id}/media_publish",
+        account_id=acct_id,
+        params={"creation_id": container_id, "access_token": token},
+        before_resend=ensure_unpublished,
+    )
+    return data["id"]
 
 
 def post_photo(
@@ -348,10 +1032,49 @@ def post_photo(
     location_id=None,
     creds: dict | None = None,
     user_id: int | None = None,
+    progress: Callable[[str], None] | None = None,
+    checkpoint: PublishCheckpoint | None = None,
 ) -> str:
-    container_id = create_container(image_url, caption, location_id, creds=creds, user_id=user_id)
-    wait_for_container(container_id, creds=creds, user_id=user_id)
-    return publish_container(container_id, creds=creds, user_id=user_id)
+    report = progress or (lambda stage: None)
+    cp = checkpoint or PublishCheckpoint()
+    if cp.get("media_id"):
+        return cp.get("media_id")
+
+    report("creating_containers")
+    container_id = cp.get("parent_id")
+    if container_id:
+        logger.info("Resuming publish with existing container %s", container_id)
+        try:
+            report("processing")
+            wait_for_container(container_id, creds=creds, user_id=user_id, learn=False)
+        except ContainerError as e:
+            if e.status == "PUBLISHED":
+                raise
+            container_id = None
+    if not container_id:
+        container_id = create_container(image_url, caption, location_id, creds=creds, user_id=user_id)
+        cp.update(parent_id=container_id)
+        report("processing")
+        _wait_or_forget(container_id, "IMAGE", cp, creds, user_id)
+    report("publishing")
+    media_id = publish_container(container_id, creds=creds, user_id=user_id)
+    cp.update(media_id=media_id)
+    return media_id
+
+
+def _wait_or_forget(
+    container_id: str,
+    media_type: str,
+    cp: PublishCheckpoint,
+    creds: dict | None,
+    user_id: int | None,
+) -> None:
+    """Wait for a new parent container; drop it from the checkpoint if Instagram rejected it."""
+    try:
+        wait_for_container(container_id, media_type=media_type, creds=creds, user_id=user_id)
+    except ContainerError:
+        cp.update(parent_id=None)
+        raise
 
 
 def create_carousel_item_container(
@@ -360,29 +1083,53 @@ def create_carousel_item_container(
     user_id: int | None = None,
 ) -> str:
     acct_id = _account_id(creds)
+    data = _graph_post_with_retry(
+        "media", "Carousel item creation", f"{GRAPH_BASE}/{acct_id}/media",
+        account_id=acct_id,
+        params={
+            "image_url": image_url,
+            "is_carousel_item": "true",
+            "access_token": get_valid_token(creds=creds, user_id=user_id),
+        },
+    )
+    return data["id"]
+
+
+def _create_ready_carousel_item(
+    image_url: str,
+    creds: dict | None = None,
+    user_id: int | None = None,
+    checkpoint: PublishCheckpoint | None = None,
+) -> str:
+    """
+    Create one carousel child and wait until it is FINISHED, recreating it on
+    failure. A child already recorded in *checkpoint* is reused if still valid.
+    """
+    cp = checkpoint or PublishCheckpoint()
+    item_id = cp.get("children", {}).get(image_url)
+    if item_id:
+        try:
+            wait_for_container(item_id, media_type="CAROUSEL_ITEM", creds=creds, user_id=user_id, learn=False)
+            logger.info("Reusing carousel item %s for %s", item_id, image_url)
+            return item_id
+        except ContainerError:
+            cp.set_child(image_url, None)
+
     last_error: Exception | None = None
-    for attempt, delay in enumerate([0] + _RETRY_DELAYS):
-        if delay:
-            logger.warning("Carousel item creation transient error — retrying in %ds (attempt %d)…", delay, attempt)
-            time.sleep(delay)
-        resp = httpx.post(
-            f"{GRAPH_BASE}/{acct_id}/media",
-            params={
-                "image_url": image_url,
-                "is_carousel_item": "true",
-                "access_token": get_valid_token(creds=creds, user_id=user_id),
-            },
-            timeout=30,
-        )
-        if resp.is_success:
-            data = resp.json()
-            if "id" not in data:
-                raise RuntimeError(f"Carousel item creation failed: {data}")
-            return data["id"]
-        if _is_transient_error(resp):
-            last_error = RuntimeError(f"Carousel item creation failed ({resp.status_code}): {resp.text}")
-            continue
-        raise RuntimeError(f"Carousel item creation failed ({resp.status_code}): {resp.text}")
+    for attempt in range(1, _CAROUSEL_ITEM_ATTEMPTS + 1):
+        try:
+            item_id = create_carousel_item_container(image_url, creds=creds, user_id=user_id)
+            cp.set_child(image_url, item_id)
+            wait_for_container(item_id, media_type="CAROUSEL_ITEM", creds=creds, user_id=user_id)
+            return item_id
+        except CircuitOpenError:
+            raise
+        except RuntimeError as e:
+            last_error = e
+            if isinstance(e, ContainerError):
+                cp.set_child(image_url, None)
+            if attempt < _CAROUSEL_ITEM_ATTEMPTS:
+                logger.warning("Carousel item %s failed (%s) — recreating (attempt %d)…", image_url, e, attempt + 1)
     raise last_error  # type: ignore[misc]
 
 
@@ -402,22 +1149,11 @@ def create_carousel_container(
     }
     if location_id:
         params["location_id"] = location_id
-    last_error: Exception | None = None
-    for attempt, delay in enumerate([0] + _RETRY_DELAYS):
-        if delay:
-            logger.warning("Carousel container creation transient error — retrying in %ds (attempt %d)…", delay, attempt)
-            time.sleep(delay)
-        resp = httpx.post(f"{GRAPH_BASE}/{acct_id}/media", params=params, timeout=30)
-        if resp.is_success:
-            data = resp.json()
-            if "id" not in data:
-                raise RuntimeError(f"Carousel container creation failed: {data}")
-            return data["id"]
-        if _is_transient_error(resp):
-            last_error = RuntimeError(f"Carousel container creation failed ({resp.status_code}): {resp.text}")
-            continue
-        raise RuntimeError(f"Carousel container creation failed ({resp.status_code}): {resp.text}")
-    raise last_error  # type: ignore[misc]
+    data = _graph_post_with_retry(
+        "media", "Carousel container creation", f"{GRAPH_BASE}/{acct_id}/media",
+        account_id=acct_id, params=params,
+    )
+    return data["id"]
 
 
 def post_story(
@@ -427,32 +1163,25 @@ def post_story(
 ) -> str:
     """Post a single image as an Instagram Story."""
     acct_id = _account_id(creds)
-    last_error: Exception | None = None
-    for attempt, delay in enumerate([0] + _RETRY_DELAYS):
-        if delay:
-            logger.warning("Story creation transient error — retrying in %ds (attempt %d)…", delay, attempt)
-            time.sleep(delay)
-        resp = httpx.post(
-            f"{GRAPH_BASE}/{acct_id}/media",
-            params={
-                "image_url": image_url,
-                "media_type": "STORIES",
-                "access_token": get_valid_token(creds=creds, user_id=user_id),
-            },
-            timeout=30,
-        )
-        if resp.is_success:
-            data = resp.json()
-            if "id" not in data:
-                raise RuntimeError(f"Story container creation failed: {data}")
-            container_id = data["id"]
-            wait_for_container(container_id, creds=creds, user_id=user_id)
-            return publish_container(container_id, creds=creds, user_id=user_id)
-        if _is_transient_error(resp):
-            last_error = RuntimeError(f"Story creation failed ({resp.status_code}): {resp.text}")
-            continue
-        raise RuntimeError(f"Story creation failed ({resp.status_code}): {resp.text}")
-    raise last_error  # type: ignore[misc]
+    data = _graph_post_with_retry(
+        "media", "Story creation", f"{GRAPH_BASE}/{acct_id}/media",
+        account_id=acct_id,
+        params={
+            "image_url": image_url,
+            "media_type": "STORIES",
+            "access_token": get_valid_token(creds=creds, user_id=user_id),
+        },
+    )
+    container_id = data["id"]
+    wait_for_container(container_id, media_type="STORIES", creds=creds, user_id=user_id)
+    try:
+        return publish_container(container_id, creds=creds, user_id=user_id)
+    except ContainerError as e:
+        if e.status != "PUBLISHED":
+            raise
+        # The publish went through but its response was lost
+        logger.warning("Story container %s was already published", container_id)
+        return ""
 
 
 def post_carousel(
@@ -461,16 +1190,44 @@ def post_carousel(
     location_id=None,
     creds: dict | None = None,
     user_id: int | None = None,
+    progress: Callable[[str], None] | None = None,
+    checkpoint: PublishCheckpoint | None = None,
 ) -> str:
     if len(image_urls) < 2 or len(image_urls) > 4:
         raise ValueError(f"Carousel requires 2–4 images, got {len(image_urls)}")
 
-    item_ids = []
-    for url in image_urls:
-        item_id = create_carousel_item_container(url, creds=creds, user_id=user_id)
-        wait_for_container(item_id, creds=creds, user_id=user_id)
-        item_ids.append(item_id)
+    report = progress or (lambda stage: None)
+    cp = checkpoint or PublishCheckpoint()
+    if cp.get("media_id"):
+        return cp.get("media_id")
+
+    report("creating_containers")
+    carousel_id = cp.get("parent_id")
+    if carousel_id:
+        logger.info("Resuming publish with existing carousel container %s", carousel_id)
+        try:
+            report("processing")
+            wait_for_container(
+                carousel_id, media_type="CAROUSEL", creds=creds, user_id=user_id, learn=False,
+            )
+        except ContainerError as e:
+            if e.status == "PUBLISHED":
+                raise
+            carousel_id = None
+    if not carousel_id:
+        # Children are independent — create and poll them concurrently
+        with ThreadPoolExecutor(max_workers=min(len(image_urls), _CAROUSEL_FANOUT)) as pool:
+            futures = [
+                pool.submit(_create_ready_carousel_item, url, creds=creds, user_id=user_id, checkpoint=cp)
+                for url in image_urls
+            ]
+            item_ids = [f.result() for f in futures]  # keeps carousel order
 
-    carousel_id = create_carousel_container(item_ids, caption, location_id, creds=creds, user_id=user_id)
-    wait_for_container(carousel_id, creds=creds, user_id=user_id)
-    return publish_container(carousel_id, creds=creds, user_id=user_id)
+        carousel_id = create_carousel_container(item_ids, caption, location_id, creds=creds, user_id=user_id)
+        cp.update(parent_id=carousel_id)
+        report("processing")
+        _wait_or_forget(carousel_id, "CAROUSEL", cp, creds, user_id)
+    report("publishing")
+    media_id = publish_container(carousel_id, creds=creds, user_id=user_id)
+    cp.update(media_id=media_id)
+    return media_id
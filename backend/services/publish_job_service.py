@@ -0,0 +1,267 @@
+"""Publish jobs — manual Instagram posts run in the background and report progress."""
+
+import logging
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from db import (
+    create_publish_job,
+    get_credentials,
+    get_publish_job,
+    list_unfinished_publish_jobs,
+    update_publish_job,
+)
+
+logger = logging.getLogger(__name__)
+
+# Posts published concurrently across all users. Each job mostly waits on
+# Google downloads and Instagram container processing.
+MAX_CONCURRENT_PUBLISHES = 2
+
+# queued → downloading → uploading → creating_containers → processing → publishing → done
+# (any stage may end in "failed")
+STAGES = ("queued", "downloading", "uploading", "creating_containers", "processing", "publishing", "done")
+
+_pool = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_PUBLISHES, thread_name_prefix="publish")
+
+
+def submit_publish_job(
+    user_id: int,
+    file_ids: list[str],
+    caption: str,
+    source: str = "drive",
+    picker_session_id: str | None = None,
+) -> dict:
+    """Persist a queued publish job, hand it to the worker pool and return it."""
+    job = create_publish_job(
+        uuid.uuid4().hex,
+        user_id,
+        {
+            "file_ids": file_ids,
+            "caption": caption,
+            "source": source,
+            "picker_session_id": picker_session_id,
+        },
+    )
+    _pool.submit(_run_job, job["id"])
+    logger.info("Publish: job %s queued for user %s (%d image(s))", job["id"], user_id, len(file_ids))
+    return job
+
+
+def submit_deferred_publish(user_id: int, post: dict, delay: float, deferrals: int) -> dict:
+    """
+    Persist a rendered scheduled post that hit an open Graph circuit and publish
+    it after *delay* seconds. The job row survives restarts; its checkpoint keeps
+    the already-uploaded temp images and containers.
+    """
+    job = create_publish_job(
+        uuid.uuid4().hex,
+        user_id,
+        {
+            "file_ids": post["file_ids"],
+            "caption": post["caption"],
+            # Posts prepared before the source was recorded default to Drive, as before
+            "source": post.get("source", "drive"),
+            "picker_session_id": post.get("picker_session_id"),
+            "origin": "scheduled",
+            "file_names": post["file_names"],
+            "llm_calls": post.get("llm_calls"),
+            "deferrals": deferrals,
+            "not_before": time.time() + delay,
+        },
+    )
+    checkpoint = dict(post.get("publish_checkpoint") or {})
+    checkpoint.setdefault("location_id", post.get("location_id"))
+    update_publish_job(job["id"], checkpoint=checkpoint)
+    _submit_at(job["id"], job["request"])
+    logger.info("Publish: scheduled post deferred as job %s (in %.0fs)", job["id"], delay)
+    return job
+
+
+def _submit_at(job_id: str, req: dict) -> None:
+    """Hand the job to the pool now, or once its not_before time has passed."""
+    delay = (req.get("not_before") or 0) - time.time()
+    if delay <= 0:
+        _pool.submit(_run_job, job_id)
+        return
+    timer = threading.Timer(delay, _pool.submit, args=(_run_job, job_id))
+    timer.daemon = True
+    timer.start()
+
+
+def get_job(job_id: str, user_id: int) -> dict | None:
+    """Return the job (None if unknown or owned by another user)."""
+    job = get_publish_job(job_id)
+    if job is None or job["user_id"] != user_id:
+        return None
+    return job
+
+
+def retry_job(job_id: str, user_id: int) -> dict | None:
+    """Re-queue a failed job. It resumes from its checkpoint (staged images, containers)."""
+    job = get_job(job_id, user_id)
+    if job is None or job["status"] != "failed":
+        return None
+    update_publish_job(job_id, status="queued", stage="queued", error=None)
+    _pool.submit(_run_job, job_id)
+    logger.info("Publish: job %s re-queued", job_id)
+    return get_publish_job(job_id)
+
+
+def resume_unfinished_jobs() -> None:
+    """Re-queue jobs interrupted by a restart; each resumes from its checkpoint."""
+    for job in list_unfinished_publish_jobs():
+        update_publish_job(job["id"], status="queued", stage="queued")
+        _submit_at(job["id"], job["request"])
+        logger.info("Publish: resumed job %s after restart", job["id"])
+
+
+def _download(file_id: str, req: dict, creds: dict) -> bytes:
+    from services.drive_service import download_photo
+    from services.photos_service import download_media, download_picker_photo
+
+    if req["source"] == "gphotos_picker":
+        image_bytes, _ = download_picker_photo(file_id, req["picker_session_id"], creds)
+    elif req["source"] == "gphotos":
+        image_bytes, _ = download_media(file_id, creds)
+    else:
+        image_bytes, _ = download_photo(file_id, creds=creds)
+    return image_bytes
+
+
+def _run_job(job_id: str) -> None:
+    from services.instagram_service import (
+        CircuitOpenError,
+        ContainerError,
+        PublishCheckpoint,
+        post_carousel,
+        post_photo,
+        search_instagram_location,
+    )
+    from services.image_service import compress_for_instagram
+    from services.schedule_service import (
+        _MAX_PUBLISH_DEFERRALS,
+        _checkpoint_temp_urls,
+        _public_base_url,
+        _upload_temp_images,
+        _verify_public_image_url,
+        discard_publish_checkpoint,
+        extract_photo_metadata,
+        log_post_attempt,
+        record_posted_id,
+    )
+
+    job = get_publish_job(job_id)
+    if job is None or job["status"] not in ("queued", "running"):
+        return
+    user_id = job["user_id"]
+    req = job["request"]
+    # Deferred scheduled posts are logged as scheduled, with their caption calls
+    origin = req.get("origin", "manual")
+    file_names = req.get("file_names") or req["file_ids"]
+    update_publish_job(job_id, status="running", stage="downloading", attempts=job["attempts"] + 1)
+
+    def stage(name: str) -> None:
+        update_publish_job(job_id, stage=name)
+
+    checkpoint = PublishCheckpoint(
+        job["checkpoint"], save=lambda data: update_publish_job(job_id, checkpoint=data),
+    )
+    try:
+        creds = get_credentials(user_id)
+        base_url = _public_base_url(creds)
+
+        image_urls = _checkpoint_temp_urls(checkpoint, base_url)
+        if image_urls:
+            logger.info("Publish: job %s resuming with staged images", job_id)
+            location_id = checkpoint.get("location_id")
+        else:
+            images = []
+            location_id = None
+            for i, file_id in enumerate(req["file_ids"]):
+                image_bytes = _download(file_id, req, creds)
+                if i == 0:
+                    gps = extract_photo_metadata(image_bytes).get("gps")
+                    if gps:
+                        location_id = search_instagram_location(*gps, creds=creds, user_id=user_id)
+                images.append(compress_for_instagram(image_bytes))
+
+            stage("uploading")
+            checkpoint.update(location_id=location_id)
+            image_urls = _upload_temp_images(images, base_url, checkpoint)
+        _verify_public_image_url(image_urls[0])
+
+        try:
+            if len(image_urls) == 1:
+                media_id = post_photo(
+                    image_urls[0], req["caption"], location_id=location_id,
+                    creds=creds, user_id=user_id, progress=stage, checkpoint=checkpoint,
+                )
+            else:
+                media_id = post_carousel(
+                    image_urls, req["caption"], location_id=location_id,
+                    creds=creds, user_id=user_id, progress=stage, checkpoint=checkpoint,
+                )
+        except ContainerError as e:
+            if e.status != "PUBLISHED":
+                raise
+            # A previous attempt went live but stopped before recording it
+            logger.warning("Publish: job %s container %s already published", job_id, e.container_id)
+            media_id = checkpoint.get("media_id") or ""
+
+        for fid in req["file_ids"]:
+            record_posted_id(fid, user_id)
+        log_post_attempt(
+            file_ids=req["file_ids"], file_names=file_names,
+            caption=req["caption"], status="success",
+            source=origin, media_id=media_id,
+            user_id=user_id, llm_calls=req.get("llm_calls"),
+        )
+        post_type = "single" if len(image_urls) == 1 else "carousel"
+        update_publish_job(
+            job_id, status="succeeded", stage="done",
+            result={"media_id": media_id, "type": post_type},
+        )
+        discard_publish_checkpoint(checkpoint.data)
+        logger.info("Publish: job %s posted media %s", job_id, media_id)
+    except CircuitOpenError as e:
+        if origin == "scheduled" and req.get("deferrals", 0) < _MAX_PUBLISH_DEFERRALS:
+            _defer_again(job_id, user_id, req, e)
+        else:
+            _fail(job_id, user_id, req, e)
+    except Exception as e:
+        _fail(job_id, user_id, req, e)
+
+
+def _defer_again(job_id: str, user_id: int, req: dict, e) -> None:
+    """Requeue a scheduled post after the open circuit's cooldown (plus jitter)."""
+    from services.schedule_service import log_post_attempt
+
+    delay = e.retry_after + random.uniform(0, 60)
+    req = {**req, "deferrals": req.get("deferrals", 0) + 1, "not_before": time.time() + delay}
+    log_post_attempt(
+        file_ids=req["file_ids"], file_names=req.get("file_names") or req["file_ids"],
+        caption=req["caption"], status="deferred",
+        source="scheduled", error=f"{e} — retrying in {delay / 60:.0f} min",
+        user_id=user_id, llm_calls=req.get("llm_calls"),
+    )
+    update_publish_job(job_id, status="queued", stage="queued", request=req, error=str(e))
+    _submit_at(job_id, req)
+    logger.warning("Publish: job %s — %s — requeued in %.0fs", job_id, e, delay)
+
+
+def _fail(job_id: str, user_id: int, req: dict, e: Exception) -> None:
+    from services.schedule_service import log_post_attempt
+
+    # Staged images and containers stay in the checkpoint for retry_job
+    logger.warning("Publish: job %s failed — %s", job_id, e)
+    log_post_attempt(
+        file_ids=req["file_ids"], file_names=req.get("file_names") or req["file_ids"],
+        caption=req["caption"], status="failed",
+        source=req.get("origin", "manual"), error=str(e),
+        user_id=user_id, llm_calls=req.get("llm_calls"),
+    )
+    update_publish_job(job_id, status="failed", error=str(e))
@@ -1,17 +1,30 @@
 """Schedule service — config persistence and the scheduled job logic."""
 
+import hashlib
 import json
 import logging
 import os
 import random
+import threading
 import uuid
 from datetime import datetime, timezone
 from pathlib import Path
 
-from services.claude_service import generate_caption
+import numpy as np
+
+from services.claude_service import capture_llm_calls, generate_caption
 from services.drive_service import download_photo, download_photo_header, list_photos
+from services.geocode_service import place_name
+from services.image_service import compress_for_instagram, render_variants
 from services.photos_service import list_picker_items, _get_access_token as _gphotos_token, download_picker_photo
-from services.instagram_service import post_photo, search_instagram_location
+from services.instagram_service import (
+    CONTAINER_REUSE_SECONDS,
+    CircuitOpenError,
+    ContainerError,
+    PublishCheckpoint,
+    post_photo,
+    search_instagram_location,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +47,9 @@ DEFAULT_CONFIG = {
     "tone": "engaging",
     "require_approval": True,
     "default_caption": DEFAULT_CAPTION,
+    "pregen_lead_minutes": 30,  # prepare media + caption this long before each run (0 = off)
+    "location_radius_km": 1.0,  # photos this close form one location group
+    "location_max_days": 0,     # also require grouped photos within N days (0 = off)
 }
 
 
@@ -63,8 +79,8 @@ def _history_file(user_id: int | None) -> Path:
     return _user_data_dir(user_id) / "post_history.json"
 
 
-def _location_cache_file(user_id: int | None) -> Path:
-    return _user_data_dir(user_id) / "photo_locations.json"
+def _metadata_index_file(user_id: int | None) -> Path:
+    return _user_data_dir(user_id) / "photo_metadata.json"
 
 
 # Keep module-level constants for legacy callers (schedule router unmark endpoint etc.)
@@ -73,7 +89,6 @@ CONFIG_FILE = _config_file(None)
 PENDING_FILE = _pending_file(None)
 POSTED_FILE = _posted_file(None)
 HISTORY_FILE = _history_file(None)
-LOCATION_CACHE_FILE = _location_cache_file(None)
 
 
 # ---------------------------------------------------------------------------
@@ -146,6 +161,110 @@ def save_pending(posts: list[dict], user_id: int | None = None) -> None:
     _pending_file(user_id).write_text(json.dumps(posts, indent=2))
 
 
+# ---------------------------------------------------------------------------
+# Staged media for pending posts
+# ---------------------------------------------------------------------------
+
+# Feed JPEGs of posts awaiting approval, named by content hash and served at
+# /temp/staged/<sha256>.jpg so approval can hand them to Instagram directly.
+STAGED_MEDIA_DIR = _BASE_DATA_DIR / "staged_media"
+# Pending posts older than this lose their staged media (approval then downloads again).
+STAGED_MEDIA_TTL_SECONDS = 7 * 24 * 3600
+# Unreferenced files younger than this survive GC — their post may still be being queued.
+_STAGED_GRACE_SECONDS = 3600
+
+_staged_lock = threading.Lock()
+
+
+def _stage_media(images: list[bytes]) -> list[str]:
+    """Store feed JPEGs in the staging area and return their content hashes."""
+    STAGED_MEDIA_DIR.mkdir(parents=True, exist_ok=True)
+    hashes = []
+    for data in images:
+        digest = hashlib.sha256(data).hexdigest()
+        path = STAGED_MEDIA_DIR / f"{digest}.jpg"
+        if path.exists():
+            os.utime(path)
+        else:
+            tmp = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+            tmp.write_bytes(data)
+            tmp.replace(path)
+        hashes.append(digest)
+    return hashes
+
+
+def _staged_urls(post: dict, base_url: str) -> list[str] | None:
+    """Public URLs of the post's staged media, or None if it has none or any file is gone."""
+    hashes = post.get("media")
+    if not hashes or not all((STAGED_MEDIA_DIR / f"{h}.jpg").exists() for h in hashes):
+        return None
+    return [f"{base_url}/temp/staged/{h}.jpg" for h in hashes]
+
+
+def _pending_files() -> list[tuple[int | None, Path]]:
+    files = [(None, _pending_file(None))]
+    for f in (_BASE_DATA_DIR / "users").glob("*/pending_posts.json"):
+        try:
+            files.append((int(f.parent.name), f))
+        except ValueError:
+            continue
+    return files
+
+
+def _referenced_staged_media() -> set[str]:
+    refs = set()
+    for user_id, _ in _pending_files():
+        for post in load_pending(user_id):
+            refs.update(post.get("media") or [])
+    return refs
+
+
+def _release_staged_media(hashes: list[str]) -> None:
+    """Delete staged files no pending post references any more."""
+    if not hashes:
+        return
+    with _staged_lock:
+        live = _referenced_staged_media()
+        for h in hashes:
+            if h not in live:
+                (STAGED_MEDIA_DIR / f"{h}.jpg").unlink(missing_ok=True)
+
+
+def gc_staged_media() -> None:
+    """
+    Expire staged media of pending posts older than STAGED_MEDIA_TTL_SECONDS and
+    delete files no pending post references.
+    """
+    now = datetime.now(timezone.utc)
+    with _staged_lock:
+        for user_id, _ in _pending_files():
+            pending = load_pending(user_id)
+            expired = False
+            for post in pending:
+                try:
+                    age = (now - datetime.fromisoformat(post["created_at"])).total_seconds()
+                except (KeyError, ValueError):
+                    continue
+                if post.get("media") and age > STAGED_MEDIA_TTL_SECONDS:
+                    post["media"] = []
+                    expired = True
+            if expired:
+                save_pending(pending, user_id)
+
+        live = _referenced_staged_media()
+        cutoff = now.timestamp() - _STAGED_GRACE_SECONDS
+        removed = 0
+        for fp in STAGED_MEDIA_DIR.glob("*.jpg"):
+            try:
+                if fp.stem not in live and fp.stat().st_mtime < cutoff:
+                    fp.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    if removed:
+        logger.info("Staged media GC: removed %d file(s)", removed)
+
+
 # ---------------------------------------------------------------------------
 # Post history
 # ---------------------------------------------------------------------------
@@ -170,6 +289,7 @@ def log_post_attempt(
     error: str = "",
     media_id: str = "",
     user_id: int | None = None,
+    llm_calls: list[dict] | None = None,
 ) -> None:
     entry = {
         "id": str(uuid.uuid4()),
@@ -182,6 +302,8 @@ def log_post_attempt(
         "media_id": media_id,
         "created_at": datetime.now(timezone.utc).isoformat(),
     }
+    if llm_calls:
+        entry["llm_calls"] = llm_calls
     history = load_history(user_id)
     history.insert(0, entry)
     d = _user_data_dir(user_id)
@@ -190,11 +312,11 @@ def log_post_attempt(
 
 
 # ---------------------------------------------------------------------------
-# Location cache
+# Photo metadata index
 # ---------------------------------------------------------------------------
 
-def load_location_cache(user_id: int | None = None) -> dict:
-    f = _location_cache_file(user_id)
+def load_metadata_index(user_id: int | None = None) -> dict:
+    f = _metadata_index_file(user_id)
     if not f.exists():
         return {}
     try:
@@ -203,51 +325,248 @@ def load_location_cache(user_id: int | None = None) -> dict:
         return {}
 
 
-def save_location_cache(cache: dict, user_id: int | None = None) -> None:
-    d = _user_data_dir(user_id)
-    d.mkdir(parents=True, exist_ok=True)
-    _location_cache_file(user_id).write_text(json.dumps(cache, indent=2))
-
-
-def resolve_photo_locations(
+def index_photo_metadata(
     file_ids: list,
     creds: dict | None = None,
     user_id: int | None = None,
 ) -> dict:
-    cache = load_location_cache(user_id)
-    uncached = [fid for fid in file_ids if fid not in cache]
-
-    for fid in uncached:
+    """
+    EXIF metadata (see extract_photo_metadata) for each file id, read from a
+    128 KB header download the first time and kept in photo_metadata.json.
+    Never touches the geocoder.
+    """
+    index = load_metadata_index(user_id)
+    unindexed = [fid for fid in file_ids if fid not in index]
+
+    for fid in unindexed:
         try:
-            header_bytes = download_photo_header(fid, creds=creds)
-            meta = extract_photo_metadata(header_bytes)
-            cache[fid] = meta.get("location_name")
+            index[fid] = extract_photo_metadata(download_photo_header(fid, creds=creds))
         except Exception as e:
-            logger.warning("Location resolve failed for %s: %s", fid, e)
-            cache[fid] = None
+            logger.warning("Metadata scan failed for %s: %s", fid, e)
+            index[fid] = {}
 
-    if uncached:
-        save_location_cache(cache, user_id)
+    if unindexed:
+        _user_data_dir(user_id).mkdir(parents=True, exist_ok=True)
+        _metadata_index_file(user_id).write_text(json.dumps(index, indent=2))
 
-    return {fid: cache.get(fid) for fid in file_ids}
+    return {fid: index.get(fid, {}) for fid in file_ids}
 
 
 # ---------------------------------------------------------------------------
 # Location grouping helpers
 # ---------------------------------------------------------------------------
 
-def select_by_location(unused: list, locations: dict) -> list:
-    groups: dict = {}
+# Photos within this many km of each other (directly or through a chain of
+# photos) form one location group.
+LOCATION_RADIUS_KM = 1.0
+_EARTH_KM = 6371.0088
+# Photos per cell compared in the first, sampled pass over neighbouring cells.
+_SAMPLE_PER_CELL = 8
+# Neighbouring grid cells whose photo pairs exceed this are compared one cell
+# pair at a time, trimmed to the photos near the other cell.
+_HEAVY_CELL_PAIR = 200_000
+# Photo pairs compared per vectorized pass.
+_PAIR_BATCH = 2_000_000
+
+
+def _haversine_km(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """Great-circle distance in km between points given in radians."""
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * _EARTH_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _connected_labels(n: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Component label (smallest member) per node for the undirected edges a–b."""
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[a], labels[b])
+        new = labels.copy()
+        np.minimum.at(new, a, low)
+        np.minimum.at(new, b, low)
+        new = new[new]
+        if np.array_equal(new, labels):
+            return labels
+        labels = new
+
+
+def cluster_by_location(
+    lat: np.ndarray,
+    lng: np.ndarray,
+    radius_km: float = LOCATION_RADIUS_KM,
+    taken_at: np.ndarray | None = None,
+    max_seconds: float | None = None,
+) -> np.ndarray:
+    """
+    Cluster label per photo (degrees in, labels 0..k-1 out). Two photos are
+    linked when they are within *radius_km* — and, with *max_seconds*, taken
+    within that many seconds (*taken_at* in epoch seconds) — and a cluster is a
+    connected group of links, i.e. DBSCAN with min_samples=1.
+
+    Photos are bucketed into a 3-D grid on the Earth-centred coordinates (so
+    poles and the antimeridian need no special cases) whose cells are small
+    enough that everything in one cell is linked. Only neighbouring cells are
+    compared, with vectorized haversine checks.
+    """
+    if not (np.isfinite(radius_km) and radius_km > 0):
+        raise ValueError(f"radius_km must be a positive number, got {radius_km!r}")
+    if max_seconds is not None and not (np.isfinite(max_seconds) and max_seconds >= 0):
+        raise ValueError(f"max_seconds must be a non-negative number, got {max_seconds!r}")
+    n = len(lat)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    if not (np.isfinite(lat).all() and np.isfinite(lng).all()):
+        raise ValueError("Photo coordinates must be finite")
+    if max_seconds and not np.isfinite(taken_at).all():
+        raise ValueError("Photo timestamps must be finite")
+    phi, lam = np.radians(lat), np.radians(lng)
+    xyz = np.c_[np.cos(phi) * np.cos(lam), np.cos(phi) * np.sin(lam), np.sin(phi)] * _EARTH_KM
+    chord = 2 * _EARTH_KM * np.sin(min(radius_km / (2 * _EARTH_KM), np.pi / 2))
+    side = chord / np.sqrt(3)  # cube diagonal = chord of radius_km
+    grid = [np.floor(xyz[:, i] / side).astype(np.int64) for i in range(3)]
+    reach = [2, 2, 2]  # a chord ≤ radius spans at most √3 < 2 cell edges per axis
+    use_time = taken_at is not None and max_seconds
+    if use_time:
+        grid.append(np.floor(taken_at / max_seconds).astype(np.int64))
+        reach.append(1)
+
+    # Pack cell coordinates into one int key, with room for the ± reach offsets
+    spans = [int(g.max() - g.min()) + 5 for g in grid]
+    if float(np.prod([float(x) for x in spans])) >= 2 ** 62:
+        raise ValueError("Clustering grid too large — radius or time window too small")
+    key = np.zeros(n, dtype=np.int64)
+    strides = []
+    for g, span in zip(grid, spans):
+        key = key * span + (g - g.min() + 2)
+    for i in range(len(spans)):
+        strides.append(int(np.prod(spans[i + 1:], dtype=np.int64)))
+
+    order = np.argsort(key, kind="stable")
+    cells, starts, counts = np.unique(key[order], return_index=True, return_counts=True)
+    cell_of = np.empty(n, dtype=np.int64)
+    cell_of[order] = np.repeat(np.arange(len(cells)), counts)
+
+    # Neighbouring cell pairs: half of the offset box, so each pair appears once
+    offsets = np.array(np.meshgrid(*[np.arange(-r, r + 1) for r in reach], indexing="ij")).reshape(len(reach), -1).T
+    offsets = offsets[[tuple(o) > (0,) * len(reach) for o in offsets]]
+    pair_a, pair_b = [], []
+    for off in offsets:
+        target = cells + int(np.dot(off, strides))
+        pos = np.searchsorted(cells, target).clip(max=len(cells) - 1)
+        hit = np.flatnonzero(cells[pos] == target)
+        pair_a.append(hit)
+        pair_b.append(pos[hit])
+    pair_a = np.concatenate(pair_a)
+    pair_b = np.concatenate(pair_b)
+
+    def linked(pa: np.ndarray, pb: np.ndarray) -> np.ndarray:
+        d = _haversine_km(phi[pa], lam[pa], phi[pb], lam[pb]) <= radius_km
+        if use_time:
+            d &= np.abs(taken_at[pa] - taken_at[pb]) <= max_seconds
+        return d
+
+    def any_linked(pairs: np.ndarray, cap: int | None = None) -> np.ndarray:
+        """Per cell pair: is any photo pair linked (first *cap* photos of each cell)?"""
+        na, nb = counts[pair_a[pairs]], counts[pair_b[pairs]]
+        if cap:
+            na, nb = np.minimum(na, cap), np.minimum(nb, cap)
+        w = na * nb
+        k = np.repeat(np.arange(len(pairs)), w)
+        r = np.arange(len(k)) - np.repeat(np.cumsum(w) - w, w)
+        pa = order[starts[pair_a[pairs]][k] + r // nb[k]]
+        pb = order[starts[pair_b[pairs]][k] + r % nb[k]]
+        return np.logical_or.reduceat(linked(pa, pb), np.cumsum(w) - w)
+
+    # A sampled pass joins most of a dense area cheaply; it settles every cell
+    # pair small enough to be fully covered by the sample.
+    sampled = np.concatenate([
+        chunk[any_linked(chunk, _SAMPLE_PER_CELL)]
+        for chunk in np.array_split(np.arange(len(pair_a)), max(1, len(pair_a) // 20_000))
+    ]) if len(pair_a) else np.zeros(0, dtype=np.int64)
+    edge_a, edge_b = [pair_a[sampled]], [pair_b[sampled]]
+    labels = _connected_labels(len(cells), edge_a[0], edge_b[0])
+
+    # The rest, cheapest first, skipping pairs whose cells are already joined
+    work = counts[pair_a] * counts[pair_b]
+    rest = np.flatnonzero((counts[pair_a] > _SAMPLE_PER_CELL) | (counts[pair_b] > _SAMPLE_PER_CELL))
+    rest = rest[np.argsort(work[rest], kind="stable")]
+    while len(rest):
+        rest = rest[labels[pair_a[rest]] != labels[pair_b[rest]]]
+        if not len(rest):
+            break
+        if work[rest[0]] > _HEAVY_CELL_PAIR:
+            # Compare only the photos of each cell within reach of the other cell
+            batch = rest[:1]
+            ca, cb = pair_a[batch[0]], pair_b[batch[0]]
+            pts_a = order[starts[ca]:starts[ca] + counts[ca]]
+            pts_b = order[starts[cb]:starts[cb] + counts[cb]]
+            near_a = pts_a[_box_distance(xyz[pts_a], grid, pts_b[0], side) <= chord]
+            near_b = pts_b[_box_distance(xyz[pts_b], grid, pts_a[0], side) <= chord]
+            hit = any(
+                linked(np.repeat(near_a[i:i + 512], len(near_b)), np.tile(near_b, len(near_a[i:i + 512]))).any()
+                for i in range(0, len(near_a), 512)
+            )
+            found = batch if hit else batch[:0]
+        else:
+            batch = rest[:max(1, int(np.searchsorted(np.cumsum(work[rest]), _PAIR_BATCH)))]
+            found = batch[any_linked(batch)]
+        rest = rest[len(batch):]
+        if len(found):
+            edge_a.append(pair_a[found])
+            edge_b.append(pair_b[found])
+            labels = _connected_labels(len(cells), np.concatenate(edge_a), np.concatenate(edge_b))
+
+    return np.unique(labels[cell_of], return_inverse=True)[1]
+
+
+def _box_distance(points: np.ndarray, grid: list, member: int, side: float) -> np.ndarray:
+    """Distance from each point to the spatial grid cell containing photo *member*."""
+    lo = np.array([grid[i][member] for i in range(3)]) * side
+    gap = np.maximum(np.maximum(lo - points, points - (lo + side)), 0)
+    return np.sqrt((gap ** 2).sum(axis=1))
+
+
+def select_by_location(
+    unused: list,
+    metadata: dict,
+    radius_km: float = LOCATION_RADIUS_KM,
+    max_days: float = 0,
+) -> list:
+    """
+    The largest group (≥2) of photos taken near each other, using GPS from the
+    metadata index; with *max_days*, linked photos must also be taken within
+    that many days of each other (undated photos are then left out).
+    Falls back to all of *unused*.
+    """
+    located, coords, times = [], [], []
     for photo in unused:
-        loc = locations.get(photo["id"])
-        if loc:
-            groups.setdefault(loc, []).append(photo)
-
-    valid = {loc: photos for loc, photos in groups.items() if len(photos) >= 2}
-    if valid:
-        best = max(valid, key=lambda loc: len(valid[loc]))
-        logger.info("Location grouping: picked '%s' (%d photos available)", best, len(valid[best]))
-        return valid[best]
+        meta = metadata.get(photo["id"]) or {}
+        if not meta.get("gps"):
+            continue
+        if max_days:
+            if not meta.get("taken_at"):
+                continue
+            times.append(datetime.fromisoformat(meta["taken_at"]).timestamp())
+        located.append(photo)
+        coords.append(meta["gps"])
+
+    if len(located) >= 2:
+        arr = np.asarray(coords, dtype=np.float64)
+        labels = cluster_by_location(
+            arr[:, 0], arr[:, 1], radius_km,
+            taken_at=np.asarray(times) if max_days else None,
+            max_seconds=max_days * 86400 if max_days else None,
+        )
+        sizes = np.bincount(labels)
+        best = int(sizes.argmax())
+        if sizes[best] >= 2:
+            members = np.flatnonzero(labels == best)
+            centre = arr[members].mean(axis=0)
+            logger.info(
+                "Location grouping: picked a group of %d photos around %.4f, %.4f (%d groups)",
+                len(members), centre[0], centre[1], len(sizes),
+            )
+            return [located[i] for i in members]
 
     logger.info("Location grouping: no group with ≥2 photos — using random selection")
     return unused
@@ -267,46 +586,34 @@ def _dms_to_decimal(dms, ref: str):
     return decimal
 
 
-def _reverse_geocode(lat: float, lng: float):
-    import httpx as _httpx
-    try:
-        resp = _httpx.get(
-            "https://nominatim.openstreetmap.org/reverse",
-            params={"lat": lat, "lon": lng, "format": "json"},
-            headers={"User-Agent": "autoinstapost/1.0"},
-            timeout=8,
-        )
-        if resp.is_success:
-            addr = resp.json().get("address", {})
-            city = (
-                addr.get("city")
-                or addr.get("town")
-                or addr.get("village")
-                or addr.get("county")
-            )
-            region = addr.get("state") or addr.get("country")
-            parts = [p for p in [city, region] if p]
-            return ", ".join(parts) if parts else None
-    except Exception as e:
-        logger.warning("Reverse geocode failed: %s", e)
-    return None
-
-
 def extract_photo_metadata(image_bytes: bytes) -> dict:
+    """
+    EXIF facts about a photo, without any network calls: `date` (display
+    string), `taken_at` (ISO), `gps` ((lat, lng)), `width`, `height` and
+    `orientation` (EXIF 1–8). Missing facts are omitted. Use
+    services.geocode_service for a place name.
+    """
     import io
     from PIL import Image
 
     result = {}
     try:
         img = Image.open(io.BytesIO(image_bytes))
+        result["width"], result["height"] = img.size
         exif = img.getexif()
 
+        orientation = exif.get(274)
+        if orientation:
+            result["orientation"] = int(orientation)
+
+        exif_ifd = exif.get_ifd(34665)
         for tag_id in (36867, 36868, 306):
-            date_raw = exif.get(tag_id)
+            date_raw = exif.get(tag_id) or exif_ifd.get(tag_id)
             if date_raw:
                 try:
                     dt = datetime.strptime(date_raw, "%Y:%m:%d %H:%M:%S")
                     result["date"] = dt.strftime("%-d %B %Y")
+                    result["taken_at"] = dt.isoformat()
                     break
                 except ValueError:
                     continue
@@ -317,64 +624,18 @@ def extract_photo_metadata(image_bytes: bytes) -> dict:
             lng = _dms_to_decimal(gps_info.get(4), gps_info.get(3))
             if lat is not None and lng is not None:
                 result["gps"] = (lat, lng)
-                loc = _reverse_geocode(lat, lng)
-                if loc:
-                    result["location_name"] = loc
     except Exception as e:
         logger.warning("EXIF extraction failed: %s", e)
 
     return result
 
 
-def _compress_for_instagram(image_bytes: bytes, max_bytes: int = 7_000_000) -> bytes:
-    import io
-    from PIL import Image, ImageOps
-
-    img = Image.open(io.BytesIO(image_bytes))
-    img = ImageOps.exif_transpose(img)
-    if img.mode not in ("RGB", "L"):
-        img = img.convert("RGB")
-
-    max_dim = 1440
-    w, h = img.size
-    if max(w, h) > max_dim:
-        scale = max_dim / max(w, h)
-        img = img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
-
-    quality = 88
-    buf = io.BytesIO()
-    while quality >= 40:
-        buf = io.BytesIO()
-        img.save(buf, format="JPEG", quality=quality, optimize=True)
-        if buf.tell() <= max_bytes:
-            break
-        quality -= 10
-
-    logger.info(
-        "Compressed image: %d KB → %d KB (quality=%d)",
-        len(image_bytes) // 1024,
-        buf.tell() // 1024,
-        quality,
-    )
-    return buf.getvalue()
-
-
 # ---------------------------------------------------------------------------
 # Core posting
 # ---------------------------------------------------------------------------
 
-def _post_images(
-    file_ids: list[str],
-    caption: str,
-    creds: dict | None = None,
-    user_id: int | None = None,
-    location_id=None,
-    source: str = "drive",
-    picker_session_id: str | None = None,
-) -> str:
-    import httpx as _httpx
-    from services.instagram_service import post_carousel
-
+def _public_base_url(creds: dict | None) -> str:
+    """The tunnel URL Instagram fetches temp images from. Raises if it is not public."""
     base_url = (
         (creds.get("public_base_url") if creds else None)
         or os.environ.get("PUBLIC_BASE_URL", "")
@@ -386,104 +647,187 @@ def _post_images(
             "Run 'cloudflared tunnel --url http://localhost:8000', copy the URL, "
             "update PUBLIC_BASE_URL, then retry."
         )
+    return base_url
 
-    temp_files: list[Path] = []
-    image_urls: list[str] = []
+
+def _verify_public_image_url(url: str) -> None:
+    """Fetch *url* the way Instagram's crawler does; raise RuntimeError if it isn't an image."""
+    import httpx as _httpx
 
     try:
-        for fid in file_ids:
-            if source == "gphotos_picker" and picker_session_id:
-                image_bytes, mime_type = download_picker_photo(fid, picker_session_id, creds)
-            else:
-                image_bytes, mime_type = download_photo(fid, creds=creds)
-            image_bytes = _compress_for_instagram(image_bytes)
-            filename = f"{uuid.uuid4().hex}.jpg"
-            filepath = TEMP_DIR / filename
-            filepath.write_bytes(image_bytes)
-            temp_files.append(filepath)
-            image_urls.append(f"{base_url}/temp/{filename}")
+        probe = _httpx.get(
+            url,
+            timeout=12,
+            follow_redirects=True,
+            headers={
+                "User-Agent": (
+                    "facebookexternalhit/1.1 "
+                    "(+http://www.facebook.com/externalhit_uatext.php)"
+                ),
+                "Range": "bytes=0-2047",
+            },
+        )
+        if probe.status_code not in (200, 206):
+            raise RuntimeError(
+                f"Image URL returned HTTP {probe.status_code}. "
+                f"Tunnel may be down or public_base_url is wrong. URL: {url}"
+            )
+        ct = probe.headers.get("content-type", "")
+        if not ct.lower().startswith("image/"):
+            raise RuntimeError(
+                f"Image URL returned Content-Type='{ct}' — not an image. "
+                "Cloudflare is likely showing a bot-challenge page to Instagram's crawler."
+            )
+    except _httpx.RequestError as exc:
+        raise RuntimeError(f"Cannot reach image URL: {exc}.") from exc
+
+
+def _served_path(url: str) -> Path:
+    """The file behind a /temp/… or /temp/staged/… URL."""
+    rel = url.split("/temp/", 1)[-1]
+    if rel.startswith("staged/"):
+        return STAGED_MEDIA_DIR / rel[len("staged/"):]
+    return TEMP_DIR / rel
+
+
+def _checkpoint_temp_urls(checkpoint: PublishCheckpoint, base_url: str) -> list[str] | None:
+    """Temp image URLs staged by an earlier attempt, if all files are still being served."""
+    urls = checkpoint.get("image_urls")
+    if not urls or checkpoint.get("base_url") != base_url:
+        return None
+    if all(_served_path(url).exists() for url in urls):
+        return urls
+    return None
+
 
+def _upload_temp_images(images: list[bytes], base_url: str, checkpoint: PublishCheckpoint) -> list[str]:
+    """Write feed JPEGs where Instagram can fetch them and record the URLs in *checkpoint*."""
+    image_urls = []
+    for image_bytes in images:
+        filename = f"{uuid.uuid4().hex}.jpg"
+        (TEMP_DIR / filename).write_bytes(image_bytes)
+        image_urls.append(f"{base_url}/temp/{filename}")
+    checkpoint.update(image_urls=image_urls, base_url=base_url)
+    return image_urls
+
+
+def discard_publish_checkpoint(data: dict | None) -> None:
+    """Delete the temp images a checkpoint kept around for a retry (staged media is left to its GC)."""
+    for url in (data or {}).get("image_urls", []):
+        path = _served_path(url)
+        if path.parent == TEMP_DIR:
+            path.unlink(missing_ok=True)
+
+
+def sweep_stale_temp_files() -> None:
+    """Remove temp images left by abandoned publishes once their containers can't be reused."""
+    cutoff = datetime.now(timezone.utc).timestamp() - CONTAINER_REUSE_SECONDS
+    removed = 0
+    for fp in TEMP_DIR.glob("*.jpg"):
         try:
-            probe = _httpx.get(
-                image_urls[0],
-                timeout=12,
-                follow_redirects=True,
-                headers={
-                    "User-Agent": (
-                        "facebookexternalhit/1.1 "
-                        "(+http://www.facebook.com/externalhit_uatext.php)"
-                    ),
-                    "Range": "bytes=0-2047",
-                },
-            )
-            if probe.status_code not in (200, 206):
-                raise RuntimeError(
-                    f"Image URL returned HTTP {probe.status_code}. "
-                    f"Tunnel may be down or public_base_url is wrong. URL: {image_urls[0]}"
-                )
-            ct = probe.headers.get("content-type", "")
-            if not ct.lower().startswith("image/"):
-                raise RuntimeError(
-                    f"Image URL returned Content-Type='{ct}' — not an image. "
-                    "Cloudflare is likely showing a bot-challenge page to Instagram's crawler."
-                )
-        except _httpx.RequestError as exc:
-            raise RuntimeError(f"Cannot reach image URL: {exc}.") from exc
+            if fp.stat().st_mtime < cutoff:
+                fp.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass
+    if removed:
+        logger.info("Removed %d stale temp image(s)", removed)
 
-        logger.info("Posting to Instagram (base_url=%s): %s", base_url, image_urls)
 
-        if len(image_urls) == 1:
-            return post_photo(image_urls[0], caption, location_id=location_id, creds=creds, user_id=user_id)
-        return post_carousel(image_urls, caption, location_id=location_id, creds=creds, user_id=user_id)
-    finally:
-        for fp in temp_files:
-            fp.unlink(missing_ok=True)
+def _post_images(
+    file_ids: list[str],
+    caption: str,
+    creds: dict | None = None,
+    user_id: int | None = None,
+    location_id=None,
+    source: str = "drive",
+    picker_session_id: str | None = None,
+    images: list[bytes] | None = None,
+    checkpoint: PublishCheckpoint | None = None,
+) -> str:
+    """
+    Publish *file_ids* with *caption*. Pass `images` (already-compressed feed
+    JPEGs, one per file id) to skip downloading and re-compressing them.
 
+    With a *checkpoint*, a failed attempt keeps its temp images and containers
+    so the next call with the same checkpoint resumes instead of starting over.
+    """
+    from services.instagram_service import post_carousel
 
-# ---------------------------------------------------------------------------
-# Scheduled job
-# ---------------------------------------------------------------------------
+    base_url = _public_base_url(creds)
+    cp = checkpoint or PublishCheckpoint()
 
-def run_scheduled_job(user_id: int | None = None) -> None:
-    """Core scheduled job: pick photo, generate caption, post or queue."""
-    creds: dict | None = None
-    if user_id is not None:
-        from db import get_credentials
-        creds = get_credentials(user_id)
+    image_urls = _checkpoint_temp_urls(cp, base_url)
+    if image_urls:
+        logger.info("Resuming publish with %d staged image(s)", len(image_urls))
+    else:
+        if images is None:
+            images = []
+            for fid in file_ids:
+                if source == "gphotos_picker" and picker_session_id:
+                    image_bytes, mime_type = download_picker_photo(fid, picker_session_id, creds)
+                else:
+                    image_bytes, mime_type = download_photo(fid, creds=creds)
+                images.append(compress_for_instagram(image_bytes))
+        image_urls = _upload_temp_images(images, base_url, cp)
 
-    config = load_config(user_id)
+    try:
+        _verify_public_image_url(image_urls[0])
 
-    if not config.get("enabled"):
-        logger.info("Scheduler: job triggered but scheduling is disabled — skipping.")
-        return
+        logger.info("Posting to Instagram (base_url=%s): %s", base_url, image_urls)
 
+        if len(image_urls) == 1:
+            media_id = post_photo(
+                image_urls[0], caption, location_id=location_id, creds=creds, user_id=user_id, checkpoint=cp,
+            )
+        else:
+            media_id = post_carousel(
+                image_urls, caption, location_id=location_id, creds=creds, user_id=user_id, checkpoint=cp,
+            )
+    except ContainerError as e:
+        if e.status != "PUBLISHED":
+            if checkpoint is None:
+                discard_publish_checkpoint(cp.data)
+            raise
+        logger.warning("Container %s was already published by an earlier attempt", e.container_id)
+        media_id = cp.get("media_id") or ""
+    except Exception:
+        if checkpoint is None:
+            discard_publish_checkpoint(cp.data)
+        raise
+    discard_publish_checkpoint(cp.data)
+    return media_id
+
+
+def _select_photos(config: dict, creds: dict | None, user_id: int | None) -> list[dict] | None:
+    """List the configured source and pick up to 4 unposted photos (None → skip)."""
     source = config.get("source", "drive")
     picker_session_id = (creds or {}).get("google_picker_session_id") if source == "gphotos_picker" else None
 
     if source == "gphotos_picker":
         if not creds or not creds.get("google_picker_session_id"):
             logger.warning("Scheduler: source=gphotos_picker but no picker session found — skipping.")
-            return
+            return None
         try:
             access_token = _gphotos_token(creds)
             photos = list_picker_items(picker_session_id, access_token)
         except Exception as e:
             logger.error("Scheduler: failed to list picker photos — %s", e)
-            return
+            return None
     else:
         folder_id = config.get("folder_id", "").strip()
         if not folder_id:
             logger.warning("Scheduler: no folder_id configured — skipping.")
-            return
+            return None
         try:
             photos = list_photos(folder_id, creds=creds)
         except Exception as e:
             logger.error("Scheduler: failed to list photos — %s", e)
-            return
+            return None
 
     if not photos:
         logger.warning("Scheduler: no photos found — skipping.")
-        return
+        return None
 
     posted_ids = load_posted_ids(user_id)
     INSTAGRAM_OK = {"image/jpeg", "image/png"}
@@ -493,79 +837,252 @@ def run_scheduled_job(user_id: int | None = None) -> None:
     ]
     if not unused:
         logger.warning("Scheduler: all %d photos have already been posted — skipping.", len(photos))
-        return
+        return None
 
     all_unused_ids = [p["id"] for p in unused]
-    locations = resolve_photo_locations(all_unused_ids, creds=creds, user_id=user_id)
-    pool = select_by_location(unused, locations)
+    metadata = index_photo_metadata(all_unused_ids, creds=creds, user_id=user_id)
+    try:
+        pool = select_by_location(
+            unused, metadata,
+            radius_km=config.get("location_radius_km", LOCATION_RADIUS_KM),
+            max_days=config.get("location_max_days", 0),
+        )
+    except ValueError as e:
+        logger.warning("Scheduler: location grouping skipped — %s", e)
+        pool = unused
 
     pick_count = min(4, len(pool))
-    selected = random.sample(pool, pick_count) if len(pool) > pick_count else list(pool)
+    return random.sample(pool, pick_count) if len(pool) > pick_count else list(pool)
+
+
+def _render_post(selected: list[dict], config: dict, creds: dict | None, user_id: int | None) -> dict:
+    """Download, compress and caption the selected photos. Raises on failure."""
     file_ids = [p["id"] for p in selected]
-    file_names = [p.get("name", p["id"]) for p in selected]
     tone = config.get("tone", "engaging")
 
+    images = []
+    previews = []
+    meta = {}
+    for i, fid in enumerate(file_ids):
+        image_bytes, mime_type = download_photo(fid, creds=creds)
+        if i == 0:
+            meta = extract_photo_metadata(image_bytes)
+        rendered = render_variants(image_bytes, ("feed", "preview"))
+        images.append(rendered["feed"])
+        previews.append((rendered["preview"], "image/jpeg"))
+
+    date_str = meta.get("date")
+    location_name = place_name(meta)
+    gps = meta.get("gps")
+    logger.info("Scheduler: photo metadata — date=%s, location=%s, gps=%s", date_str, location_name, gps)
+
+    location_id = None
+    if gps:
+        location_id = search_instagram_location(*gps, creds=creds, user_id=user_id)
+        logger.info("Scheduler: Instagram location_id=%s", location_id)
+
+    caption = generate_caption(
+        previews, tone=tone, date_str=date_str, location_str=location_name, creds=creds
+    )
+    source = config.get("source", "drive")
+    return {
+        "source": source,
+        "picker_session_id": (creds or {}).get("google_picker_session_id") if source == "gphotos_picker" else None,
+        "file_ids": file_ids,
+        "file_names": [p.get("name", p["id"]) for p in selected],
+        "caption": caption,
+        "location_id": location_id,
+        "images": images,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Ahead-of-time preparation
+# ---------------------------------------------------------------------------
+
+# A prepared post is only used by the run it was prepared for (± this window).
+PREPARED_FIRE_TOLERANCE_SECONDS = 15 * 60
+
+
+def _prepared_file(user_id: int | None) -> Path:
+    return _user_data_dir(user_id) / "prepared_post.json"
+
+
+def _prepared_media_dir(user_id: int | None) -> Path:
+    return _user_data_dir(user_id) / "prepared"
+
+
+def _prepared_fingerprint(config: dict, creds: dict | None) -> str:
+    """Everything that changes *what* would be posted — a mismatch means stale."""
+    source = config.get("source", "drive")
+    return json.dumps({
+        "source": source,
+        "folder_id": config.get("folder_id", "").strip(),
+        "tone": config.get("tone", "engaging"),
+        "picker_session_id": (creds or {}).get("google_picker_session_id") if source == "gphotos_picker" else None,
+        # Photo selection: GPS grouping radius, and max_days (0 = location only)
+        "location_radius_km": config.get("location_radius_km", LOCATION_RADIUS_KM),
+        "location_max_days": config.get("location_max_days", 0),
+    }, sort_keys=True)
+
+
+def discard_prepared_post(user_id: int | None = None) -> None:
+    """Delete any prepared post and its media."""
+    f = _prepared_file(user_id)
     try:
-        images = []
-        meta = {}
-        for i, fid in enumerate(file_ids):
-            image_bytes, mime_type = download_photo(fid, creds=creds)
-            if i == 0:
-                meta = extract_photo_metadata(image_bytes)
-            compressed = _compress_for_instagram(image_bytes)
-            images.append((compressed, "image/jpeg"))
-
-        date_str = meta.get("date")
-        location_name = meta.get("location_name")
-        gps = meta.get("gps")
-        logger.info("Scheduler: photo metadata — date=%s, location=%s, gps=%s", date_str, location_name, gps)
-
-        location_id = None
-        if gps:
-            location_id = search_instagram_location(*gps, creds=creds, user_id=user_id)
-            logger.info("Scheduler: Instagram location_id=%s", location_id)
-
-        caption = generate_caption(
-            images, tone=tone, date_str=date_str, location_str=location_name, creds=creds
-        )
+        prepared = json.loads(f.read_text()) if f.exists() else {}
+    except Exception:
+        prepared = {}
+    for name in prepared.get("media", []):
+        (_prepared_media_dir(user_id) / name).unlink(missing_ok=True)
+    f.unlink(missing_ok=True)
+
+
+def pregenerate_post(user_id: int | None, fire_time: datetime) -> None:
+    """
+    Select, compress and caption the photos for the run at *fire_time* ahead of
+    time, so that run only has to publish.
+    """
+    if datetime.now(timezone.utc) >= fire_time:
+        logger.warning("Scheduler: pre-generation for %s started too late — skipped", fire_time)
+        return
+    creds: dict | None = None
+    if user_id is not None:
+        from db import get_credentials
+        creds = get_credentials(user_id)
+
+    config = load_config(user_id)
+    if not config.get("enabled"):
+        return
+
+    selected = _select_photos(config, creds, user_id)
+    if not selected:
+        return
+    try:
+        with capture_llm_calls() as llm_calls:
+            post = _render_post(selected, config, creds, user_id)
+        post["llm_calls"] = llm_calls
     except Exception as e:
-        logger.error("Scheduler: failed to generate caption — %s — skipping post.", e)
-        log_post_attempt(
-            file_ids=file_ids, file_names=file_names,
-            caption="", status="failed",
-            source="scheduled", error=f"Caption generation failed: {e}",
-            user_id=user_id,
-        )
+        logger.warning("Scheduler: pre-generation failed — %s — will prepare at fire time.", e)
         return
 
+    discard_prepared_post(user_id)
+    media_dir = _prepared_media_dir(user_id)
+    media_dir.mkdir(parents=True, exist_ok=True)
+    media = []
+    for data in post.pop("images"):
+        name = f"{uuid.uuid4().hex}.jpg"
+        (media_dir / name).write_bytes(data)
+        media.append(name)
+
+    post.update({
+        "media": media,
+        "fingerprint": _prepared_fingerprint(config, creds),
+        "prepared_for": fire_time.astimezone(timezone.utc).isoformat(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    })
+    _prepared_file(user_id).write_text(json.dumps(post, indent=2))
+    logger.info("Scheduler: prepared %d photo(s) for %s", len(media), post["prepared_for"])
+
+
+def _take_prepared_post(config: dict, creds: dict | None, user_id: int | None) -> dict | None:
+    """
+    Return the prepared post for this run if it is still valid, else None.
+    Either way the prepared post is consumed. It is stale when the config,
+    source or picker session changed, the run time doesn't match, any photo was
+    posted since or has left the folder, or its media is missing.
+    """
+    f = _prepared_file(user_id)
+    if not f.exists():
+        return None
+    try:
+        prepared = json.loads(f.read_text())
+    except Exception:
+        prepared = {}
+
+    try:
+        stale = ""
+        prepared_for = datetime.fromisoformat(prepared.get("prepared_for", ""))
+        if prepared.get("fingerprint") != _prepared_fingerprint(config, creds):
+            stale = "schedule config or source changed"
+        elif abs((datetime.now(timezone.utc) - prepared_for).total_seconds()) > PREPARED_FIRE_TOLERANCE_SECONDS:
+            stale = f"prepared for a different run ({prepared['prepared_for']})"
+        elif load_posted_ids(user_id) & set(prepared["file_ids"]):
+            stale = "a selected photo was posted in the meantime"
+        elif config.get("source", "drive") != "gphotos_picker":
+            listed = {p["id"] for p in list_photos(config.get("folder_id", "").strip(), creds=creds)}
+            if not set(prepared["file_ids"]) <= listed:
+                stale = "a selected photo left the folder"
+
+        images = [(_prepared_media_dir(user_id) / name).read_bytes() for name in prepared["media"]]
+    except Exception as e:
+        stale = f"unreadable ({e})"
+
+    discard_prepared_post(user_id)
+    if stale:
+        logger.info("Scheduler: discarding prepared post — %s.", stale)
+        return None
+
+    prepared["images"] = images
+    return prepared
+
+
+# ---------------------------------------------------------------------------
+# Scheduled job
+# ---------------------------------------------------------------------------
+
+def run_scheduled_job(user_id: int | None = None) -> None:
+    """Core scheduled job: pick photo, generate caption, post or queue."""
+    creds: dict | None = None
+    if user_id is not None:
+        from db import get_credentials
+        creds = get_credentials(user_id)
+
+    config = load_config(user_id)
+
+    if not config.get("enabled"):
+        logger.info("Scheduler: job triggered but scheduling is disabled — skipping.")
+        return
+
+    post = _take_prepared_post(config, creds, user_id)
+    if post is not None:
+        logger.info("Scheduler: using post prepared ahead of time (%d photo(s)).", len(post["file_ids"]))
+    else:
+        selected = _select_photos(config, creds, user_id)
+        if not selected:
+            return
+        with capture_llm_calls() as llm_calls:
+            try:
+                post = _render_post(selected, config, creds, user_id)
+            except Exception as e:
+                logger.error("Scheduler: failed to generate caption — %s — skipping post.", e)
+                log_post_attempt(
+                    file_ids=[p["id"] for p in selected],
+                    file_names=[p.get("name", p["id"]) for p in selected],
+                    caption="", status="failed",
+                    source="scheduled", error=f"Caption generation failed: {e}",
+                    user_id=user_id, llm_calls=llm_calls,
+                )
+                return
+        post["llm_calls"] = llm_calls
+
     if not config.get("require_approval", True):
-        try:
-            media_id = _post_images(file_ids, caption, creds=creds, user_id=user_id, location_id=location_id)
-            for fid in file_ids:
-                record_posted_id(fid, user_id)
-            log_post_attempt(
-                file_ids=file_ids, file_names=file_names,
-                caption=caption, status="success",
-                source="scheduled", media_id=media_id,
-                user_id=user_id,
-            )
-            logger.info("Scheduler: auto-posted %d photo(s): %s", len(file_ids), file_names)
-        except Exception as e:
-            log_post_attempt(
-                file_ids=file_ids, file_names=file_names,
-                caption=caption, status="failed",
-                source="scheduled", error=str(e),
-                user_id=user_id,
-            )
-            logger.error("Scheduler: failed to post — %s", e)
+        _publish_scheduled(post, creds, user_id)
     else:
+        file_ids = post["file_ids"]
+        file_names = post["file_names"]
+        caption = post["caption"]
+        location_id = post["location_id"]
+        llm_calls = post.get("llm_calls")
         post_id = str(uuid.uuid4())
+        media = _stage_media(post["images"])
         post = {
             "id": post_id,
             "file_ids": file_ids,
             "file_names": file_names,
             "caption": caption,
             "location_id": location_id,
+            "media": media,
             "created_at": datetime.now(timezone.utc).isoformat(),
         }
         pending = load_pending(user_id)
@@ -577,11 +1094,79 @@ def run_scheduled_job(user_id: int | None = None) -> None:
             file_ids=file_ids, file_names=file_names,
             caption=caption, status="queued",
             source="scheduled", media_id=post_id,
-            user_id=user_id,
+            user_id=user_id, llm_calls=llm_calls,
         )
         logger.info("Scheduler: queued %d photo(s) for approval (id=%s)", len(file_ids), post_id)
 
 
+# A scheduled publish that hits an open Graph circuit is retried this many times
+# (after the breaker's cooldown) before it is recorded as failed.
+_MAX_PUBLISH_DEFERRALS = 3
+
+
+def _publish_scheduled(post: dict, creds: dict | None, user_id: int | None, deferrals: int = 0) -> None:
+    """Publish a rendered scheduled post, deferring it while Instagram is failing."""
+    file_ids = post["file_ids"]
+    file_names = post["file_names"]
+    caption = post["caption"]
+    llm_calls = post.get("llm_calls")
+    try:
+        checkpoint = PublishCheckpoint(
+            post.get("publish_checkpoint"),
+            save=lambda data: post.__setitem__("publish_checkpoint", data),
+        )
+        media_id = _post_images(
+            file_ids, caption, creds=creds, user_id=user_id, location_id=post["location_id"],
+            images=post["images"], checkpoint=checkpoint,
+        )
+        for fid in file_ids:
+            record_posted_id(fid, user_id)
+        log_post_attempt(
+            file_ids=file_ids, file_names=file_names,
+            caption=caption, status="success",
+            source="scheduled", media_id=media_id,
+            user_id=user_id, llm_calls=llm_calls,
+        )
+        logger.info("Scheduler: auto-posted %d photo(s): %s", len(file_ids), file_names)
+    except CircuitOpenError as e:
+        if deferrals >= _MAX_PUBLISH_DEFERRALS:
+            log_post_attempt(
+                file_ids=file_ids, file_names=file_names,
+                caption=caption, status="failed",
+                source="scheduled", error=str(e),
+                user_id=user_id, llm_calls=llm_calls,
+            )
+            logger.error("Scheduler: giving up after %d deferrals — %s", deferrals, e)
+            discard_publish_checkpoint(post.get("publish_checkpoint"))
+            return
+        delay = e.retry_after + random.uniform(0, 60)
+        log_post_attempt(
+            file_ids=file_ids, file_names=file_names,
+            caption=caption, status="deferred",
+            source="scheduled", error=f"{e} — retrying in {delay / 60:.0f} min",
+            user_id=user_id, llm_calls=llm_calls,
+        )
+        logger.warning("Scheduler: %s — requeued in %.0fs", e, delay)
+        if user_id is not None:
+            # A publish job row survives restarts; it resumes from this attempt's checkpoint
+            from services.publish_job_service import submit_deferred_publish
+            submit_deferred_publish(user_id, post, delay, deferrals + 1)
+        else:
+            # Legacy single-user mode has no users row to own a publish job
+            timer = threading.Timer(delay, _publish_scheduled, args=(post, creds, user_id, deferrals + 1))
+            timer.daemon = True
+            timer.start()
+    except Exception as e:
+        log_post_attempt(
+            file_ids=file_ids, file_names=file_names,
+            caption=caption, status="failed",
+            source="scheduled", error=str(e),
+            user_id=user_id, llm_calls=llm_calls,
+        )
+        logger.error("Scheduler: failed to post — %s", e)
+        discard_publish_checkpoint(post.get("publish_checkpoint"))
+
+
 # ---------------------------------------------------------------------------
 # Approval / rejection
 # ---------------------------------------------------------------------------
@@ -601,8 +1186,23 @@ def approve_pending_post(post_id: str, user_id: int | None = None) -> bool:
     file_names = post.get("file_names") or [post.get("file_name", file_ids[0])]
     location_id = post.get("location_id")
 
+    # A failed approval keeps its containers so approving again resumes the publish
+    checkpoint = PublishCheckpoint(
+        post.get("publish_checkpoint"),
+        save=lambda data: _save_pending_checkpoint(post_id, data, user_id),
+    )
     try:
-        media_id = _post_images(file_ids, post["caption"], creds=creds, user_id=user_id, location_id=location_id)
+        # Staged media is already publicly served — go straight to container creation
+        base_url = _public_base_url(creds)
+        staged = _staged_urls(post, base_url)
+        if staged and not _checkpoint_temp_urls(checkpoint, base_url):
+            checkpoint.update(image_urls=staged, base_url=base_url)
+        elif post.get("media") and not staged:
+            logger.warning("Pending post %s: staged media is gone — downloading again", post_id)
+        media_id = _post_images(
+            file_ids, post["caption"], creds=creds, user_id=user_id, location_id=location_id,
+            checkpoint=checkpoint,
+        )
         log_post_attempt(
             file_ids=file_ids, file_names=file_names,
             caption=post["caption"], status="success",
@@ -618,14 +1218,27 @@ def approve_pending_post(post_id: str, user_id: int | None = None) -> bool:
         )
         raise
 
-    save_pending([p for p in pending if p["id"] != post_id], user_id)
+    save_pending([p for p in load_pending(user_id) if p["id"] != post_id], user_id)
+    _release_staged_media(post.get("media") or [])
     return True
 
 
+def _save_pending_checkpoint(post_id: str, data: dict, user_id: int | None) -> None:
+    pending = load_pending(user_id)
+    for p in pending:
+        if p["id"] == post_id:
+            p["publish_checkpoint"] = data
+    save_pending(pending, user_id)
+
+
 def reject_pending_post(post_id: str, user_id: int | None = None) -> bool:
     pending = load_pending(user_id)
     new_pending = [p for p in pending if p["id"] != post_id]
     if len(new_pending) == len(pending):
         return False
     save_pending(new_pending, user_id)
+    for p in pending:
+        if p["id"] == post_id:
+            discard_publish_checkpoint(p.get("publish_checkpoint"))
+            _release_staged_media(p.get("media") or [])
     return True
@@ -1,6 +1,5 @@
 """Story service — scheduling and posting Instagram Stories from a Drive folder."""
 
-import io
 import json
 import logging
 import os
@@ -137,39 +136,6 @@ def log_story_attempt(
 # Image processing
 # ---------------------------------------------------------------------------
 
-def _crop_for_story(image_bytes: bytes) -> bytes:
-    """Center-crop and resize to 9:16 (1080×1920) for Instagram Stories."""
-    from PIL import Image, ImageOps
-
-    img = Image.open(io.BytesIO(image_bytes))
-    img = ImageOps.exif_transpose(img)
-    if img.mode != "RGB":
-        img = img.convert("RGB")
-
-    target_w, target_h = 1080, 1920
-    target_ratio = target_w / target_h  # 0.5625
-
-    w, h = img.size
-    current_ratio = w / h
-
-    if current_ratio > target_ratio:
-        # Wider than 9:16 — crop width
-        new_w = int(h * target_ratio)
-        left = (w - new_w) // 2
-        img = img.crop((left, 0, left + new_w, h))
-    elif current_ratio < target_ratio:
-        # Taller than 9:16 — crop height
-        new_h = int(w / target_ratio)
-        top = (h - new_h) // 2
-        img = img.crop((0, top, w, top + new_h))
-
-    img = img.resize((target_w, target_h), Image.LANCZOS)
-    buf = io.BytesIO()
-    img.save(buf, format="JPEG", quality=85, optimize=True)
-    logger.info("Story crop: %dx%d → 1080x1920 (%d KB)", w, h, buf.tell() // 1024)
-    return buf.getvalue()
-
-
 # ---------------------------------------------------------------------------
 # Core posting
 # ---------------------------------------------------------------------------
@@ -183,6 +149,7 @@ def _post_story_image(
 ) -> str:
     """Download image (Drive or Google Photos picker), crop to 9:16, post as Story."""
     import httpx as _httpx
+    from services.image_service import crop_for_story
     from services.instagram_service import post_story
 
     base_url = (
@@ -204,7 +171,7 @@ def _post_story_image(
     else:
         from services.drive_service import download_photo
         image_bytes, _ = download_photo(file_id, creds=creds)
-    story_bytes = _crop_for_story(image_bytes)
+    story_bytes = crop_for_story(image_bytes)
 
     filename = f"{uuid.uuid4().hex}.jpg"
     filepath = TEMP_DIR / filename
@@ -0,0 +1,112 @@
+"""Caption routing between providers, driven by fake providers with fixed latencies."""
+
+import threading
+import time
+
+import pytest
+
+from services import claude_service
+
+
+@pytest.fixture(autouse=True)
+def fresh_routing(monkeypatch):
+    monkeypatch.setattr(claude_service, "_provider_stats", {})
+    monkeypatch.setattr(claude_service, "_acquire_provider_slot", lambda name: None)
+    monkeypatch.setitem(claude_service._DEFAULT_HEDGE_AFTER, "gemini", 5.0)
+    monkeypatch.setitem(claude_service._DEFAULT_HEDGE_AFTER, "claude", 6.0)
+    monkeypatch.setitem(claude_service._PROVIDER_DEADLINES, "gemini", 5.0)
+    monkeypatch.setitem(claude_service._PROVIDER_DEADLINES, "claude", 5.0)
+
+
+@pytest.fixture
+def release():
+    """Event that unblocks slow fakes once the test is done, freeing pool workers."""
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def fake(text: str, seconds: float = 0.0, release: threading.Event | None = None, error=None):
+    def call() -> str:
+        if release is not None:
+            release.wait(seconds)
+        elif seconds:
+            time.sleep(seconds)
+        if error is not None:
+            raise error
+        return text
+    return call
+
+
+def test_hedge_answers_when_primary_is_slow(monkeypatch, release):
+    monkeypatch.setitem(claude_service._DEFAULT_HEDGE_AFTER, "gemini", 0.05)
+    start = time.monotonic()
+    text = claude_service._route_caption({
+        "gemini": fake("slow", 2.0, release),
+        "claude": fake("fast", 0.01),
+    })
+    assert text == "fast"
+    assert time.monotonic() - start < 1.0
+
+
+def test_primary_answer_wins_without_hedging():
+    calls = []
+    text = claude_service._route_caption({
+        "gemini": fake("primary", 0.01),
+        "claude": lambda: calls.append("claude") or "hedge",
+    })
+    assert text == "primary"
+    assert calls == []
+
+
+def test_fails_over_immediately_on_error():
+    start = time.monotonic()
+    text = claude_service._route_caption({
+        "gemini": fake("", error=RuntimeError("quota exceeded")),
+        "claude": fake("fallback", 0.01),
+    })
+    assert text == "fallback"
+    # No waiting for the 5 s hedge delay
+    assert time.monotonic() - start < 1.0
+    assert claude_service._stats_for("gemini").error_rate() == 1.0
+
+
+def test_raises_last_error_when_every_provider_fails():
+    with pytest.raises(RuntimeError, match="claude down"):
+        claude_service._route_caption({
+            "gemini": fake("", error=RuntimeError("gemini down")),
+            "claude": fake("", error=RuntimeError("claude down")),
+        })
+
+
+def test_deadline_times_out_a_hung_provider(monkeypatch, release):
+    monkeypatch.setitem(claude_service._PROVIDER_DEADLINES, "gemini", 0.1)
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        claude_service._route_caption({"gemini": fake("late", 5.0, release)})
+    assert time.monotonic() - start < 1.0
+    assert claude_service._stats_for("gemini").error_rate() == 1.0
+
+
+def test_rate_limit_wait_does_not_count_against_deadline(monkeypatch):
+    monkeypatch.setitem(claude_service._PROVIDER_DEADLINES, "gemini", 0.2)
+    monkeypatch.setattr(claude_service, "_acquire_provider_slot", lambda name: time.sleep(0.3))
+    assert claude_service._route_caption({"gemini": fake("ok", 0.05)}) == "ok"
+
+
+def test_evicted_client_is_not_closed(monkeypatch):
+    closed = []
+
+    class FakeClient:
+        def close(self):
+            closed.append(self)
+
+    monkeypatch.setattr(claude_service, "_clients", claude_service.OrderedDict())
+    monkeypatch.setattr(claude_service, "_CLIENT_CACHE_MAX", 1)
+    monkeypatch.setattr(claude_service, "_build_client", lambda provider, api_key: FakeClient())
+    in_use = claude_service._get_client("claude", "key-a")
+    claude_service._get_client("claude", "key-b")
+    claude_service.evict_clients("key-b")
+    assert not claude_service._clients
+    assert closed == []
+    assert claude_service._get_client("claude", "key-a") is not in_use
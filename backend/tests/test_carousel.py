@@ -0,0 +1,88 @@
+import itertools
+import threading
+
+import pytest
+
+from services import instagram_service as ig
+
+URLS = [f"https://img.example/{i}.jpg" for i in range(4)]
+CREDS = {"instagram_account_id": "acct"}
+
+
+class _Resp:
+    def __init__(self, body: dict):
+        self._body = body
+        self.status_code = 200
+        self.is_success = True
+        self.headers: dict = {}
+        self.text = str(body)
+
+    def json(self):
+        return self._body
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    """
+    Fake Graph layer. The first child's creation blocks until its siblings were
+    created, so it finishes last — only possible if children run concurrently.
+    """
+
+    class Graph:
+        ids = itertools.count(1)
+        child_of: dict = {}          # container id → image url
+        failing: set = set()         # image urls whose containers end in ERROR
+        parents: list = []           # "children" param of each parent creation
+        published: list = []
+        siblings_created = threading.Event()
+        lock = threading.Lock()
+
+    def fake_request(method, url, params=None, **kwargs):
+        if method == "GET":
+            container_id = url.rsplit("/", 1)[-1]
+            failed = Graph.child_of.get(container_id) in Graph.failing
+            return _Resp({"status_code": "ERROR" if failed else "FINISHED"})
+        if url.endswith("/media_publish"):
+            Graph.published.append(params["creation_id"])
+            return _Resp({"id": "media-1"})
+        if "children" in params:
+            Graph.parents.append(params["children"])
+            return _Resp({"id": "parent"})
+        if params["image_url"] == URLS[0]:
+            assert Graph.siblings_created.wait(2), "children were created one after another"
+        with Graph.lock:
+            container_id = f"c{next(Graph.ids)}"
+            Graph.child_of[container_id] = params["image_url"]
+            if len({u for u in Graph.child_of.values() if u != URLS[0]}) == len(URLS) - 1:
+                Graph.siblings_created.set()
+        return _Resp({"id": container_id})
+
+    monkeypatch.setattr(ig, "_graph_request", fake_request)
+    monkeypatch.setattr(ig, "get_valid_token", lambda **kwargs: "token")
+    monkeypatch.setattr(ig, "_breakers", {})
+    monkeypatch.setattr(ig.time, "sleep", lambda seconds: None)
+    return Graph
+
+
+def test_children_param_keeps_carousel_order(graph):
+    assert ig.post_carousel(URLS, "caption", creds=CREDS) == "media-1"
+    ids_by_url = {url: cid for cid, url in graph.child_of.items()}
+    assert graph.parents == [",".join(ids_by_url[url] for url in URLS)]
+    # The first child was created last, yet still leads the carousel
+    assert ids_by_url[URLS[0]] == f"c{len(URLS)}"
+    assert graph.published == ["parent"]
+
+
+def test_failed_child_cleans_up_without_parent(graph):
+    graph.failing = {URLS[2]}
+    cp = ig.PublishCheckpoint()
+    before = {t.name for t in threading.enumerate()}
+    with pytest.raises(ig.ContainerError):
+        ig.post_carousel(URLS, "caption", creds=CREDS, checkpoint=cp)
+
+    # Recreated once, then given up; siblings finished and stay reusable
+    assert list(graph.child_of.values()).count(URLS[2]) == ig._CAROUSEL_ITEM_ATTEMPTS
+    assert set(cp.get("children")) == {URLS[0], URLS[1], URLS[3]}
+    assert graph.parents == [] and graph.published == []
+    assert cp.get("parent_id") is None
+    assert {t.name for t in threading.enumerate()} <= before  # fan-out pool shut down
@@ -0,0 +1,55 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services import draft_service as ds
+
+
+class _CountingPool:
+    """Runs drafts on real threads and records the most selections ever queued at once."""
+
+    def __init__(self):
+        self._pool = ThreadPoolExecutor(max_workers=4)
+        self._lock = threading.Lock()
+        self.outstanding = 0
+        self.peak = 0
+
+    def submit(self, fn, *args):
+        with self._lock:
+            self.outstanding += 1
+            self.peak = max(self.peak, self.outstanding)
+
+        def run():
+            try:
+                fn(*args)
+            finally:
+                with self._lock:
+                    self.outstanding -= 1
+
+        return self._pool.submit(run)
+
+
+def test_large_batch_is_fed_to_the_pool_in_chunks(monkeypatch, tmp_path):
+    from services import schedule_service
+
+    pool = _CountingPool()
+    monkeypatch.setattr(ds, "_pool", pool)
+    monkeypatch.setattr(ds, "_BASE_DATA_DIR", tmp_path)
+    monkeypatch.setattr(ds, "download_photo", lambda fid, creds=None: (b"jpeg", "image/jpeg"))
+    monkeypatch.setattr(ds, "render_variants", lambda data, names: {"preview": b"p", "feed": b"f"})
+    monkeypatch.setattr(ds, "place_name", lambda meta: None)
+    monkeypatch.setattr(ds, "generate_caption", lambda images, **kwargs: "caption")
+    monkeypatch.setattr(schedule_service, "extract_photo_metadata", lambda data: {})
+
+    selections = [[f"photo-{i}"] for i in range(ds.BATCH_CHUNK_SIZE * 2 + 50)]
+    batch_id = ds.start_batch(selections, user_id=1)
+    deadline = time.monotonic() + 10
+    while ds.get_batch(batch_id, 1)["status"] != "finished" and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    status = ds.get_batch(batch_id, 1)
+    assert status["status"] == "finished"
+    assert status["total"] == status["done"] == len(selections)
+    assert sorted(d["file_ids"][0] for d in status["drafts"]) == sorted(s[0] for s in selections)
+    # +1: a finishing draft submits its successor just before leaving its worker
+    assert pool.peak <= ds.BATCH_CHUNK_SIZE + 1
@@ -0,0 +1,49 @@
+import threading
+import time
+
+from services import instagram_service as ig
+
+
+class _Resp:
+    headers: dict = {}
+
+
+def test_low_priority_call_waits_behind_publish(monkeypatch):
+    order = []
+    publish_started = threading.Event()
+    release = threading.Event()
+
+    def fake_request(method, url, **kwargs):
+        if url == "publish":
+            publish_started.set()
+            release.wait(2)
+        order.append(url)
+        return _Resp()
+
+    monkeypatch.setattr(ig.httpx, "request", fake_request)
+    monkeypatch.setattr(ig, "_record_usage", lambda resp, account_id: None)
+    monkeypatch.setattr(ig, "_budget_delay", lambda priority, account_id: 0.01)
+
+    publisher = threading.Thread(
+        target=ig._graph_request, args=("POST", "publish"), kwargs={"priority": ig.PRIORITY_PUBLISH}
+    )
+    publisher.start()
+    publish_started.wait(2)
+    low = threading.Thread(target=ig._graph_request, args=("GET", "low"))
+    low.start()
+    time.sleep(0.1)
+    assert order == []
+    release.set()
+    publisher.join(2)
+    low.join(2)
+    assert order == ["publish", "low"]
+
+
+def test_low_priority_call_not_held_when_budget_is_healthy(monkeypatch):
+    monkeypatch.setattr(ig.httpx, "request", lambda method, url, **kwargs: _Resp())
+    monkeypatch.setattr(ig, "_record_usage", lambda resp, account_id: None)
+    monkeypatch.setattr(ig, "_budget_delay", lambda priority, account_id: 0.0)
+    monkeypatch.setattr(ig, "_publishes_in_flight", 1)
+    start = time.monotonic()
+    ig._graph_request("GET", "low")
+    assert time.monotonic() - start < 0.5
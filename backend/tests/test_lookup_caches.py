@@ -0,0 +1,55 @@
+import json
+import time
+
+from services import instagram_service as ig
+
+
+def test_place_cache_writes_are_batched_and_pruned(monkeypatch, tmp_path):
+    cache_file = tmp_path / "place_cache.json"
+    now = int(time.time())
+    monkeypatch.setattr(ig, "PLACE_CACHE_FILE", cache_file)
+    monkeypatch.setattr(ig, "PLACE_CACHE_MAX_ENTRIES", 3)
+    monkeypatch.setattr(ig, "_PLACE_CACHE_FLUSH_DELAY", 3600)
+    monkeypatch.setattr(ig, "_place_flush_timer", None)
+    monkeypatch.setattr(ig, "_place_cache", {
+        "expired": {"id": "1", "name": "Old", "at": now - ig.PLACE_CACHE_TTL - 1},
+        "no-place": {"id": None, "name": "", "at": now - ig.PLACE_CACHE_NEGATIVE_TTL - 1},
+        "oldest-live": {"id": "2", "name": "Kept?", "at": now - 100},
+    })
+
+    for i in range(3):
+        ig._store_place(f"cell{i}", f"id{i}", f"Place {i}")
+    assert not cache_file.exists()  # no write per store
+    timer = ig._place_flush_timer
+    assert timer is not None
+
+    ig.flush_place_cache()
+    timer.join(1)
+    assert ig._place_flush_timer is None and not timer.is_alive()
+    assert set(json.loads(cache_file.read_text())) == {"cell0", "cell1", "cell2"}
+    assert ig._cached_place("cell1") == (True, "id1")
+
+
+def test_geocode_cache_writes_are_batched_and_pruned(monkeypatch, tmp_path):
+    from services import geocode_service as geo
+
+    cache_file = tmp_path / "geocode_cache.json"
+    now = int(time.time())
+    monkeypatch.setattr(geo, "GEOCODE_CACHE_FILE", cache_file)
+    monkeypatch.setattr(geo, "GEOCODE_CACHE_MAX_ENTRIES", 2)
+    monkeypatch.setattr(geo, "_CACHE_FLUSH_DELAY", 3600)
+    monkeypatch.setattr(geo, "_flush_timer", None)
+    monkeypatch.setattr(geo, "_geocode_cache", {
+        "expired": {"name": "Old", "at": now - geo.GEOCODE_CACHE_TTL - 1},
+        "older": {"name": "Older", "at": now - 100},
+    })
+
+    geo._store_name("newer", "Newer")
+    geo._store_name("down", None, failed=True)
+    assert not cache_file.exists()
+
+    geo.flush_geocode_cache()
+    assert geo._flush_timer is None
+    assert json.loads(cache_file.read_text()).keys() == {"newer"}  # failure kept in memory only
+    assert geo._cached_name("down") == (True, None)
+    assert geo._cached_name("older") == (False, None)  # evicted by the entry cap
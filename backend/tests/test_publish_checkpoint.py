@@ -0,0 +1,181 @@
+import itertools
+import time
+
+import pytest
+
+from services import instagram_service as ig
+from services import schedule_service as ss
+
+CREDS = {"instagram_account_id": "acct", "public_base_url": "https://pub.example"}
+
+
+class _Resp:
+    def __init__(self, body: dict):
+        self._body = body
+        self.status_code = 200
+        self.is_success = True
+        self.headers: dict = {}
+        self.text = str(body)
+
+    def json(self):
+        return self._body
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    """Fake Graph layer: containers are FINISHED unless listed in *graph.status*."""
+
+    class Graph:
+        ids = itertools.count(1)
+        status: dict = {}
+        created: list = []       # image_url (or "carousel") per container creation
+        published: list = []
+
+    def fake_request(method, url, params=None, **kwargs):
+        if method == "GET":
+            return _Resp({"status_code": Graph.status.get(url.rsplit("/", 1)[-1], "FINISHED")})
+        if url.endswith("/media_publish"):
+            Graph.published.append(params["creation_id"])
+            return _Resp({"id": f"media-{params['creation_id']}"})
+        Graph.created.append(params.get("image_url", "carousel"))
+        return _Resp({"id": f"new{next(Graph.ids)}"})
+
+    monkeypatch.setattr(ig, "_graph_request", fake_request)
+    monkeypatch.setattr(ig, "get_valid_token", lambda **kwargs: "token")
+    monkeypatch.setattr(ig, "_breakers", {})
+    monkeypatch.setattr(ig.time, "sleep", lambda seconds: None)
+    return Graph
+
+
+def test_checkpoint_persists_each_step_and_expires_old_containers():
+    saved = []
+    cp = ig.PublishCheckpoint(save=saved.append)
+    cp.set_child("a.jpg", "c1")
+    cp.update(parent_id="p1")
+    assert saved[-1]["children"] == {"a.jpg": "c1"} and saved[-1]["parent_id"] == "p1"
+
+    stale = dict(saved[-1], containers_created_at=time.time() - ig.CONTAINER_REUSE_SECONDS - 1)
+    reloaded = ig.PublishCheckpoint(stale)
+    assert reloaded.get("children") is None and reloaded.get("parent_id") is None
+
+
+def test_photo_with_media_id_is_already_done(graph):
+    cp = ig.PublishCheckpoint({"media_id": "m1", "parent_id": "p1"})
+    assert ig.post_photo("a.jpg", "caption", creds=CREDS, checkpoint=cp) == "m1"
+    assert graph.created == [] and graph.published == []
+
+
+def test_photo_resumes_from_finished_parent(graph):
+    cp = ig.PublishCheckpoint({"parent_id": "p1", "containers_created_at": time.time()})
+    assert ig.post_photo("a.jpg", "caption", creds=CREDS, checkpoint=cp) == "media-p1"
+    assert graph.created == [] and graph.published == ["p1"]
+    assert cp.get("media_id") == "media-p1"
+
+
+def test_photo_recreates_expired_parent(graph):
+    graph.status = {"p1": "EXPIRED"}
+    cp = ig.PublishCheckpoint({"parent_id": "p1", "containers_created_at": time.time()})
+    assert ig.post_photo("a.jpg", "caption", creds=CREDS, checkpoint=cp) == "media-new1"
+    assert graph.created == ["a.jpg"] and graph.published == ["new1"]
+    assert cp.get("parent_id") == "new1"
+
+
+def test_photo_with_published_parent_raises_container_error(graph):
+    graph.status = {"p1": "PUBLISHED"}
+    cp = ig.PublishCheckpoint({"parent_id": "p1", "containers_created_at": time.time()})
+    with pytest.raises(ig.ContainerError) as exc:
+        ig.post_photo("a.jpg", "caption", creds=CREDS, checkpoint=cp)
+    assert exc.value.status == "PUBLISHED"
+    assert graph.created == [] and graph.published == []
+
+
+def test_carousel_reuses_recorded_children(graph):
+    urls = ["a.jpg", "b.jpg", "c.jpg"]
+    graph.status = {"cb": "ERROR"}
+    cp = ig.PublishCheckpoint({"children": {"a.jpg": "ca", "b.jpg": "cb"}, "containers_created_at": time.time()})
+    ig.post_carousel(urls, "caption", creds=CREDS, checkpoint=cp)
+    # a reused; b failed processing and was recreated; c never existed
+    assert sorted(graph.created) == ["b.jpg", "c.jpg", "carousel"]
+    assert cp.get("children")["a.jpg"] == "ca"
+    assert cp.get("children")["b.jpg"] != "cb"
+
+
+def test_carousel_resumes_from_parent_without_children(graph):
+    cp = ig.PublishCheckpoint({"parent_id": "p1", "containers_created_at": time.time()})
+    assert ig.post_carousel(["a.jpg", "b.jpg"], "caption", creds=CREDS, checkpoint=cp) == "media-p1"
+    assert graph.created == []
+
+
+@pytest.fixture
+def temp_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(ss, "TEMP_DIR", tmp_path)
+    monkeypatch.setattr(ss, "_verify_public_image_url", lambda url: None)
+    return tmp_path
+
+
+def test_post_images_treats_published_container_as_success(graph, temp_dir):
+    (temp_dir / "x.jpg").write_bytes(b"jpeg")
+    graph.status = {"p1": "PUBLISHED"}
+    cp = ig.PublishCheckpoint({
+        "image_urls": ["https://pub.example/temp/x.jpg"], "base_url": "https://pub.example",
+        "parent_id": "p1", "containers_created_at": time.time(),
+    })
+    assert ss._post_images(["f1"], "caption", creds=CREDS, checkpoint=cp) == ""
+    assert graph.published == []
+    assert not (temp_dir / "x.jpg").exists()
+
+
+def test_post_images_clears_checkpoint_files_after_success(graph, temp_dir):
+    cp = ig.PublishCheckpoint()
+    assert ss._post_images(["f1"], "caption", creds=CREDS, images=[b"jpeg"], checkpoint=cp) == "media-new1"
+    assert cp.get("media_id") == "media-new1"
+    assert list(temp_dir.iterdir()) == []
+
+
+def test_post_images_keeps_checkpoint_files_for_retry(graph, temp_dir):
+    graph.status = {"new1": "ERROR"}
+    cp = ig.PublishCheckpoint()
+    with pytest.raises(ig.ContainerError):
+        ss._post_images(["f1"], "caption", creds=CREDS, images=[b"jpeg"], checkpoint=cp)
+    assert len(list(temp_dir.iterdir())) == 1
+    assert ss._checkpoint_temp_urls(cp, "https://pub.example") == cp.get("image_urls")
+
+
+def test_only_fresh_finished_containers_train_the_poll_model(graph, monkeypatch):
+    model = ig._PollModel()
+    monkeypatch.setattr(ig, "_poll_model", lambda media_type: model)
+
+    cp = ig.PublishCheckpoint({"parent_id": "p1", "containers_created_at": time.time()})
+    ig.post_photo("a.jpg", "caption", creds=CREDS, checkpoint=cp)  # resumed: age unknown
+    graph.status = {"bad": "ERROR"}
+    with pytest.raises(ig.ContainerError):
+        ig.wait_for_container("bad", creds=CREDS)
+    graph.status = {"slow": "IN_PROGRESS"}
+    with pytest.raises(RuntimeError, match="not ready"):
+        ig.wait_for_container("slow", max_wait=0, creds=CREDS)
+    assert len(model._samples) == 0
+
+    ig.wait_for_container("fresh", creds=CREDS)
+    assert len(model._samples) == 1
+
+
+def test_deferred_scheduled_post_keeps_its_source(monkeypatch):
+    from services import publish_job_service as pjs
+
+    created = {}
+
+    def fake_create(job_id, user_id, req):
+        created["req"] = req
+        return {"id": job_id, "request": req}
+
+    monkeypatch.setattr(pjs, "create_publish_job", fake_create)
+    monkeypatch.setattr(pjs, "update_publish_job", lambda *args, **kwargs: None)
+    monkeypatch.setattr(pjs, "_submit_at", lambda job_id, req: None)
+
+    post = {
+        "source": "gphotos_picker", "picker_session_id": "sess", "file_ids": ["a"],
+        "file_names": ["a.jpg"], "caption": "c", "location_id": None,
+    }
+    pjs.submit_deferred_publish(1, post, 60, 1)
+    assert created["req"]["source"] == "gphotos_picker"
+    assert created["req"]["picker_session_id"] == "sess"
@@ -0,0 +1,67 @@
+import httpx
+import pytest
+
+from services import instagram_service as ig
+
+
+class _Resp:
+    def __init__(self, body: dict, status_code: int = 200):
+        self._body = body
+        self.status_code = status_code
+        self.is_success = status_code < 400
+        self.headers: dict = {}
+        self.text = str(body)
+
+    def json(self):
+        return self._body
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    """Fake Graph layer: publish POSTs pop from *graph.publish*; status GETs return *graph.status*."""
+
+    class Graph:
+        publish: list = []
+        status = "FINISHED"
+        calls: list = []
+
+    def fake_request(method, url, **kwargs):
+        Graph.calls.append((method, url.rsplit("/", 1)[-1]))
+        if method == "GET":
+            return _Resp({"status_code": Graph.status})
+        outcome = Graph.publish.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(ig, "_graph_request", fake_request)
+    monkeypatch.setattr(ig, "get_valid_token", lambda **kwargs: "token")
+    monkeypatch.setattr(ig, "_breakers", {})
+    monkeypatch.setattr(ig.time, "sleep", lambda seconds: None)
+    Graph.calls = []
+    return Graph
+
+
+CREDS = {"instagram_account_id": "acct"}
+
+
+def test_read_timeout_after_publish_does_not_publish_twice(graph):
+    graph.publish = [httpx.ReadTimeout("lost response"), _Resp({"id": "duplicate"})]
+    graph.status = "PUBLISHED"
+    with pytest.raises(ig.ContainerError) as exc:
+        ig.publish_container("c1", creds=CREDS)
+    assert exc.value.status == "PUBLISHED"
+    assert graph.calls == [("POST", "media_publish"), ("GET", "c1")]
+
+
+def test_read_timeout_before_publish_is_retried(graph):
+    graph.publish = [httpx.ReadTimeout("lost response"), _Resp({"id": "m1"})]
+    graph.status = "FINISHED"
+    assert ig.publish_container("c1", creds=CREDS) == "m1"
+    assert graph.calls == [("POST", "media_publish"), ("GET", "c1"), ("POST", "media_publish")]
+
+
+def test_connect_error_is_retried_without_status_check(graph):
+    graph.publish = [httpx.ConnectError("refused"), _Resp({"id": "m1"})]
+    assert ig.publish_container("c1", creds=CREDS) == "m1"
+    assert graph.calls == [("POST", "media_publish"), ("POST", "media_publish")]
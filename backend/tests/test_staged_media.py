@@ -0,0 +1,118 @@
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services import instagram_service as ig
+from services import schedule_service as ss
+
+
+@pytest.fixture
+def data_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(ss, "_BASE_DATA_DIR", tmp_path)
+    monkeypatch.setattr(ss, "STAGED_MEDIA_DIR", tmp_path / "staged_media")
+    monkeypatch.setattr(ss, "TEMP_DIR", tmp_path / "temp")
+    (tmp_path / "temp").mkdir()
+    return tmp_path
+
+
+def _pending(user_id, media, created_at=None):
+    ss.save_pending([{
+        "id": f"post-{len(ss.load_pending(user_id))}",
+        "file_ids": ["f1"], "file_names": ["a.jpg"], "caption": "caption", "location_id": None,
+        "media": media, "created_at": (created_at or datetime.now(timezone.utc)).isoformat(),
+    }] + ss.load_pending(user_id), user_id)
+
+
+def _age(path, seconds):
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+
+
+def test_staging_is_content_addressed(data_dir):
+    first = ss._stage_media([b"one", b"two", b"one"])
+    again = ss._stage_media([b"two"])
+    assert first[0] == first[2] == hashlib.sha256(b"one").hexdigest()
+    assert again == [first[1]]
+    assert sorted(p.name for p in ss.STAGED_MEDIA_DIR.iterdir()) == sorted({f"{h}.jpg" for h in first})
+
+    # Two posts share a file; releasing one post's media keeps it for the other
+    _pending(1, [first[1]])
+    ss._release_staged_media([first[1], first[0]])
+    assert (ss.STAGED_MEDIA_DIR / f"{first[1]}.jpg").exists()
+    assert not (ss.STAGED_MEDIA_DIR / f"{first[0]}.jpg").exists()
+
+
+def test_gc_keeps_media_of_pending_posts(data_dir):
+    live, orphan, fresh = ss._stage_media([b"live", b"orphan", b"fresh"])
+    expired, = ss._stage_media([b"expired"])
+    _pending(1, [live])
+    _pending(2, [expired], created_at=datetime.now(timezone.utc) - timedelta(seconds=ss.STAGED_MEDIA_TTL_SECONDS + 60))
+    for h in (live, orphan, expired):
+        _age(ss.STAGED_MEDIA_DIR / f"{h}.jpg", ss._STAGED_GRACE_SECONDS + 60)
+
+    ss.gc_staged_media()
+
+    left = {p.stem for p in ss.STAGED_MEDIA_DIR.iterdir()}
+    assert left == {live, fresh}  # fresh is unreferenced but inside the grace period
+    assert ss.load_pending(2)[0]["media"] == []
+    assert ss.load_pending(1)[0]["media"] == [live]
+
+
+def test_approval_publishes_from_staged_url(data_dir, monkeypatch):
+    staged, = ss._stage_media([b"feed jpeg"])
+    _pending(None, [staged])
+    created = []
+
+    class Resp:
+        is_success, status_code, headers, text = True, 200, {}, ""
+
+        def __init__(self, body):
+            self.body = body
+
+        def json(self):
+            return self.body
+
+    def fake_request(method, url, params=None, **kwargs):
+        if method == "GET":
+            return Resp({"status_code": "FINISHED"})
+        if url.endswith("/media_publish"):
+            return Resp({"id": "media-1"})
+        created.append(params["image_url"])
+        return Resp({"id": "c1"})
+
+    def no_download(*args, **kwargs):
+        raise AssertionError("approval must not download staged photos again")
+
+    monkeypatch.setenv("PUBLIC_BASE_URL", "https://pub.example")
+    monkeypatch.setenv("INSTAGRAM_ACCOUNT_ID", "acct")
+    monkeypatch.setattr(ss, "download_photo", no_download)
+    monkeypatch.setattr(ss, "_verify_public_image_url", lambda url: None)
+    monkeypatch.setattr(ig, "_graph_request", fake_request)
+    monkeypatch.setattr(ig, "get_valid_token", lambda **kwargs: "token")
+    monkeypatch.setattr(ig, "_breakers", {})
+    monkeypatch.setattr(ig.time, "sleep", lambda seconds: None)
+
+    assert ss.approve_pending_post("post-0") is True
+    assert created == [f"https://pub.example/temp/staged/{staged}.jpg"]
+    assert ss.load_pending(None) == []
+    assert not (ss.STAGED_MEDIA_DIR / f"{staged}.jpg").exists()
+
+
+def test_staged_mount_is_not_shadowed_by_temp(data_dir):
+    from fastapi.staticfiles import StaticFiles
+    from fastapi.testclient import TestClient
+
+    import main
+
+    staged, = ss._stage_media([b"feed jpeg"])
+    mount = next(r for r in main.app.routes if getattr(r, "path", None) == "/temp/staged")
+    original = mount.app
+    mount.app = StaticFiles(directory=str(ss.STAGED_MEDIA_DIR))
+    try:
+        resp = TestClient(main.app).get(f"/temp/staged/{staged}.jpg")
+    finally:
+        mount.app = original
+    assert resp.status_code == 200 and resp.content == b"feed jpeg"
@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+
+from services import instagram_service as ig
+
+DAY = 86400
+
+
+@pytest.fixture(autouse=True)
+def fresh_states(monkeypatch):
+    monkeypatch.setattr(ig, "_token_states", {})
+
+
+def test_concurrent_callers_share_one_refresh(monkeypatch):
+    user_id = 7
+    creds = {"instagram_access_token": "old", "instagram_token_expires_at": int(time.time()) + DAY // 2}
+    calls = []
+    start = threading.Barrier(10)
+
+    def slow_refresh(token, creds=None, user_id=None):
+        calls.append(token)
+        time.sleep(0.2)  # keep the refresh in flight while the other callers arrive
+        ig._remember_token(user_id, "new", int(time.time()) + 60 * DAY)
+        return "new"
+
+    monkeypatch.setattr(ig, "refresh_long_lived_token", slow_refresh)
+    results = []
+
+    def caller():
+        start.wait()
+        results.append(ig.get_valid_token(creds=creds, user_id=user_id))
+
+    threads = [threading.Thread(target=caller) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+
+    assert calls == ["old"]
+    assert results == ["new"] * 10
+
+
+def test_failure_backoff_stops_a_refresh_storm(monkeypatch):
+    creds = {"instagram_access_token": "old", "instagram_token_expires_at": int(time.time()) + DAY}
+    calls = []
+
+    def failing_refresh(token, creds=None, user_id=None):
+        calls.append(token)
+        raise RuntimeError("Meta is down")
+
+    monkeypatch.setattr(ig, "refresh_long_lived_token", failing_refresh)
+    for _ in range(50):
+        assert ig.get_valid_token(creds=creds) == "old"  # keeps serving the current token
+    assert len(calls) == 1
+
+    state = ig._token_state(creds, None)
+    first_wait = state.retry_at - time.time()
+    assert first_wait == pytest.approx(ig._REFRESH_FAILURE_BACKOFF[0], abs=5)
+
+    # Once the backoff has passed, exactly one more attempt — and the next wait is longer
+    state.retry_at = 0.0
+    for _ in range(50):
+        ig.get_valid_token(creds=creds)
+    assert len(calls) == 2
+    assert state.retry_at - time.time() == pytest.approx(ig._REFRESH_FAILURE_BACKOFF[1], abs=5)
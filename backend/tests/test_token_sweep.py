@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+import db
+from services import instagram_service as ig
+
+DAY = 86400
+
+
+@pytest.fixture
+def tmp_db(monkeypatch, tmp_path):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "test.db")
+    db.init_db()
+    monkeypatch.setattr(ig, "_token_states", {})
+
+
+def _user(email: str, **creds) -> int:
+    user_id = db.create_user(email, "x")["id"]
+    db.upsert_credentials(user_id, {"instagram_access_token": f"token-{email}", **creds})
+    return user_id
+
+
+def test_sweep_skips_expired_and_backed_off_tokens(tmp_db):
+    now = int(time.time())
+    for i in range(30):
+        _user(f"dead{i}", instagram_token_expires_at=now - DAY)
+    for i in range(30):
+        _user(f"failing{i}", instagram_next_refresh_attempt_at=now + 3600, instagram_refresh_failures=2)
+    healthy = _user("healthy", instagram_token_expires_at=now + 2 * DAY)
+    far = _user("far", instagram_token_expires_at=now + 50 * DAY)
+    retry_due = _user("retry-due", instagram_token_expires_at=now + DAY, instagram_next_refresh_attempt_at=now - 1)
+
+    due = db.list_tokens_expiring_before(now + 7 * DAY, now, limit=20)
+    assert due == [healthy, retry_due]
+    assert far not in due
+
+
+def test_refresh_failure_backoff_is_persisted(tmp_db, monkeypatch):
+    now = int(time.time())
+    user_id = _user("u", instagram_token_expires_at=now + DAY)
+    calls = []
+
+    def failing_refresh(token, creds=None, user_id=None):
+        calls.append(token)
+        raise RuntimeError("Meta is down")
+
+    monkeypatch.setattr(ig, "refresh_long_lived_token", failing_refresh)
+    ig.refresh_due_tokens()
+    assert len(calls) == 1
+    creds = db.get_credentials(user_id)
+    assert creds["instagram_refresh_failures"] == 1
+    assert creds["instagram_next_refresh_attempt_at"] > now
+
+    # A restart forgets in-memory state, but neither the sweep nor an inline call retries early
+    monkeypatch.setattr(ig, "_token_states", {})
+    assert db.list_tokens_expiring_before(now + 7 * DAY, now, limit=20) == []
+    ig.refresh_due_tokens()
+    ig.get_valid_token(creds=db.get_credentials(user_id), user_id=user_id)
+    assert len(calls) == 1
@@ -115,9 +115,11 @@ export async function fetchPhotos(folderId) {
   return apiFetch(`${BASE}/drive/photos?folder_id=${encodeURIComponent(folderId)}`);
 }
 
-export function photoRawUrl(fileId) {
+// variant: null for the original, "thumb" (320 px) or "preview" (1024 px)
+export function photoRawUrl(fileId, variant = null) {
   const token = localStorage.getItem("aip_token") || "";
-  return `${BASE}/drive/photo/${fileId}/raw?token=${encodeURIComponent(token)}`;
+  const url = `${BASE}/drive/photo/${fileId}/raw?token=${encodeURIComponent(token)}`;
+  return variant ? `${url}&variant=${variant}` : url;
 }
 
 // ── Caption ───────────────────────────────────────────────────────────────────
@@ -131,19 +133,97 @@ export async function generateCaption(fileIds, tone = "engaging") {
   });
 }
 
+// Streams the caption over SSE; onToken(text) fires as text arrives.
+// Resolves to { caption, location_name } once the final caption is ready.
+export async function generateCaptionStream(fileIds, tone = "engaging", onToken = () => {}) {
+  const ids = Array.isArray(fileIds) ? fileIds : [fileIds];
+  const res = await fetch(`${BASE}/caption/generate/stream`, {
+    method: "POST",
+    headers: {
+      ...authHeaders(),
+      "Content-Type": "application/json",
+      "ngrok-skip-browser-warning": "1",
+    },
+    body: JSON.stringify({ file_ids: ids, tone }),
+  });
+  if (!res.ok || !res.body) {
+    const text = await res.text();
+    let detail = text;
+    try { detail = JSON.parse(text).detail || text; } catch {}
+    throw new Error(detail);
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) !== -1) {
+      const raw = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      const event = (raw.match(/^event: (.*)$/m) || [])[1];
+      const data = JSON.parse((raw.match(/^data: (.*)$/m) || [])[1] || "{}");
+      if (event === "token") onToken(data.text);
+      else if (event === "done") return data;
+      else if (event === "error") throw new Error(data.detail);
+    }
+  }
+  throw new Error("Caption stream ended unexpectedly");
+}
+
 // ── Instagram ─────────────────────────────────────────────────────────────────
 
 export async function getInstagramAccount() {
   return apiFetch(`${BASE}/instagram/account-info`);
 }
 
-export async function postToInstagram(fileIds, caption, source = "drive", pickerSessionId = null) {
+export async function getPublishJob(jobId) {
+  return apiFetch(`${BASE}/instagram/jobs/${jobId}`);
+}
+
+const POST_POLL_INTERVAL_MS = 1500;
+const POST_POLL_DEADLINE_MS = 5 * 60 * 1000;
+const POST_POLL_MAX_FAILURES = 5;  // consecutive status checks that may fail
+
+// Queues the post, then polls the job until it finishes. onStage(stage) is
+// called whenever the server reports a new stage. Gives up after
+// POST_POLL_DEADLINE_MS or POST_POLL_MAX_FAILURES failed checks in a row.
+export async function postToInstagram(fileIds, caption, source = "drive", pickerSessionId = null, onStage = null) {
   const ids = Array.isArray(fileIds) ? fileIds : [fileIds];
-  return apiFetch(`${BASE}/instagram/post`, {
+  const { job_id } = await apiFetch(`${BASE}/instagram/post`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify({ file_ids: ids, caption, source, picker_session_id: pickerSessionId }),
   });
+  const deadline = Date.now() + POST_POLL_DEADLINE_MS;
+  let lastStage = null;
+  let failures = 0;
+  for (;;) {
+    let job;
+    try {
+      job = await getPublishJob(job_id);
+      failures = 0;
+    } catch (err) {
+      if (++failures >= POST_POLL_MAX_FAILURES) {
+        throw new Error(`Lost contact with the server while posting (${err.message}). Check Instagram before retrying.`);
+      }
+    }
+    if (job) {
+      if (job.stage !== lastStage) {
+        lastStage = job.stage;
+        onStage?.(job.stage);
+      }
+      if (job.status === "succeeded") return { success: true, ...job.result };
+      if (job.status === "failed") throw new Error(job.error || "Post failed");
+    }
+    if (Date.now() >= deadline) {
+      throw new Error(`Post still ${lastStage || "queued"} after ${POST_POLL_DEADLINE_MS / 60000} minutes. It may yet go through — check Instagram before retrying.`);
+    }
+    await new Promise((r) => setTimeout(r, POST_POLL_INTERVAL_MS));
+  }
 }
 
 // ── Schedule ──────────────────────────────────────────────────────────────────
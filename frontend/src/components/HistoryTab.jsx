@@ -11,6 +11,7 @@ const STATUS_BADGE = {
   success: { text: "✓ Success", bg: "#e6f9ee", color: "#1a7a40" },
   failed:  { text: "✗ Failed",  bg: "#fff0f0", color: "#c00" },
   queued:  { text: "⏳ Pending approval", bg: "#fff8e6", color: "#92600a" },
+  deferred: { text: "↻ Retrying later", bg: "#fff8e6", color: "#92600a" },
 };
 
 function formatNextRun(isoString) {
@@ -256,7 +257,7 @@ export default function HistoryTab() {
                   {status.upcoming_pool.map((photo) => (
                     <div key={photo.id} style={{ position: "relative" }}>
                       <img
-                        src={photoRawUrl(photo.id)}
+                        src={photoRawUrl(photo.id, "thumb")}
                         alt={photo.name}
                         title={photo.name}
                         style={{
@@ -303,7 +304,7 @@ export default function HistoryTab() {
               {firstId ? (
                 <div style={{ position: "relative", flexShrink: 0 }}>
                   <img
-                    src={photoRawUrl(firstId)}
+                    src={photoRawUrl(firstId, "thumb")}
                     alt=""
                     style={s.thumb}
                     onError={(e) => {
@@ -338,7 +339,7 @@ export default function HistoryTab() {
 
                 {entry.caption && <div style={s.caption}>{entry.caption}</div>}
 
-                {entry.status === "failed" && entry.error && (
+                {(entry.status === "failed" || entry.status === "deferred") && entry.error && (
                   <div style={s.errorMsg}>{entry.error}</div>
                 )}
                 {entry.status === "queued" && (
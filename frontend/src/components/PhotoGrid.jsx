@@ -5,7 +5,7 @@ import { photoRawUrl, pickerThumbUrl } from "../api/client";
 
 function resolveThumbUrl(photo) {
   if (photo.source === "gphotos_picker") return pickerThumbUrl(photo.id);
-  return photo.thumbnailUrl || photoRawUrl(photo.id);
+  return photo.thumbnailUrl || photoRawUrl(photo.id, "thumb");
 }
 
 const MAX_SELECT = 10;
@@ -3,7 +3,7 @@ import { photoRawUrl, pickerThumbUrl } from "../api/client";
 
 function resolveThumbUrl(photo) {
   if (photo?.source === "gphotos_picker") return pickerThumbUrl(photo.id);
-  return photo?.thumbnailUrl || photoRawUrl(photo?.id);
+  return photo?.thumbnailUrl || photoRawUrl(photo?.id, "preview");
 }
 
 const styles = {
@@ -73,7 +73,16 @@ const styles = {
   },
 };
 
-export default function PostPreview({ photos = [], caption, onPost, posting, posted, igAccount }) {
+const STAGE_LABEL = {
+  queued: "Queued…",
+  downloading: "Downloading photos…",
+  uploading: "Uploading…",
+  creating_containers: "Sending to Instagram…",
+  processing: "Instagram is processing…",
+  publishing: "Publishing…",
+};
+
+export default function PostPreview({ photos = [], caption, onPost, posting, postStage, posted, igAccount }) {
   const [idx, setIdx] = useState(0);
   const isCarousel = photos.length > 1;
   const photo = photos[idx] ?? null;
@@ -151,7 +160,7 @@ export default function PostPreview({ photos = [], caption, onPost, posting, pos
       ) : (
         <button style={styles.postBtn(ready && !posting)} onClick={onPost} disabled={!ready || posting}>
           {posting
-            ? (isCarousel ? "Posting carousel…" : "Posting…")
+            ? (STAGE_LABEL[postStage] || (isCarousel ? "Posting carousel…" : "Posting…"))
             : (isCarousel ? `Post Carousel (${photos.length})` : "Post to Instagram")}
         </button>
       )}
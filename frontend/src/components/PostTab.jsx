@@ -495,7 +495,7 @@ export default function PostTab() {
                   {status.upcoming_pool.map((photo) => (
                     <img
                       key={photo.id}
-                      src={photoRawUrl(photo.id)}
+                      src={photoRawUrl(photo.id, "thumb")}
                       alt={photo.name}
                       title={photo.name}
                       style={{ width: "52px", height: "52px", objectFit: "cover", borderRadius: "6px", background: "#e0e0e0" }}
@@ -716,7 +716,7 @@ export default function PostTab() {
               return (
                 <div key={post.id} style={s.pendingItem}>
                   <img
-                    src={photoRawUrl(post.file_id)}
+                    src={photoRawUrl(post.file_id, "thumb")}
                     alt={post.file_name}
                     style={{ ...s.thumb, width: "80px", height: "80px" }}
                     onError={(e) => { e.target.style.display = "none"; }}
@@ -771,7 +771,7 @@ export default function PostTab() {
               {firstId ? (
                 <div style={{ position: "relative", flexShrink: 0 }}>
                   <img
-                    src={photoRawUrl(firstId)}
+                    src={photoRawUrl(firstId, "thumb")}
                     alt=""
                     style={s.thumb}
                     onError={(e) => {
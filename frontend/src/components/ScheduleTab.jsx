@@ -502,7 +502,7 @@ export default function ScheduleTab() {
               return (
                 <div key={post.id} style={s.pendingItem}>
                   <img
-                    src={photoRawUrl(post.file_id)}
+                    src={photoRawUrl(post.file_id, "thumb")}
                     alt={post.file_name}
                     style={s.thumb}
                     onError={(e) => { e.target.style.display = "none"; }}
@@ -426,7 +426,7 @@ export default function StoryTab() {
               {(showAllPhotos ? photos : photos.slice(0, 5)).map(p => (
                 <img
                   key={p.id}
-                  src={p.thumbnailUrl || photoRawUrl(p.id)}
+                  src={p.thumbnailUrl || photoRawUrl(p.id, "thumb")}
                   alt={p.name}
                   title={p.name}
                   style={s.photoThumb(selectedPhotoId === p.id)}
@@ -609,7 +609,7 @@ export default function StoryTab() {
             return (
               <div key={entry.id} style={{ display: "flex", gap: "12px", alignItems: "flex-start", padding: "12px 0", borderBottom: "1px solid #f0f0f0" }}>
                 <img
-                  src={photoRawUrl(entry.file_id)}
+                  src={photoRawUrl(entry.file_id, "thumb")}
                   alt=""
                   style={{ width: "52px", height: "92px", objectFit: "cover", borderRadius: "6px", flexShrink: 0, background: "#f0f0f0" }}
                   onError={e => { e.target.style.display = "none"; }}
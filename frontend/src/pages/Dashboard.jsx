@@ -1,7 +1,7 @@
 import { useEffect, useState } from "react";
 import { useNavigate } from "react-router-dom";
 import { useIsMobile } from "../hooks/useIsMobile";
-import { fetchAlbumPhotos, fetchPhotos, generateCaption, getInstagramAccount, getPickerPhotos, getPostedIds, getScheduleConfig, markAsPosted, pickerThumbUrl, postToInstagram, startGooglePicker, unmarkAsPosted } from "../api/client";
+import { fetchAlbumPhotos, fetchPhotos, generateCaptionStream, getInstagramAccount, getPickerPhotos, getPostedIds, getScheduleConfig, markAsPosted, pickerThumbUrl, postToInstagram, startGooglePicker, unmarkAsPosted } from "../api/client";
 import AlbumPicker from "../components/AlbumPicker";
 import CaptionEditor from "../components/CaptionEditor";
 import FolderPicker from "../components/FolderPicker";
@@ -159,6 +159,7 @@ export default function Dashboard() {
   const [pickerOpen, setPickerOpen] = useState(false); // true after picker tab opened
 
   const [posting, setPosting] = useState(false);
+  const [postStage, setPostStage] = useState("");
   const [posted, setPosted] = useState(false);
   const [postError, setPostError] = useState("");
 
@@ -267,7 +268,10 @@ export default function Dashboard() {
     setGeneratingCaption(true);
     setCaptionError("");
     try {
-      const data = await generateCaption(selectedIds, tone);
+      setCaption("");
+      const data = await generateCaptionStream(selectedIds, tone, (text) => {
+        setCaption((prev) => prev + text);
+      });
       setCaption(data.caption);
       setDetectedLocation(data.location_name || "");
     } catch (e) {
@@ -281,10 +285,12 @@ export default function Dashboard() {
     if (!selectedIds.length || !caption.trim()) return;
     setPosting(true);
     setPostError("");
+    setPostStage("");
     try {
       await postToInstagram(
         selectedIds, caption, sourceType,
         sourceType === "gphotos_picker" ? pickerSessionId : null,
+        setPostStage,
       );
       setPosted(true);
     } catch (e) {
@@ -519,6 +525,7 @@ export default function Dashboard() {
                 caption={caption}
                 onPost={handlePost}
                 posting={posting}
+                postStage={postStage}
                 posted={posted}
                 igAccount={igAccount}
               />